@@ -4,19 +4,25 @@ import logging
 from django import forms
 from django.conf import settings
 from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils import timezone
 
 from .models import (
     ContactMessage,
+    ContactNotification,
     DailyVisitStat,
     Download,
+    ImageDerivative,
     News,
     PaymentSettings,
     SiteVisit,
+    VisitRollup,
 )
+from .visit_analytics import build_rollups, chart_rows
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +35,9 @@ class ProjectAdmin(admin.ModelAdmin):
 
 @admin.register(Download)
 class DownloadAdmin(admin.ModelAdmin):
-    list_display = ("title", "category", "created_at")
+    list_display = ("title", "category", "download_count", "created_at")
     search_fields = ("title", "category", "description")
+    readonly_fields = ("download_count",)
 
 
 @admin.register(ContactMessage)
@@ -152,10 +159,82 @@ class ContactMessageAdmin(admin.ModelAdmin):
     send_reply.short_description = "ارسال پاسخ ایمیلی به پیام‌های انتخاب‌شده"
 
 
+@admin.register(ContactNotification)
+class ContactNotificationAdmin(admin.ModelAdmin):
+    list_display = ("message", "status", "attempts", "available_at", "sent_at", "created_at")
+    list_filter = ("status", "created_at")
+    readonly_fields = ("message", "attempts", "last_error", "locked_at", "sent_at", "created_at")
+    actions = ["requeue"]
+
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=ContactNotification.STATUS_SENT).update(
+            status=ContactNotification.STATUS_PENDING,
+            available_at=timezone.now(),
+            locked_at=None,
+        )
+        self.message_user(request, f"{updated} اعلان دوباره در صف قرار گرفت.", level=messages.SUCCESS)
+
+    requeue.short_description = "قرار دادن دوباره در صف ارسال"
+
+
+@admin.register(ImageDerivative)
+class ImageDerivativeAdmin(admin.ModelAdmin):
+    list_display = ("source_name", "format", "width", "height", "bytes", "source_bytes", "created_at")
+    list_filter = ("format", "width")
+    search_fields = ("source_name",)
+    readonly_fields = ("source_name", "format", "width", "height", "file", "bytes", "source_bytes", "created_at")
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(DailyVisitStat)
 class DailyVisitStatAdmin(admin.ModelAdmin):
-    list_display = ("date", "total_hits", "unique_sessions")
+    list_display = ("date", "total_hits", "unique_sessions", "bot_hits")
     list_filter = ("date",)
+    change_list_template = "admin/dailyvisitstat_change_list.html"
+    chart_limits = {VisitRollup.PERIOD_WEEK: 26, VisitRollup.PERIOD_MONTH: 12}
+
+    def get_urls(self):
+        urls = [
+            path(
+                "chart/",
+                self.admin_site.admin_view(self.chart_view),
+                name="core_dailyvisitstat_chart",
+            )
+        ]
+        return urls + super().get_urls()
+
+    def chart_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        period = request.GET.get("period")
+        if period not in self.chart_limits:
+            period = VisitRollup.PERIOD_MONTH
+        # Only the open week and month are recomputed; older periods come from the rollup job.
+        build_rollups(since=timezone.localdate())
+        return TemplateResponse(
+            request,
+            "admin/visit_chart.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": "Unique visitors",
+                "opts": self.model._meta,
+                "period": period,
+                "periods": VisitRollup.PERIOD_CHOICES,
+                "rows": chart_rows(period, self.chart_limits[period]),
+            },
+        )
+
+
+@admin.register(VisitRollup)
+class VisitRollupAdmin(admin.ModelAdmin):
+    list_display = ("period", "start", "unique_visitors", "total_hits", "bot_hits", "days", "updated_at")
+    list_filter = ("period",)
+    readonly_fields = ("period", "start", "unique_visitors", "total_hits", "bot_hits", "days", "updated_at")
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(SiteVisit)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+# Substrings (case-insensitive) that only appear in non-human user agents:
+# search and SEO crawlers, link unfurlers, uptime monitors and HTTP libraries.
+BOT_TOKENS = (
+    "bot",
+    "crawl",
+    "spider",
+    "slurp",
+    "mediapartners",
+    "facebookexternalhit",
+    "embedly",
+    "quora link preview",
+    # The link preview fetcher only; "Telegram-Android" in-app browsers are people.
+    "telegrambot",
+    "skypeuripreview",
+    "bingpreview",
+    "yandex",
+    "baiduspider",
+    "petalsearch",
+    "bytespider",
+    "ahrefs",
+    "semrush",
+    "mj12",
+    "dotbot",
+    "pingdom",
+    "uptimerobot",
+    "statuscake",
+    "site24x7",
+    "monitor",
+    "lighthouse",
+    "pagespeed",
+    "headlesschrome",
+    "phantomjs",
+    "curl/",
+    "wget/",
+    "python-requests",
+    "python-urllib",
+    "aiohttp",
+    "httpx",
+    "go-http-client",
+    "okhttp",
+    "java/",
+    "libwww-perl",
+    "scrapy",
+    "feedfetcher",
+    "feedparser",
+)
+
+# One alternation, compiled once: a single scan of the UA string instead of one per token.
+# Matching a lowercased UA is ~10x faster than re.IGNORECASE on the same pattern.
+_BOT_RE = re.compile("|".join(re.escape(token) for token in BOT_TOKENS))
+# WhatsApp's preview fetcher sends "WhatsApp/2.23.20.0 A"; its in-app browser is a Mozilla UA.
+_WHATSAPP_PREVIEW = "whatsapp/"
+
+
+@lru_cache(maxsize=1024)
+def is_bot(user_agent: str) -> bool:
+    """True for crawlers, monitors and scripts that identify themselves, and for no UA at all.
+
+    Results are cached per UA string: real traffic repeats a few hundred
+    distinct agents, so most requests are a dictionary lookup.
+    """
+
+    if not user_agent.strip():
+        return True
+    agent = user_agent.lower()
+    if _WHATSAPP_PREVIEW in agent and "mozilla" not in agent:
+        return True
+    return _BOT_RE.search(agent) is not None
+
+
+def request_is_bot(request) -> bool:
+    return is_bot(request.META.get("HTTP_USER_AGENT", "")[:512])
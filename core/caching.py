@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.utils.module_loading import import_string
+
+_MISSING = object()
+LOCK_POLL_SECONDS = 0.05
+EVENTS = ("l1_hit", "l2_hit", "miss", "compute", "early_refresh", "stale", "lock_wait")
+
+
+def namespace(key: str) -> str:
+    """`home:sections` -> `home`; keys without a colon are their own namespace."""
+    return str(key).split(":", 1)[0] or "default"
+
+
+class CacheStats:
+    """Per-namespace hit/miss/compute counters and time spent, for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict] = {}
+
+    def record(self, key: str, event: str, seconds: float = 0.0, timer: str = "get_seconds") -> None:
+        with self._lock:
+            counters = self._counters.setdefault(
+                namespace(key), {**dict.fromkeys(EVENTS, 0), "get_seconds": 0.0, "compute_seconds": 0.0}
+            )
+            counters[event] += 1
+            counters[timer] += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._counters.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {}
+
+
+cache_stats = CacheStats()
+
+
+@dataclass(frozen=True)
+class CachedValue:
+    """What `get_or_compute` stores: the value plus what XFetch needs to refresh it early."""
+
+    value: object
+    compute_seconds: float
+    expires_at: float | None
+
+    def needs_refresh(self, now: float, beta: float) -> bool:
+        if self.expires_at is None:
+            return False
+        # XFetch: refresh before expiry with a probability that rises as expiry nears and
+        # with the recompute cost, so one request (not all of them) rebuilds the value.
+        return now - self.compute_seconds * beta * math.log(1.0 - random.random()) >= self.expires_at
+
+
+class TieredCache(BaseCache):
+    """Per-process L1 (bounded LRU, short TTL) in front of a shared L2 backend.
+
+    OPTIONS:
+      L2             {"BACKEND": ..., "LOCATION": ..., ...}; a FileBasedCache is shared by
+                     all workers on the host. Defaults to a process-local LocMemCache.
+      L1_MAX_ENTRIES LRU size (default 1000).
+      L1_SECONDS     How long a value is served from L1 before L2 is read again (default 5),
+                     i.e. how long a change made by another worker can take to show up.
+      L1_MAX_VALUE_BYTES  Larger values (e.g. sitemap shards) are only kept in L2 (default 1 MB).
+      STALE_SECONDS  How long `get_or_compute` values outlive their timeout so they can be
+                     served while one worker recomputes them (default 60).
+      LOCK_SECONDS   Longest a recompute lock is honoured (default 10).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        l2 = dict(options.get("L2") or {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"})
+        l2.setdefault("TIMEOUT", params.get("TIMEOUT", 300))
+        self._l2 = import_string(l2.pop("BACKEND"))(l2.pop("LOCATION", location or "tiered-l2"), l2)
+        self.l1_max_entries = int(options.get("L1_MAX_ENTRIES", 1000))
+        self.l1_seconds = float(options.get("L1_SECONDS", 5))
+        self.l1_max_value_bytes = int(options.get("L1_MAX_VALUE_BYTES", 1024 * 1024))
+        self.stale_seconds = float(options.get("STALE_SECONDS", 60))
+        self.lock_seconds = float(options.get("LOCK_SECONDS", 10))
+        self._l1: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._l1_lock = threading.Lock()
+
+    # L1 ------------------------------------------------------------------
+
+    def _l1_get(self, full_key: str):
+        with self._l1_lock:
+            item = self._l1.get(full_key)
+            if item is None:
+                return _MISSING
+            if item[0] <= time.monotonic():
+                del self._l1[full_key]
+                return _MISSING
+            self._l1.move_to_end(full_key)
+        return pickle.loads(item[1])
+
+    def _l1_set(self, full_key: str, value, timeout) -> None:
+        seconds = self.l1_seconds if timeout is None else min(self.l1_seconds, timeout)
+        if seconds <= 0:
+            self._l1_drop(full_key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self.l1_max_value_bytes:
+            self._l1_drop(full_key)
+            return
+        with self._l1_lock:
+            self._l1[full_key] = (time.monotonic() + seconds, pickled)
+            self._l1.move_to_end(full_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_drop(self, full_key: str) -> None:
+        with self._l1_lock:
+            self._l1.pop(full_key, None)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Cache API -----------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        started = time.perf_counter()
+        value = self._l1_get(full_key)
+        if value is not _MISSING:
+            cache_stats.record(key, "l1_hit", time.perf_counter() - started)
+            return value
+        value = self._l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            cache_stats.record(key, "miss", time.perf_counter() - started)
+            return default
+        self._l1_set(full_key, value, None)
+        cache_stats.record(key, "l2_hit", time.perf_counter() - started)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        self._l2.set(key, value, timeout, version=version)
+        self._l1_set(full_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        added = self._l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(full_key, value, timeout)
+        else:
+            self._l1_drop(full_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_drop(self.make_and_validate_key(key, version=version))
+        return self._l2.touch(key, self._timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._l1_drop(self.make_and_validate_key(key, version=version))
+        return self._l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self._l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_drop(self.make_and_validate_key(key, version=version))
+        return self._l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1_drop(self.make_and_validate_key(key, version=version))
+        return self._l2.decr(key, delta, version=version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+        self._l2.clear()
+
+    def clear_local(self) -> None:
+        """Drop this process's L1 only (L2 is left alone)."""
+        with self._l1_lock:
+            self._l1.clear()
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
+
+    # Single flight -------------------------------------------------------
+
+    def _lock_path(self, key, version) -> Path:
+        digest = hashlib.md5(self.make_key(key, version=version).encode(), usedforsecurity=False).hexdigest()
+        return Path(self._l2._dir) / "locks" / f"{digest}.lock"
+
+    def _locked(self, key, version) -> bool:
+        if isinstance(self._l2, FileBasedCache):
+            return self._lock_path(key, version).exists()
+        return self._l2.has_key(f"{key}:lock", version=version)
+
+    def _acquire(self, key, version):
+        """Recompute lock for `key`: an O_EXCL file next to a file-based L2, else L2.add()."""
+        if isinstance(self._l2, FileBasedCache):
+            path = self._lock_path(key, version)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if time.time() - path.stat().st_mtime > self.lock_seconds:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                return None
+            return path
+        lock_key = f"{key}:lock"
+        return lock_key if self._l2.add(lock_key, os.getpid(), self.lock_seconds, version=version) else None
+
+    def _release(self, lock, version) -> None:
+        if isinstance(lock, Path):
+            lock.unlink(missing_ok=True)
+        else:
+            self._l2.delete(lock, version=version)
+
+    def _store(self, key, compute, timeout, version):
+        started = time.perf_counter()
+        value = compute()
+        seconds = time.perf_counter() - started
+        cache_stats.record(key, "compute", seconds, timer="compute_seconds")
+        expires_at = None if timeout is None else time.time() + timeout
+        ttl = None if timeout is None else timeout + self.stale_seconds
+        self.set(key, CachedValue(value, seconds, expires_at), ttl, version=version)
+        return value
+
+    def _wait_for_other_worker(self, key, version):
+        deadline = time.monotonic() + self.lock_seconds
+        cache_stats.record(key, "lock_wait")
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            # Checked before the read: a value stored before the lock was released is seen below.
+            locked = self._locked(key, version)
+            entry = self._l2.get(key, version=version)
+            if isinstance(entry, CachedValue):
+                self._l1_set(self.make_and_validate_key(key, version=version), entry, None)
+                return entry
+            if not locked:
+                # The other worker gave up without storing a value (its compute raised).
+                break
+        return None
+
+    def get_or_compute(self, key, compute, timeout=DEFAULT_TIMEOUT, version=None, beta: float = 1.0):
+        """Cached `compute()`, recomputed by one caller at a time.
+
+        Other callers get the previous value while it is being refreshed (or wait
+        for the first value), and a value is refreshed early with a probability
+        that grows as it nears expiry, so a hot key never expires for everyone at
+        once.
+        """
+
+        timeout = self._timeout(timeout)
+        entry = self.get(key, version=version)
+        if isinstance(entry, CachedValue):
+            now = time.time()
+            if not entry.needs_refresh(now, beta):
+                return entry.value
+            lock = self._acquire(key, version)
+            if lock is None:
+                cache_stats.record(key, "stale")
+                return entry.value
+            if entry.expires_at is not None and now < entry.expires_at:
+                cache_stats.record(key, "early_refresh")
+            try:
+                return self._store(key, compute, timeout, version)
+            finally:
+                self._release(lock, version)
+
+        lock = self._acquire(key, version)
+        if lock is None:
+            entry = self._wait_for_other_worker(key, version)
+            if entry is not None:
+                return entry.value
+            return self._store(key, compute, timeout, version)
+        try:
+            # Another worker may have stored it between our miss and taking the lock.
+            entry = self._l2.get(key, version=version)
+            if isinstance(entry, CachedValue) and not entry.needs_refresh(time.time(), 0):
+                return entry.value
+            return self._store(key, compute, timeout, version)
+        finally:
+            self._release(lock, version)
+
+
+def get_or_compute(key: str, compute, timeout=DEFAULT_TIMEOUT, *, alias: str = "default", beta: float = 1.0):
+    """`TieredCache.get_or_compute` on `alias`, or a plain get/set for other backends."""
+    backend = caches[alias]
+    if isinstance(backend, TieredCache):
+        return backend.get_or_compute(key, compute, timeout, beta=beta)
+    value = backend.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        backend.set(key, value, timeout)
+    return value
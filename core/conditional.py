@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.db.models import Max, Subquery
+from django.views.decorators.http import condition
+
+from .models import PaymentSettings
+
+_MISSING = object()
+_template_stamp: datetime | None = None
+
+
+def settings_updated_at():
+    """Aggregate expression for PaymentSettings.updated_at, usable inside a validator's single query.
+
+    Contact details from PaymentSettings appear on every page (site_info), so every
+    validator includes them without paying for a second query.
+    """
+
+    return Max(Subquery(PaymentSettings.objects.order_by().filter(pk=1).values("updated_at")[:1]))
+
+
+def template_stamp() -> datetime:
+    """Newest template mtime, computed once per process; a deploy changes every validator."""
+    global _template_stamp
+    if _template_stamp is None:
+        newest = 0.0
+        for path in (Path(settings.BASE_DIR) / "templates").rglob("*"):
+            try:
+                newest = max(newest, path.stat().st_mtime)
+            except OSError:
+                continue
+        _template_stamp = datetime.fromtimestamp(int(newest), tz=dt_timezone.utc)
+    return _template_stamp
+
+
+def conditional_page(validator: Callable[..., dict | None]):
+    """Answer If-None-Match / If-Modified-Since with 304 before the view renders.
+
+    `validator(request, **kwargs)` returns a small dict of cheap values (ideally one
+    aggregate query: max(updated_at), counts) or None when the object is missing,
+    in which case the view runs normally (and usually raises 404). The result is
+    memoized on the request so ETag and Last-Modified share one query.
+    """
+
+    def _values(request, *args, **kwargs):
+        values = getattr(request, "_conditional_validators", _MISSING)
+        if values is _MISSING:
+            values = validator(request, *args, **kwargs)
+            request._conditional_validators = values
+        return values
+
+    def etag_func(request, *args, **kwargs):
+        values = _values(request, *args, **kwargs)
+        if values is None:
+            return None
+        payload = json.dumps(
+            [values, request.GET.urlencode(), template_stamp().isoformat()],
+            default=str,
+            sort_keys=True,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        values = _values(request, *args, **kwargs)
+        if values is None:
+            return None
+        stamps = [value for value in values.values() if isinstance(value, datetime)]
+        stamps.append(template_stamp())
+        return max(stamps)
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# SQLite calls the progress handler every this many VM instructions.
+SQLITE_PROGRESS_STEPS = 1000
+
+
+def breaker_seconds() -> float:
+    try:
+        return max(0.0, float(getattr(settings, "DB_BREAKER_SECONDS", 30)))
+    except (TypeError, ValueError):
+        return 30.0
+
+
+class CircuitBreaker:
+    """Remembers a recent database failure so requests stop queueing on a sick database.
+
+    `trip()` opens the breaker for `DB_BREAKER_SECONDS`; while it is open, pages
+    with a last good copy are served from it without touching the database and
+    visit tracking is skipped. A successful render or revalidation closes it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open_until = 0.0
+        self.trips = 0
+
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def trip(self) -> None:
+        with self._lock:
+            if not self.is_open():
+                logger.warning("Database breaker opened for %.0fs", breaker_seconds())
+            self._open_until = time.monotonic() + breaker_seconds()
+            self.trips += 1
+
+    def reset(self) -> None:
+        if not self._open_until:
+            return
+        with self._lock:
+            if self.is_open():
+                logger.info("Database breaker closed")
+            self._open_until = 0.0
+
+
+database_breaker = CircuitBreaker()
+
+
+@contextmanager
+def statement_timeout(seconds: float | None, using: str = "default"):
+    """Abort any single query in this block that runs longer than `seconds` (DatabaseError).
+
+    MySQL/MariaDB SELECTs get a server-side execution limit added to the
+    statement itself (no extra round trip); SQLite is interrupted through a
+    progress handler. Other backends run unchanged.
+    """
+
+    connection = connections[using]
+    if not seconds or connection.vendor not in ("sqlite", "mysql"):
+        yield
+        return
+
+    if connection.vendor == "sqlite":
+        connection.ensure_connection()
+        raw = connection.connection
+        deadline = [0.0]
+
+        def start_clock(execute, sql, params, many, context):
+            deadline[0] = time.monotonic() + seconds
+            return execute(sql, params, many, context)
+
+        raw.set_progress_handler(lambda: time.monotonic() > deadline[0], SQLITE_PROGRESS_STEPS)
+        try:
+            with connection.execute_wrapper(start_clock):
+                yield
+        finally:
+            raw.set_progress_handler(None, 0)
+        return
+
+    if connection.mysql_is_mariadb:
+        prefix = f"SET STATEMENT max_statement_time={seconds:g} FOR "
+    else:
+        prefix = None
+    milliseconds = max(1, int(seconds * 1000))
+
+    def limit(execute, sql, params, many, context):
+        statement = sql.lstrip()
+        if statement[:6].upper() == "SELECT":
+            if prefix:
+                sql = prefix + statement
+            else:
+                sql = f"SELECT /*+ MAX_EXECUTION_TIME({milliseconds}) */" + statement[6:]
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(limit):
+        yield
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import mimetypes
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import PurePosixPath
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+SENDFILE_NGINX = "nginx"
+SENDFILE_APACHE = "apache"
+
+
+def _setting_int(name: str, default: int) -> int:
+    raw = getattr(settings, name, default)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def sendfile_backend() -> str:
+    backend = (getattr(settings, "DOWNLOAD_SENDFILE_BACKEND", "") or "").strip().lower()
+    return backend if backend in (SENDFILE_NGINX, SENDFILE_APACHE) else ""
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single byte range into inclusive (start, end).
+
+    Returns None when the whole file should be sent: no header, another unit, a
+    multi-range request or a malformed value (RFC 9110 lets servers ignore those).
+    """
+
+    match = RANGE_RE.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _if_range_allows(request, etag: str | None, last_modified: int | None) -> bool:
+    """If-Range: serve the range only when the client's copy is still current.
+
+    Entity tags use the strong comparison (RFC 9110 13.1.5): the ETag here is
+    always strong, so a weak `W/` validator never matches and the client gets
+    the whole file.
+    """
+    value = (request.META.get("HTTP_IF_RANGE") or "").strip()
+    if not value:
+        return True
+    if value.startswith(('"', "W/")):
+        return etag is not None and value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and last_modified is not None and since == last_modified
+
+
+def _iter_range(handle, start: int, length: int):
+    try:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def _file_meta(field_file) -> tuple[int, int | None]:
+    storage = field_file.storage
+    try:
+        size = storage.size(field_file.name)
+    except (OSError, NotImplementedError) as exc:
+        raise Http404("File not found") from exc
+    try:
+        modified = int(storage.get_modified_time(field_file.name).timestamp())
+    except (OSError, NotImplementedError):
+        modified = None
+    return size, modified
+
+
+def _local_path(field_file) -> str | None:
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def _sendfile_response(backend: str, field_file) -> HttpResponse | None:
+    path = _local_path(field_file)
+    if path is None:
+        return None
+    response = HttpResponse()
+    if backend == SENDFILE_NGINX:
+        prefix = (getattr(settings, "DOWNLOAD_ACCEL_PREFIX", "/protected-media/") or "/").rstrip("/")
+        response["X-Accel-Redirect"] = f"{prefix}/{quote(field_file.name)}"
+    else:
+        response["X-Sendfile"] = path
+    # The proxy fills in the body, Content-Length and any Range handling.
+    return response
+
+
+def serve_field_file(request, field_file, *, counter_key: tuple | None = None, as_attachment: bool = False):
+    """Stream a stored file with Range/If-Range support, or hand it to the front proxy.
+
+    `counter_key` is `(model, pk, field)`; a hit is recorded for every GET that
+    starts at byte 0 so resumed chunks of one download are counted once.
+    """
+
+    if not field_file:
+        raise Http404("File not found")
+
+    size, modified = _file_meta(field_file)
+    etag = f'"{size:x}-{modified:x}"' if modified is not None else None
+    filename = PurePosixPath(field_file.name).name
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=modified)
+    if not_modified is not None:
+        return _finish(not_modified, etag, modified)
+
+    range_header = request.META.get("HTTP_RANGE")
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        response["Accept-Ranges"] = "bytes"
+        # Only this request's Range was wrong; shared caches must not keep the error.
+        patch_cache_control(response, no_store=True)
+        return response
+    if byte_range is not None and not _if_range_allows(request, etag, modified):
+        byte_range = None
+
+    if counter_key is not None and request.method == "GET" and (byte_range is None or byte_range[0] == 0):
+        download_counter.hit(*counter_key)
+
+    backend = sendfile_backend()
+    if backend:
+        response = _sendfile_response(backend, field_file)
+        if response is not None:
+            response["Content-Type"] = content_type
+            response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+            return _finish(response, etag, modified)
+
+    try:
+        handle = field_file.storage.open(field_file.name, "rb")
+    except OSError as exc:
+        raise Http404("File not found") from exc
+
+    if byte_range is None:
+        response = FileResponse(handle, as_attachment=as_attachment, filename=filename, content_type=content_type)
+        response.block_size = CHUNK_SIZE
+        return _finish(response, etag, modified)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_iter_range(handle, start, length), status=206, content_type=content_type)
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    return _finish(response, etag, modified)
+
+
+def _finish(response, etag: str | None, modified: int | None):
+    response["Accept-Ranges"] = "bytes"
+    if etag:
+        response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    patch_cache_control(response, public=True, max_age=_setting_int("DOWNLOAD_CACHE_SECONDS", 3600))
+    return response
+
+
+class DownloadCounter:
+    """Accumulate download hits in memory and write them with one UPDATE per object.
+
+    Flushes when DOWNLOAD_COUNT_FLUSH_SECONDS have passed or DOWNLOAD_COUNT_FLUSH_HITS
+    hits are pending, and at interpreter exit. A crashed worker loses at most one
+    buffer's worth of counts, which is acceptable for statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Counter = Counter()
+        self._last_flush = time.monotonic()
+
+    def hit(self, model, pk, field: str) -> None:
+        with self._lock:
+            self._pending[(model._meta.label, pk, field)] += 1
+            due = (
+                sum(self._pending.values()) >= _setting_int("DOWNLOAD_COUNT_FLUSH_HITS", 50)
+                or time.monotonic() - self._last_flush >= _setting_int("DOWNLOAD_COUNT_FLUSH_SECONDS", 60)
+            )
+        if due:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        written = 0
+        for (label, pk, field), hits in pending.items():
+            try:
+                apps.get_model(label).objects.filter(pk=pk).update(**{field: F(field) + hits})
+            except Exception:
+                logger.exception("Failed to record %s download(s) for %s #%s", hits, label, pk)
+                with self._lock:
+                    self._pending[(label, pk, field)] += hits
+                continue
+            written += hits
+        return written
+
+
+download_counter = DownloadCounter()
+
+
+def _flush_at_exit() -> None:
+    try:
+        download_counter.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
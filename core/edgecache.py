@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+
+if TYPE_CHECKING:
+    import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# List keys: purged when something joins or leaves the list (object keys cover edits).
+PRODUCT_LIST = "products"
+CATEGORY_LIST = "categories"
+NEWS_LIST = "news"
+DOWNLOAD_LIST = "downloads"
+# The home page's latest approved reviews.
+REVIEW_LIST = "reviews"
+# Contact details from PaymentSettings are on every page.
+SETTINGS = "settings"
+
+FORMAT_CLOUDFLARE = "cloudflare"
+FORMAT_FASTLY = "fastly"
+# Largest number of keys each API accepts in one purge request.
+BATCH_LIMITS = {FORMAT_CLOUDFLARE: 30, FORMAT_FASTLY: 256}
+PURGE_ATTEMPTS = 3
+
+
+def product_key(pk) -> str:
+    return f"product-{pk}"
+
+
+def category_key(pk) -> str:
+    return f"category-{pk}"
+
+
+def category_products_key(pk) -> str:
+    """The product list of one category page; a product moving in or out purges it."""
+    return f"category-{pk}-products"
+
+
+def news_key(pk) -> str:
+    return f"news-{pk}"
+
+
+def _setting_number(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(getattr(settings, name, default)))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def edge_cache_seconds() -> int:
+    return int(_setting_number("EDGE_CACHE_SECONDS", 0))
+
+
+def add_keys(request, *keys: str) -> None:
+    """Record the objects a view rendered; `edge_cached` puts them in the response headers."""
+    request._surrogate_keys = getattr(request, "_surrogate_keys", set()) | set(keys)
+
+
+def _shareable(request, response) -> bool:
+    if request.method not in ("GET", "HEAD") or response.status_code not in (200, 304) or response.cookies:
+        return False
+    # Same rules as the page cache: sessions and flash messages make a page personal,
+    # and a CSRF token is tied to the visitor it was issued to.
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+        return False
+    return not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+
+
+def _header_values(response, name: str) -> list[str]:
+    return [value.strip() for value in response.get(name, "").split(",") if value.strip()]
+
+
+def restrict_to_visitor(response) -> None:
+    """Final say on a `public` response, once every middleware has added its cookies.
+
+    A response that sets a cookie (the visitor cookie, a new session) is turned
+    `private`: the edge must not hand one visitor's Set-Cookie to the next.
+    Otherwise `Cookie` is dropped from Vary. Shareable pages were rendered for a
+    request without session or messages cookies, the edge bypasses its cache for
+    requests that have them, and any other cookie (visitor, CSRF) does not change
+    the page, so varying on it would only split the edge's copy per visitor.
+    """
+    if "public" not in (value.lower() for value in _header_values(response, "Cache-Control")):
+        return
+    if response.cookies:
+        del response["Cache-Control"]
+        patch_cache_control(response, private=True, no_cache=True)
+        return
+    vary = [value for value in _header_values(response, "Vary") if value.lower() != "cookie"]
+    if vary:
+        response["Vary"] = ", ".join(vary)
+    elif response.has_header("Vary"):
+        del response["Vary"]
+
+
+def edge_cached(*keys: str, skip_params: tuple[str, ...] = ()):
+    """Mark a view's anonymous responses cacheable by a CDN and tag them for purging.
+
+    The response gets `Surrogate-Key` (Fastly, space separated) and `Cache-Tag`
+    (Cloudflare, comma separated) headers listing `keys`, `settings` and every
+    key the view recorded with `add_keys()`. Shareable responses get
+    `Cache-Control: public, max-age=0, s-maxage=EDGE_CACHE_SECONDS`: browsers
+    revalidate with the ETag, the edge keeps the page until it expires or one
+    of its keys is purged. Anything personal, and responses to requests that
+    carry one of `skip_params` (free-text search: no purge can track which
+    results an edit changes), is marked `private`.
+
+    Apply it inside `cache_anonymous_page` so stored copies keep the headers,
+    and outside `conditional_page` so 304s carry the same Cache-Control.
+    Cookies added after the view are handled by `SharedCacheMiddleware`.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                # A 304 leaves the edge's stored tags alone; only full pages list them.
+                tags = sorted({*keys, SETTINGS, *getattr(request, "_surrogate_keys", ())})
+                response["Surrogate-Key"] = " ".join(tags)
+                response["Cache-Tag"] = ",".join(tags)
+            if _shareable(request, response) and not any(request.GET.get(name) for name in skip_params):
+                directives = {"public": True, "max_age": 0, "s_maxage": edge_cache_seconds()}
+                stale_seconds = int(_setting_number("PAGE_STALE_IF_ERROR_SECONDS", 0))
+                if stale_seconds:
+                    directives["stale_if_error"] = stale_seconds
+                patch_cache_control(response, **directives)
+            else:
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class PurgeDispatcher:
+    """Per-process daemon thread that sends purge requests for keys queued by model signals.
+
+    Keys queued within `CDN_PURGE_DELAY` seconds of each other go out together,
+    `CDN_PURGE_BATCH_SIZE` keys per request, so an admin bulk action or an
+    import sends a few requests rather than one per row. A failed request is
+    retried up to PURGE_ATTEMPTS times; after that the pages stay at the edge
+    until `EDGE_CACHE_SECONDS` runs out.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._pending: set[str] = set()
+        self._thread: threading.Thread | None = None
+        self.requests_sent = 0
+
+    def enqueue(self, keys) -> None:
+        with self._lock:
+            self._pending.update(keys)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="cdn-purge-worker", daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def _run(self) -> None:
+        while True:
+            self._event.wait()
+            time.sleep(_setting_number("CDN_PURGE_DELAY", 0.5))
+            self._event.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("CDN purge worker failed")
+
+    def flush(self) -> int:
+        """Send every queued key now. Returns the number of keys purged."""
+        with self._lock:
+            keys, self._pending = sorted(self._pending), set()
+        size = purge_batch_size()
+        purged = 0
+        for start in range(0, len(keys), size):
+            batch = keys[start : start + size]
+            if self._send(batch):
+                purged += len(batch)
+        return purged
+
+    def _send(self, keys: list[str]) -> bool:
+        import urllib.request
+
+        for attempt in range(1, PURGE_ATTEMPTS + 1):
+            try:
+                with urllib.request.urlopen(build_purge_request(keys), timeout=10) as response:
+                    response.read()
+                self.requests_sent += 1
+                return True
+            except Exception as exc:
+                if attempt == PURGE_ATTEMPTS:
+                    logger.error("CDN purge of %s failed: %s", " ".join(keys), exc)
+                    return False
+                time.sleep(attempt)
+        return False
+
+
+def purge_format() -> str:
+    value = (getattr(settings, "CDN_PURGE_FORMAT", FORMAT_CLOUDFLARE) or FORMAT_CLOUDFLARE).strip().lower()
+    return value if value in BATCH_LIMITS else FORMAT_CLOUDFLARE
+
+
+def purge_batch_size() -> int:
+    limit = BATCH_LIMITS[purge_format()]
+    return max(1, min(limit, int(_setting_number("CDN_PURGE_BATCH_SIZE", limit))))
+
+
+def build_purge_request(keys: list[str]) -> urllib.request.Request:
+    """One purge call: Cloudflare's `{"tags": [...]}` or Fastly's `{"surrogate_keys": [...]}`."""
+    import urllib.request
+
+    token = (getattr(settings, "CDN_PURGE_TOKEN", "") or "").strip()
+    headers = {"Content-Type": "application/json"}
+    if purge_format() == FORMAT_FASTLY:
+        body = {"surrogate_keys": keys}
+        if token:
+            headers["Fastly-Key"] = token
+    else:
+        body = {"tags": keys}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+    return urllib.request.Request(
+        settings.CDN_PURGE_URL,
+        data=json.dumps(body).encode("utf-8"),
+        headers=headers,
+        method="POST",
+    )
+
+
+def purge_enabled() -> bool:
+    return bool((getattr(settings, "CDN_PURGE_URL", "") or "").strip())
+
+
+dispatcher = PurgeDispatcher()
+
+
+def purge(*keys: str) -> None:
+    """Purge `keys` at the edge once the current transaction commits (no-op without CDN_PURGE_URL)."""
+    if keys and purge_enabled():
+        transaction.on_commit(lambda: dispatcher.enqueue(keys))
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import TieredCache
+from .dbguard import database_breaker
+
+CATALOG = "catalog"
+NEWS = "news"
+SETTINGS = "settings"
+DOWNLOADS = "downloads"
+# Superuser emails that receive contact-form notifications.
+ADMINS = "admins"
+NAMESPACES = (CATALOG, NEWS, SETTINGS, DOWNLOADS, ADMINS)
+
+
+def poll_seconds() -> float:
+    try:
+        return max(0.0, float(getattr(settings, "CACHE_GENERATION_POLL_SECONDS", 2)))
+    except (TypeError, ValueError):
+        return 2.0
+
+
+def drop_local_caches() -> None:
+    """Clear the L1 of every TieredCache alias in this process."""
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        if isinstance(backend, TieredCache):
+            backend.clear_local()
+
+
+class Generations:
+    """This process's copy of the CacheGeneration table.
+
+    The table is re-read at most once every `CACHE_GENERATION_POLL_SECONDS`
+    (one `SELECT namespace, value` over a handful of rows), so a bump made by
+    another worker or node changes this process's versioned keys within that
+    interval. With polling off (0) only bumps made in this process are seen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict[str, int] = {}
+        self._loaded = False
+        self._checked_at: float | None = None
+
+    def _poll(self) -> None:
+        from .models import CacheGeneration
+
+        if database_breaker.is_open():
+            # Keep the last known values rather than queue behind a failing database.
+            return
+        try:
+            values = dict(CacheGeneration.objects.values_list("namespace", "value"))
+        except DatabaseError:
+            # Table not migrated yet or the DB is unreachable: keep the last known values.
+            return
+        if self._loaded and values != self._values:
+            # Entries cached under the old keys can no longer be read; free L1 for new ones.
+            drop_local_caches()
+        self._values, self._loaded = values, True
+
+    def get(self, namespace: str) -> int:
+        interval = poll_seconds()
+        with self._lock:
+            now = time.monotonic()
+            if interval and (self._checked_at is None or now - self._checked_at >= interval):
+                self._checked_at = now
+                self._poll()
+            return self._values.get(namespace, 0)
+
+    def bump(self, namespace: str) -> None:
+        from .models import CacheGeneration
+
+        changes = {"value": F("value") + 1, "updated_at": timezone.now()}
+        if not CacheGeneration.objects.filter(namespace=namespace).update(**changes):
+            CacheGeneration.objects.get_or_create(namespace=namespace)
+            CacheGeneration.objects.filter(namespace=namespace).update(**changes)
+        with self._lock:
+            if poll_seconds():
+                # Re-read on the next lookup so this process agrees with the table.
+                self._checked_at = None
+            else:
+                self._values[namespace] = self._values.get(namespace, 0) + 1
+        drop_local_caches()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+            self._loaded = False
+            self._checked_at = None
+
+
+generations = Generations()
+
+
+def bump(*namespaces: str) -> None:
+    """Invalidate everything cached under keys versioned by `namespaces`, in every process."""
+    for name in namespaces:
+        generations.bump(name)
+
+
+def token(*namespaces: str) -> str:
+    """`catalog`, `news` -> `"12.4"`: changes whenever one of the namespaces is bumped."""
+    return ".".join(str(generations.get(name)) for name in namespaces)
+
+
+def versioned_key(key: str, *namespaces: str) -> str:
+    """`home:sections` + (catalog, news) -> `home:sections:g12.4`."""
+    return f"{key}:g{token(*namespaces)}"
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import hashlib
+import math
+
+DEFAULT_PRECISION = 12  # 4096 one-byte registers, ~1.6% standard error
+_INVERSE_POWERS = [2.0**-rank for rank in range(66)]
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch.
+
+    Serialized as one precision byte followed by one byte per register, so a
+    sketch is about 4 KB whatever the number of visitors, and the union of any
+    number of days is the register-wise maximum of their sketches.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: bytes | None = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << precision)
+        if len(self.registers) != 1 << precision:
+            raise ValueError("register count does not match precision")
+
+    @classmethod
+    def from_bytes(cls, data: bytes | memoryview | None) -> HyperLogLog:
+        if not data:
+            return cls()
+        data = bytes(data)
+        return cls(data[0], data[1:])
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + bytes(self.registers)
+
+    def add(self, value: str) -> bool:
+        """Add one item; True if the sketch changed (i.e. it needs saving)."""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        width = 64 - self.precision
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def update(self, other: HyperLogLog) -> bool:
+        """Merge `other` into this sketch; True if anything changed."""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        merged = bytearray(map(max, self.registers, other.registers))
+        if merged == self.registers:
+            return False
+        self.registers = merged
+        return True
+
+    def count(self) -> int:
+        size = len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / size)) * size * size / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Small-range correction (linear counting).
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
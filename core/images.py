@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Iterable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from core.utils.images import RenderedVariant, render_variants
+
+from .models import ImageDerivative
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_ROOT = "derivatives"
+
+
+def _setting_int(name: str, default: int) -> int:
+    raw = getattr(settings, name, default)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def derivative_widths() -> list[int]:
+    raw = getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", (480, 960, 1600))
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    widths: set[int] = set()
+    for item in raw:
+        try:
+            width = int(str(item).strip())
+        except ValueError:
+            continue
+        if width > 0:
+            widths.add(width)
+    return sorted(widths)
+
+
+def derivative_quality() -> int:
+    return max(1, min(95, _setting_int("IMAGE_DERIVATIVE_QUALITY", 80)))
+
+
+def derivatives_on_upload() -> bool:
+    return bool(getattr(settings, "IMAGE_DERIVATIVES_ON_UPLOAD", True))
+
+
+def derivative_name(source_name: str, width: int, fmt: str) -> str:
+    stem = PurePosixPath(source_name).with_suffix("")
+    extension = "jpg" if fmt == ImageDerivative.FORMAT_JPEG else fmt
+    return f"{DERIVATIVES_ROOT}/{stem}-{width}w.{extension}"
+
+
+def delete_derivatives(source_names: Iterable[str]) -> int:
+    """Remove derivative rows and files for the given originals."""
+    rows = list(ImageDerivative.objects.filter(source_name__in=set(source_names)).values_list("pk", "file"))
+    for _pk, file_name in rows:
+        try:
+            default_storage.delete(file_name)
+        except OSError:
+            logger.warning("Could not delete image derivative %s", file_name)
+    ImageDerivative.objects.filter(pk__in=[pk for pk, _file in rows]).delete()
+    return len(rows)
+
+
+def save_derivatives(source_name: str, source_bytes: int, variants: list[RenderedVariant]) -> list[ImageDerivative]:
+    """Replace the stored derivatives of `source_name` with freshly rendered variants."""
+    delete_derivatives([source_name])
+    rows: list[ImageDerivative] = []
+    for variant in variants:
+        target = derivative_name(source_name, variant.width, variant.format)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        stored_name = default_storage.save(target, ContentFile(variant.data))
+        rows.append(
+            ImageDerivative(
+                source_name=source_name,
+                width=variant.width,
+                height=variant.height,
+                format=variant.format,
+                file=stored_name,
+                bytes=len(variant.data),
+                source_bytes=source_bytes,
+            )
+        )
+    return ImageDerivative.objects.bulk_create(rows)
+
+
+def read_source(source_name: str) -> bytes:
+    with default_storage.open(source_name, "rb") as handle:
+        return handle.read()
+
+
+def generate_derivatives(source_name: str) -> list[ImageDerivative]:
+    data = read_source(source_name)
+    variants = render_variants(data, derivative_widths(), derivative_quality())
+    return save_derivatives(source_name, len(data), variants)
+
+
+def schedule_derivatives(source_name: str, touch: QuerySet | None = None) -> None:
+    """Render derivatives for a new upload once the surrounding transaction commits.
+
+    `touch` is a queryset of the owning rows; their updated_at is bumped afterwards
+    so conditional GET validators pick up the new srcset markup.
+    """
+
+    if not source_name or not derivatives_on_upload():
+        return
+
+    def run():
+        try:
+            if ImageDerivative.objects.filter(source_name=source_name).exists():
+                return
+            if generate_derivatives(source_name) and touch is not None:
+                touch.update(updated_at=timezone.now())
+        except Exception:
+            logger.exception("Failed to generate image derivatives for %s", source_name)
+
+    transaction.on_commit(run)
+
+
+@dataclass(frozen=True)
+class ResponsiveImage:
+    """`srcset` values for one original; empty when no derivative exists."""
+
+    webp: str = ""
+    jpeg: str = ""
+
+    def __bool__(self) -> bool:
+        return bool(self.webp or self.jpeg)
+
+
+def responsive_images(source_names: Iterable[str]) -> dict[str, ResponsiveImage]:
+    """Look up srcsets for many originals with one query."""
+    names = {name for name in source_names if name}
+    if not names:
+        return {}
+    candidates: dict[str, dict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+    rows = (
+        ImageDerivative.objects.filter(source_name__in=names)
+        .order_by("width")
+        .values_list("source_name", "format", "width", "file")
+    )
+    for source_name, fmt, width, file_name in rows:
+        candidates[source_name][fmt].append(f"{default_storage.url(file_name)} {width}w")
+    return {
+        name: ResponsiveImage(
+            webp=", ".join(formats.get(ImageDerivative.FORMAT_WEBP, [])),
+            jpeg=", ".join(formats.get(ImageDerivative.FORMAT_JPEG, [])),
+        )
+        for name, formats in candidates.items()
+    }
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# What a gunicorn/Passenger worker does before its first request: load the WSGI
+# entry point (settings, apps, signals, middleware) and the URLconf with every view module.
+BOOT_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+# __import__, not importlib.import_module: only import statements are timed by -X importtime.
+__import__(sys.argv[1])
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+@dataclass(frozen=True)
+class ImportTiming:
+    """One line of `python -X importtime` output (microseconds)."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.partition(".")[0]
+
+
+@dataclass(frozen=True)
+class BootReport:
+    imports: list[ImportTiming]
+    seconds: float
+    max_rss_kb: int
+
+    @property
+    def import_ms(self) -> float:
+        return sum(timing.self_us for timing in self.imports) / 1000
+
+    def loaded(self, module: str) -> bool:
+        """True when `module` (or any of its submodules) was imported during boot."""
+        return any(timing.module == module or timing.module.startswith(f"{module}.") for timing in self.imports)
+
+    def importers(self, module: str) -> list[str]:
+        """`module` followed by the chain of modules that imported it, up to the boot script."""
+        matches = [index for index, timing in enumerate(self.imports) if timing.module == module]
+        if not matches:
+            return [module]
+        # -X importtime prints a module after everything it imported, so importers come later.
+        index = matches[0]
+        chain, depth = [module], self.imports[index].depth
+        for timing in self.imports[index + 1 :]:
+            if timing.depth < depth:
+                chain.append(timing.module)
+                depth = timing.depth
+        return chain
+
+    def by_package(self) -> list[tuple[str, float]]:
+        """(top-level package, milliseconds spent importing its modules), slowest first."""
+        totals: dict[str, int] = defaultdict(int)
+        for timing in self.imports:
+            totals[timing.package] += timing.self_us
+        return sorted(((name, us / 1000) for name, us in totals.items()), key=lambda item: -item[1])
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """Parse the `import time: self | cumulative | name` lines of `-X importtime` stderr."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            # The header line: "self [us] | cumulative | imported package".
+            continue
+        # CPython indents the name two spaces per nesting level after one separator space.
+        indent = len(name) - len(name.lstrip(" ")) - 1
+        timings.append(
+            ImportTiming(
+                module=name.strip(),
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=max(0, indent // 2),
+            )
+        )
+    return timings
+
+
+def measure_boot(entry_point: str = "shopproject.wsgi", env: dict[str, str] | None = None) -> BootReport:
+    """Boot `entry_point` in a fresh interpreter under `-X importtime` and report what it loaded."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT, entry_point],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        timeout=120,
+        check=True,
+    )
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    return BootReport(
+        imports=parse_importtime(result.stderr),
+        seconds=summary["seconds"],
+        max_rss_kb=int(summary["max_rss_kb"]),
+    )
+
+
+def preload(modules) -> None:
+    """Import `modules` now, e.g. in a preloading master so forked workers share them.
+
+    A module that fails to import is logged and skipped; it will load (or fail)
+    on first use as it would without the warm-up.
+    """
+
+    started = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            logger.exception("Could not preload %s", name)
+    logger.info("Preloaded %d module(s) in %.0f ms", len(modules), (time.perf_counter() - started) * 1000)
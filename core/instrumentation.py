@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import contextvars
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+_active: contextvars.ContextVar["RequestMetrics | None"] = contextvars.ContextVar("request_metrics", default=None)
+_MISSING = object()
+_cache_hooked_classes: set[type] = set()
+_cache_hooks_lock = threading.Lock()
+
+
+def instrumentation_enabled() -> bool:
+    return bool(getattr(settings, "INSTRUMENTATION_ENABLED", True))
+
+
+def sample_rate() -> float:
+    try:
+        rate = float(getattr(settings, "INSTRUMENTATION_SAMPLE_RATE", 1.0))
+    except (TypeError, ValueError):
+        rate = 1.0
+    return max(0.0, min(1.0, rate))
+
+
+def should_sample() -> bool:
+    rate = sample_rate()
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+@dataclass
+class RequestMetrics:
+    total_seconds: float = 0.0
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    template_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing header (durations in milliseconds)."""
+        return ", ".join(
+            [
+                f"total;dur={self.total_seconds * 1000:.1f}",
+                f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries"',
+                f"tpl;dur={self.template_seconds * 1000:.1f}",
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            ]
+        )
+
+
+def current_metrics() -> RequestMetrics | None:
+    return _active.get()
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    metrics = _active.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_count += 1
+        metrics.sql_seconds += time.perf_counter() - started
+
+
+def _instrument_get(original):
+    @wraps(original)
+    def get(self, key, default=None, version=None):
+        metrics = _active.get()
+        if metrics is None:
+            return original(self, key, default, version)
+        # A backend that reads through another one (TieredCache -> L2) counts once.
+        token = _active.set(None)
+        try:
+            value = original(self, key, _MISSING, version)
+        finally:
+            _active.reset(token)
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+    get._instrumented = True
+    return get
+
+
+def _instrument_get_many(original):
+    @wraps(original)
+    def get_many(self, keys, version=None):
+        metrics = _active.get()
+        if metrics is None:
+            return original(self, keys, version)
+        keys = list(keys)
+        # Backends without a native get_many fall back to get(); count those once.
+        token = _active.set(None)
+        try:
+            result = original(self, keys, version)
+        finally:
+            _active.reset(token)
+        metrics.cache_hits += len(result)
+        metrics.cache_misses += len(keys) - len(result)
+        return result
+
+    get_many._instrumented = True
+    return get_many
+
+
+def install_cache_hooks() -> None:
+    """Wrap get/get_many on every configured cache backend class to count hits and misses.
+
+    Like the template render hook, the wrappers cost one context-variable lookup
+    when no request is being measured.
+    """
+
+    backend_classes = {type(caches[alias]) for alias in settings.CACHES}
+    if backend_classes <= _cache_hooked_classes:
+        return
+    with _cache_hooks_lock:
+        for backend_class in backend_classes - _cache_hooked_classes:
+            if not getattr(backend_class.get, "_instrumented", False):
+                backend_class.get = _instrument_get(backend_class.get)
+            if not getattr(backend_class.get_many, "_instrumented", False):
+                backend_class.get_many = _instrument_get_many(backend_class.get_many)
+            _cache_hooked_classes.add(backend_class)
+
+
+@contextmanager
+def measure_request():
+    """Collect SQL, template and cache timings for the code run inside the block."""
+    from core.templating import collect_template_timings
+
+    install_cache_hooks()
+    metrics = RequestMetrics()
+    token = _active.set(metrics)
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            timings = stack.enter_context(collect_template_timings())
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_sql_wrapper))
+            try:
+                yield metrics
+            finally:
+                metrics.template_seconds = timings.total_seconds
+    finally:
+        metrics.total_seconds = time.perf_counter() - started
+        _active.reset(token)
+
+
+@dataclass
+class ViewStat:
+    requests: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    template_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+class ViewStats:
+    """Per-view aggregates of sampled requests in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, ViewStat] = {}
+
+    def record(self, view_name: str, status_code: int, metrics: RequestMetrics) -> None:
+        with self._lock:
+            stat = self._stats.setdefault(view_name, ViewStat())
+            stat.requests += 1
+            stat.errors += 1 if status_code >= 500 else 0
+            stat.total_seconds += metrics.total_seconds
+            stat.max_seconds = max(stat.max_seconds, metrics.total_seconds)
+            stat.sql_count += metrics.sql_count
+            stat.sql_seconds += metrics.sql_seconds
+            stat.template_seconds += metrics.template_seconds
+            stat.cache_hits += metrics.cache_hits
+            stat.cache_misses += metrics.cache_misses
+
+    def report(self) -> list[dict]:
+        with self._lock:
+            items = [(name, ViewStat(**asdict(stat))) for name, stat in self._stats.items()]
+        rows = []
+        for name, stat in items:
+            count = stat.requests or 1
+            rows.append(
+                {
+                    "view": name,
+                    "requests": stat.requests,
+                    "errors": stat.errors,
+                    "avg_ms": round(stat.total_seconds / count * 1000, 3),
+                    "max_ms": round(stat.max_seconds * 1000, 3),
+                    "avg_queries": round(stat.sql_count / count, 2),
+                    "avg_sql_ms": round(stat.sql_seconds / count * 1000, 3),
+                    "avg_template_ms": round(stat.template_seconds / count * 1000, 3),
+                    "cache_hits": stat.cache_hits,
+                    "cache_misses": stat.cache_misses,
+                }
+            )
+        rows.sort(key=lambda row: row["avg_ms"] * row["requests"], reverse=True)
+        return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+view_stats = ViewStats()
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import json
+import math
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import Client, override_settings
+from django.urls import NoReverseMatch, reverse
+
+from core.bots import is_bot
+from core.instrumentation import measure_request
+from core.models import DailyVisitStat, SiteVisit
+from core.querycheck import record_queries
+from core.synthetic import DatasetSize, build_dataset
+
+CRAWLER_USER_AGENT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+# A mix of browsers and bots for timing the User-Agent classifier.
+SAMPLE_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; SM-A546E) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:127.0) Gecko/20100101 Firefox/127.0",
+    CRAWLER_USER_AGENT,
+    "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+    "Mozilla/5.0 (compatible; YandexBot/3.0; +http://yandex.com/bots)",
+    "Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)",
+    "curl/8.5.0",
+    "python-requests/2.32.3",
+)
+WRITE_VERBS = {"INSERT", "UPDATE", "DELETE", "REPLACE"}
+
+INVOICE_PAYLOAD = {
+    "invoice_number": "#000123",
+    "title": "پیش‌فاکتور",
+    "issue_date": "1403/01/01",
+    "due_date": "1403/01/02",
+    "buyer_lines": ["رستوران نمونه", "تهران"],
+    "items": [{"name": f"قلم {index}", "desc": "شرح کالا", "qty": index + 1, "price": 12_500_000} for index in range(10)],
+    "notes": "اعتبار پیش‌فاکتور یک روز است.",
+}
+
+DATASET_OPTIONS = {
+    "categories": "Synthetic categories",
+    "products": "Products per category",
+    "features": "Features per product",
+    "images": "Images per product",
+    "reviews": "Approved reviews per product",
+    "news": "Projects/news entries",
+    "visits": "SiteVisit rows over the last 30 days",
+}
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    method: str = "get"
+    data: dict | None = None
+    staff: bool = False
+    json_body: bool = False
+
+
+@dataclass
+class Result:
+    name: str
+    path: str
+    status: int
+    p50_ms: float
+    p95_ms: float
+    mean_ms: float
+    queries: float
+    peak_kb: float
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _scenarios(staff_email: str) -> tuple[list[Scenario], list[str]]:
+    category = "bench-category-0"
+    scenarios = [
+        Scenario("home", reverse("home")),
+        Scenario("catalog", reverse("catalog")),
+        Scenario("catalog_search", reverse("catalog"), data={"q": "یخچال"}),
+        Scenario("catalog_category", reverse("catalog_category", kwargs={"category_slug": category})),
+        Scenario(
+            "catalog_product",
+            reverse("catalog_product", kwargs={"category_slug": category, "product_slug": "bench-0-0"}),
+        ),
+        Scenario("catalog_suggest", reverse("catalog_suggest"), data={"q": "Rational"}),
+        Scenario("sitemap_xml", reverse("sitemap_xml")),
+        Scenario("sitemap_section", reverse("sitemap_section", kwargs={"number": 1})),
+        Scenario("manual_invoice_pdf", reverse("manual_invoice_pdf"), "post", INVOICE_PAYLOAD, True, True),
+    ]
+    skipped = []
+    for app, prefix in (("otp_email", "email_otp"), ("otp_sms", "sms_otp")):
+        try:
+            if not apps.is_installed(app):
+                raise NoReverseMatch
+            request_url, verify_url = reverse(f"{prefix}_request"), reverse(f"{prefix}_verify")
+        except NoReverseMatch:
+            skipped.append(f"{prefix}_request/{prefix}_verify ({app} is not installed or routed)")
+            continue
+        data = {"email": staff_email, "phone": "09120000000"}
+        scenarios += [
+            Scenario(f"{prefix}_request", request_url, "post", data, True),
+            Scenario(f"{prefix}_verify", verify_url, "post", {**data, "token": "000000"}, True),
+        ]
+    return scenarios, skipped
+
+
+def _bot_hits() -> int:
+    return DailyVisitStat.objects.aggregate(total=Sum("bot_hits"))["total"] or 0
+
+
+def _classifier_cost(calls: int) -> dict:
+    """Microseconds per classification, without and with the per-UA cache."""
+    agents = [SAMPLE_USER_AGENTS[index % len(SAMPLE_USER_AGENTS)] for index in range(calls)]
+    started = time.perf_counter()
+    for agent in agents:
+        is_bot.__wrapped__(agent)
+    uncached = time.perf_counter() - started
+
+    is_bot.cache_clear()
+    started = time.perf_counter()
+    for agent in agents:
+        is_bot(agent)
+    cached = time.perf_counter() - started
+    return {
+        "calls": calls,
+        "uncached_us": round(uncached / calls * 1e6, 3),
+        "cached_us": round(cached / calls * 1e6, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark key views against a synthetic catalog; all data is rolled back afterwards."
+
+    def add_arguments(self, parser):
+        defaults = DatasetSize()
+        for name, unit in DATASET_OPTIONS.items():
+            default = getattr(defaults, name)
+            parser.add_argument(f"--{name}", type=int, default=default, help=f"{unit} (default {default}).")
+        parser.add_argument("--iterations", type=int, default=30, help="Measured requests per view.")
+        parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per view before timing.")
+        parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic data.")
+        parser.add_argument("--only", default="", help="Comma-separated scenario names to run.")
+        parser.add_argument("--json", dest="json_path", default="", help="Write results to this JSON file.")
+        parser.add_argument("--compare", default="", help="JSON file from an earlier run to compare against.")
+        parser.add_argument(
+            "--crawler-hits",
+            type=int,
+            default=0,
+            help="Also send this many cookieless crawler requests and report sessions/visits created and writes per hit.",
+        )
+        parser.add_argument(
+            "--classifier-calls",
+            type=int,
+            default=0,
+            help="Also time this many bot/browser User-Agent classifications, uncached and cached.",
+        )
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Serve anonymous pages from the page cache (core.pagecache), as in production.",
+        )
+
+    def handle(self, *args, **options):
+        size = DatasetSize(**{name: max(0, options[name]) for name in DATASET_OPTIONS})
+        if size.categories < 1 or size.products < 1:
+            raise CommandError("--categories and --products must be at least 1.")
+        iterations = max(1, options["iterations"])
+        only = {name.strip() for name in options["only"].split(",") if name.strip()}
+        baseline = self._load_baseline(options["compare"])
+
+        media_root = tempfile.mkdtemp(prefix="styra-benchmark-")
+        overrides = override_settings(
+            MEDIA_ROOT=media_root,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            # A private cache keeps synthetic pages out of the shared cache.
+            CACHES={
+                "default": {
+                    "BACKEND": "core.caching.TieredCache",
+                    "OPTIONS": {
+                        **settings.CACHES["default"].get("OPTIONS", {}),
+                        "L2": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark"},
+                    },
+                },
+                "sessions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark-sessions"},
+            },
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            INSTRUMENTATION_ENABLED=False,
+            METRICS_ENABLED=False,
+            NPLUSONE_MODE="",
+            # Off unless asked for, so view timings stay comparable between runs.
+            PAGE_CACHE_SECONDS=300 if options["page_cache"] else 0,
+        )
+        try:
+            with overrides, transaction.atomic():
+                started = time.perf_counter()
+                dataset = build_dataset(size, seed=options["seed"])
+                build_seconds = time.perf_counter() - started
+                results, skipped = self._run(iterations, max(0, options["warmup"]), only)
+                crawler = self._crawl(options["crawler_hits"]) if options["crawler_hits"] > 0 else None
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        self.stdout.write(f"Dataset built in {build_seconds:.2f}s: {dataset}")
+        for note in skipped:
+            self.stdout.write(f"Skipped {note}")
+        self._print(results, baseline)
+        if crawler:
+            self.stdout.write(
+                f"Crawler load: {crawler['hits']} cookieless hits -> {crawler['sessions_created']} session(s), "
+                f"{crawler['visits_created']} SiteVisit row(s), {crawler['bot_hits']} bot hit(s), "
+                f"{crawler['queries_per_hit']} queries and "
+                f"{crawler['writes_per_hit']} writes per hit"
+            )
+
+        classifier = _classifier_cost(options["classifier_calls"]) if options["classifier_calls"] > 0 else None
+        if classifier:
+            self.stdout.write(
+                f"UA classifier: {classifier['uncached_us']} µs uncached, {classifier['cached_us']} µs cached "
+                f"per request ({classifier['calls']} calls)"
+            )
+
+        if options["json_path"]:
+            report = {
+                "meta": {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "seed": options["seed"],
+                    "iterations": iterations,
+                    "page_cache": options["page_cache"],
+                    "dataset": dataset,
+                    "database": connection.vendor,
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                },
+                "results": [asdict(result) for result in results],
+                "crawler": crawler,
+                "classifier": classifier,
+            }
+            Path(options["json_path"]).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            self.stdout.write(f"Wrote {options['json_path']}")
+
+    def _run(self, iterations: int, warmup: int, only: set[str]) -> tuple[list[Result], list[str]]:
+        user_model = get_user_model()
+        staff = user_model.objects.create_user(
+            **{user_model.USERNAME_FIELD: "benchmark-staff"}, email="bench@example.com", is_staff=True
+        )
+        anonymous, staff_client = Client(), Client()
+        staff_client.force_login(staff)
+
+        scenarios, skipped = _scenarios(staff.email)
+        if only:
+            unknown = only - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario.name in only]
+
+        results = []
+        for scenario in scenarios:
+            client = staff_client if scenario.staff else anonymous
+            results.append(self._measure(client, scenario, iterations, warmup))
+        return results, skipped
+
+    def _crawl(self, hits: int) -> dict:
+        """Fresh cookieless clients, like search-engine crawlers, hitting a public page."""
+        sessions_before = Session.objects.count()
+        visits_before = SiteVisit.objects.count()
+        bot_hits_before = _bot_hits()
+        queries = writes = 0
+        path = reverse("faq")
+        for _ in range(hits):
+            with record_queries() as log:
+                Client(HTTP_USER_AGENT=CRAWLER_USER_AGENT).get(path, secure=True)
+            queries += log.total
+            writes += sum(count for sql, count in log.counts.items() if sql.split(" ", 1)[0] in WRITE_VERBS)
+        return {
+            "hits": hits,
+            "sessions_created": Session.objects.count() - sessions_before,
+            "visits_created": SiteVisit.objects.count() - visits_before,
+            "bot_hits": _bot_hits() - bot_hits_before,
+            "queries_per_hit": round(queries / hits, 2),
+            "writes_per_hit": round(writes / hits, 2),
+        }
+
+    def _request(self, client: Client, scenario: Scenario):
+        if scenario.method == "post" and scenario.json_body:
+            response = client.post(
+                scenario.path, json.dumps(scenario.data), content_type="application/json", secure=True
+            )
+        else:
+            response = getattr(client, scenario.method)(scenario.path, scenario.data or {}, secure=True)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def _measure(self, client: Client, scenario: Scenario, iterations: int, warmup: int) -> Result:
+        for _ in range(warmup):
+            self._request(client, scenario)
+
+        durations, queries, status = [], [], 0
+        for _ in range(iterations):
+            with measure_request() as metrics:
+                status = self._request(client, scenario).status_code
+            durations.append(metrics.total_seconds * 1000)
+            queries.append(metrics.sql_count)
+
+        # Memory is traced in a separate request because tracemalloc slows everything down.
+        tracemalloc.start()
+        try:
+            self._request(client, scenario)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        ordered = sorted(durations)
+        return Result(
+            name=scenario.name,
+            path=scenario.path,
+            status=status,
+            p50_ms=round(_percentile(ordered, 50), 3),
+            p95_ms=round(_percentile(ordered, 95), 3),
+            mean_ms=round(statistics.fmean(durations), 3),
+            queries=round(statistics.fmean(queries), 2),
+            peak_kb=round(peak / 1024, 1),
+        )
+
+    def _load_baseline(self, path: str) -> dict[str, dict]:
+        if not path:
+            return {}
+        try:
+            report = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {path}: {exc}") from exc
+        return {row["name"]: row for row in report.get("results", [])}
+
+    def _print(self, results: list[Result], baseline: dict[str, dict]) -> None:
+        header = f"{'view':<22} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KB':>9}"
+        if baseline:
+            header += f" {'Δp50':>8} {'Δqueries':>9}"
+        self.stdout.write(header)
+        for result in results:
+            line = (
+                f"{result.name:<22} {result.status:>6} {result.p50_ms:>9.2f} {result.p95_ms:>9.2f} "
+                f"{result.queries:>8.1f} {result.peak_kb:>9.1f}"
+            )
+            previous = baseline.get(result.name)
+            if previous:
+                change = (result.p50_ms - previous["p50_ms"]) / previous["p50_ms"] * 100 if previous["p50_ms"] else 0.0
+                line += f" {change:>+7.1f}% {result.queries - previous['queries']:>+9.1f}"
+            self.stdout.write(line)
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sessions.base import clear_expired_in_batches
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in small batches with pauses between them (for cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per DELETE (default SESSION_CLEANUP_BATCH_SIZE).")
+        parser.add_argument("--pause", type=float, default=None, help="Seconds to sleep between batches (default SESSION_CLEANUP_PAUSE).")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches; the next run continues.")
+
+    def handle(self, *args, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, "get_model_class"):
+            raise CommandError(f"Session engine '{settings.SESSION_ENGINE}' does not store sessions in the database.")
+        deleted = clear_expired_in_batches(
+            store.get_model_class(), options["batch_size"], options["pause"], options["max_batches"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted expired sessions: {deleted}"))
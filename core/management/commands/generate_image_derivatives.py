@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.images import (
+    delete_derivatives,
+    derivative_quality,
+    derivative_widths,
+    read_source,
+    save_derivatives,
+)
+from core.models import ImageDerivative, News
+from core.utils.images import render_variants
+from store.models import Product, ProductImage
+
+TOUCH_BATCH = 500
+
+
+def _human_bytes(value: int) -> str:
+    size = float(value or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG derivatives for product images and project covers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes used for resizing (1 runs inline).",
+        )
+        parser.add_argument("--force", action="store_true", help="Regenerate images that already have derivatives.")
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete derivatives whose original is no longer referenced by any model.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, int(options["workers"] or 1))
+        force = bool(options["force"])
+
+        product_sources = set(ProductImage.objects.exclude(image="").values_list("image", flat=True))
+        cover_sources = set(News.objects.exclude(cover_image="").values_list("cover_image", flat=True))
+        sources = product_sources | cover_sources
+
+        if options["prune"]:
+            known = set(ImageDerivative.objects.order_by().values_list("source_name", flat=True).distinct())
+            pruned = delete_derivatives(known - sources)
+            self.stdout.write(f"Pruned {pruned} orphaned derivative(s)")
+
+        if not force:
+            sources -= set(ImageDerivative.objects.order_by().values_list("source_name", flat=True).distinct())
+        pending = sorted(sources)
+
+        started = time.perf_counter()
+        done, failed = self._generate(pending, workers)
+        elapsed = time.perf_counter() - started
+
+        self._touch_owners(
+            [name for name in done if name in product_sources],
+            [name for name in done if name in cover_sources],
+        )
+        for name, error in failed:
+            self.stderr.write(f"  {name}: {error}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated derivatives for {len(done)} image(s) in {elapsed:.1f}s ({len(failed)} failed)"
+            )
+        )
+        self._report_savings()
+
+    def _generate(self, names: list[str], workers: int) -> tuple[list[str], list[tuple[str, str]]]:
+        render = partial(render_variants, widths=derivative_widths(), quality=derivative_quality())
+        done: list[str] = []
+        failed: list[tuple[str, str]] = []
+
+        def store(name: str, data_size: int, variants) -> None:
+            save_derivatives(name, data_size, variants)
+            done.append(name)
+
+        if workers == 1:
+            for name in names:
+                try:
+                    data = read_source(name)
+                    store(name, len(data), render(data))
+                except Exception as exc:
+                    failed.append((name, f"{type(exc).__name__}: {exc}"))
+            return done, failed
+
+        # Children only resize bytes; the parent does all storage and database work.
+        # Close inherited connections so no forked worker shares a DB socket.
+        connections.close_all()
+        in_flight: dict[Future, tuple[str, int]] = {}
+        queue = iter(names)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                while len(in_flight) < workers * 2:
+                    name = next(queue, None)
+                    if name is None:
+                        break
+                    try:
+                        data = read_source(name)
+                    except Exception as exc:
+                        failed.append((name, f"{type(exc).__name__}: {exc}"))
+                        continue
+                    in_flight[pool.submit(render, data)] = (name, len(data))
+                if not in_flight:
+                    break
+                finished, _pending = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, size = in_flight.pop(future)
+                    try:
+                        store(name, size, future.result())
+                    except Exception as exc:
+                        failed.append((name, f"{type(exc).__name__}: {exc}"))
+        return done, failed
+
+    def _touch_owners(self, product_images: list[str], covers: list[str]) -> None:
+        """New srcset markup must change page validators (ETag/Last-Modified)."""
+        now = timezone.now()
+        for start in range(0, len(product_images), TOUCH_BATCH):
+            batch = product_images[start : start + TOUCH_BATCH]
+            Product.objects.filter(images__image__in=batch).update(updated_at=now)
+        for start in range(0, len(covers), TOUCH_BATCH):
+            News.objects.filter(cover_image__in=covers[start : start + TOUCH_BATCH]).update(updated_at=now)
+
+    def _report_savings(self) -> None:
+        originals = ImageDerivative.objects.order_by().values("source_name", "source_bytes").distinct()
+        original_total = sum(row["source_bytes"] for row in originals)
+        image_count = len(originals)
+        if not image_count:
+            self.stdout.write("No derivatives stored yet.")
+            return
+        self.stdout.write(f"Originals with derivatives: {image_count} ({_human_bytes(original_total)})")
+
+        rows = (
+            ImageDerivative.objects.values("format", "width")
+            .annotate(images=Count("pk"), derivative_bytes=Sum("bytes"), source_total=Sum("source_bytes"))
+            .order_by("format", "width")
+        )
+        for row in rows:
+            # Originals narrower than this width are still served as-is at this breakpoint.
+            served = row["derivative_bytes"] + (original_total - row["source_total"])
+            saved = original_total - served
+            percent = (saved / original_total * 100) if original_total else 0
+            self.stdout.write(
+                f"  {row['format']:>4} {row['width']:>5}w: {_human_bytes(served)} served "
+                f"instead of {_human_bytes(original_total)} -> {_human_bytes(saved)} saved ({percent:.0f}%)"
+            )
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importtime import measure_boot
+
+
+class Command(BaseCommand):
+    help = "Boot a worker under `python -X importtime` and check its import time against the budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entry-point", default="shopproject.wsgi", help="Module the app server imports.")
+        parser.add_argument("--top", type=int, default=15, help="Packages to list, slowest first.")
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=None,
+            help="Fail above this many milliseconds of imports (default: IMPORT_TIME_BUDGET_MS, 0 = no limit).",
+        )
+        parser.add_argument(
+            "--lazy",
+            action="append",
+            default=None,
+            help="Module that must not load at boot (repeatable; default: LAZY_IMPORT_MODULES).",
+        )
+
+    def handle(self, *args, **options):
+        budget = options["budget_ms"]
+        if budget is None:
+            budget = float(getattr(settings, "IMPORT_TIME_BUDGET_MS", 0) or 0)
+        lazy = options["lazy"]
+        if lazy is None:
+            lazy = list(getattr(settings, "LAZY_IMPORT_MODULES", ()))
+
+        # What a worker imports on its own; modules the master preloads are deliberate.
+        report = measure_boot(options["entry_point"], env={"PRELOAD_MODULES": ""})
+
+        self.stdout.write(
+            f"Worker boot: {report.seconds * 1000:.0f} ms, {report.import_ms:.1f} ms importing "
+            f"{len(report.imports)} modules, max RSS {report.max_rss_kb / 1024:.1f} MB"
+        )
+        for package, milliseconds in report.by_package()[: max(0, options["top"])]:
+            self.stdout.write(f"  {milliseconds:8.1f} ms  {package}")
+
+        problems = []
+        for module in lazy:
+            if report.loaded(module):
+                chain = " <- ".join(report.importers(module))
+                problems.append(f"{module} is imported at boot ({chain})")
+        if budget and report.import_ms > budget:
+            problems.append(f"imports took {report.import_ms:.1f} ms, budget is {budget:.0f} ms")
+
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"  {problem}"))
+            raise CommandError(f"{len(problems)} import check(s) failed.")
+        budget_note = f" (budget {budget:.0f} ms)" if budget else ""
+        self.stdout.write(self.style.SUCCESS(f"Import checks passed{budget_note}."))
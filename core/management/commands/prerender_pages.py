@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from core.prerender import prerender_all, prerender_root
+
+
+class Command(BaseCommand):
+    help = "Render static marketing pages to disk (HTML + gzip + brotli) for fast serving."
+
+    def handle(self, *args, **options):
+        manifest = prerender_all()
+        for key, entry in sorted(manifest.items()):
+            self.stdout.write(f"  {entry['path']} -> {key}.html ({entry['bytes']} bytes, {', '.join(entry['variants'])})")
+        self.stdout.write(
+            self.style.SUCCESS(f"Prerendered {len(manifest)} page(s) into {prerender_root()}")
+        )
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import process_pending_notifications
+
+
+class Command(BaseCommand):
+    help = "Send queued contact-form notification emails (for cron or a supervised worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Maximum notifications to send per batch.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll the queue instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls when --loop is set.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, int(options["batch_size"]))
+        loop = bool(options["loop"])
+        interval = max(0.1, float(options["interval"]))
+
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = process_pending_notifications(limit=batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not loop:
+                break
+            time.sleep(interval)
+
+        self.stdout.write(self.style.SUCCESS(f"Sent: {total_sent}, failed: {total_failed}"))
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed X-Profile-Token header value for profiling a request without a staff login."
+
+    def handle(self, *args, **options):
+        token = make_token()
+        max_age = getattr(settings, "PROFILER_TOKEN_MAX_AGE", 900)
+        self.stdout.write(f"X-Profile-Token: {token}")
+        self.stdout.write(f"Valid for {max_age} seconds, e.g. curl -H 'X-Profile-Token: {token}' https://example.com/catalog/")
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.visit_analytics import backfill_sketches, build_rollups, prune_raw_visits
+
+
+class Command(BaseCommand):
+    help = "Build weekly/monthly unique-visitor rollups from daily sketches and prune old SiteVisit rows (for cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=62,
+            help="Recompute rollups for periods touching the last N days (default 62).",
+        )
+        parser.add_argument("--all", action="store_true", help="Recompute every rollup.")
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Delete SiteVisit rows older than this many days (default VISIT_RAW_RETENTION_DAYS; 0 keeps them).",
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        retention = options["retention_days"]
+        if retention is None:
+            retention = int(getattr(settings, "VISIT_RAW_RETENTION_DAYS", 0) or 0)
+
+        backfilled = backfill_sketches()
+        pruned = prune_raw_visits(today - timedelta(days=retention)) if retention > 0 else 0
+        since = None if options["all"] else today - timedelta(days=max(0, options["days"]))
+        rollups = build_rollups(since)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled sketches: {backfilled}, pruned visits: {pruned}, rollups written: {rollups}")
+        )
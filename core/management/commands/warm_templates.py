@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.templating import warm_templates
+
+
+class Command(BaseCommand):
+    help = "Compile every template once (fails fast on syntax errors before a deploy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Exit with an error if any project template (templates/) fails to compile.",
+        )
+
+    def handle(self, *args, **options):
+        result = warm_templates()
+
+        self.stdout.write(
+            f"Compiled {result.compiled} template(s) in {result.seconds * 1000:.1f} ms"
+            f" (cached loader: {'on' if getattr(settings, 'TEMPLATE_CACHE', False) else 'off'})."
+        )
+        for name, error in sorted(result.failed.items()):
+            self.stdout.write(self.style.WARNING(f"  skipped {name}: {error}"))
+
+        if options["strict"]:
+            project_dir = (settings.BASE_DIR / "templates").resolve()
+            project_failures = [
+                name for name in result.failed if (project_dir / name).is_file()
+            ]
+            if project_failures:
+                raise CommandError(f"{len(project_failures)} project template(s) failed to compile.")
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+from core.caching import EVENTS, cache_stats
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "styra"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+ARCHIVE_NAME = "archive.json"
+LOCK_NAME = "archive.lock"
+LOCK_STALE_SECONDS = 60
+
+
+def _setting_int(name: str, default: int) -> int:
+    raw = getattr(settings, name, default)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def metrics_enabled() -> bool:
+    return bool(getattr(settings, "METRICS_ENABLED", True))
+
+
+def metrics_dir() -> Path:
+    return Path(getattr(settings, "METRICS_DIR", Path(settings.BASE_DIR) / "tmp" / "metrics"))
+
+
+def _empty_histogram(buckets) -> dict:
+    return {"buckets": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+
+
+def _observe(histogram: dict, buckets, value: float) -> None:
+    histogram["buckets"][bisect_left(buckets, value)] += 1
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+def _merge_histogram(target: dict, source: dict) -> None:
+    for index, count in enumerate(source.get("buckets", ())):
+        if index < len(target["buckets"]):
+            target["buckets"][index] += count
+    target["sum"] += source.get("sum", 0.0)
+    target["count"] += source.get("count", 0)
+
+
+def _merge_counters(target: dict, source: dict) -> None:
+    """Merge `{view: {status: count}}`, `{view: histogram}` style snapshots into `target`."""
+    for view, statuses in source.get("requests", {}).items():
+        bucket = target["requests"].setdefault(view, {})
+        for status, count in statuses.items():
+            bucket[status] = bucket.get(status, 0) + count
+    for key, buckets in (("latency", LATENCY_BUCKETS), ("queries", QUERY_BUCKETS)):
+        for view, histogram in source.get(key, {}).items():
+            _merge_histogram(target[key].setdefault(view, _empty_histogram(buckets)), histogram)
+    for namespace, counters in source.get("cache", {}).items():
+        bucket = target["cache"].setdefault(namespace, {})
+        for name, value in counters.items():
+            bucket[name] = bucket.get(name, 0) + value
+
+
+def _empty_counters() -> dict:
+    return {"requests": {}, "latency": {}, "queries": {}, "cache": {}}
+
+
+def process_memory_bytes() -> int | None:
+    """Resident set size of this process (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError, OverflowError):
+        return True
+    return True
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning("Ignoring unreadable metrics file %s", path)
+        return None
+
+
+def _write_json(path: Path, payload: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class MetricsStore:
+    """Request counters for this process, shared with other workers through files.
+
+    Each process writes its snapshot to METRICS_DIR/<pid>.json at most every
+    METRICS_FLUSH_SECONDS (and at exit); the /metrics view sums all files. Files
+    of processes that have exited are folded into archive.json so totals survive
+    worker restarts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = _empty_counters()
+        self._last_flush = time.monotonic()
+
+    def observe_request(self, view: str, status: int, seconds: float, queries: int | None = None) -> None:
+        with self._lock:
+            statuses = self._counters["requests"].setdefault(view, {})
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            latency = self._counters["latency"].setdefault(view, _empty_histogram(LATENCY_BUCKETS))
+            _observe(latency, LATENCY_BUCKETS, seconds)
+            if queries is not None:
+                histogram = self._counters["queries"].setdefault(view, _empty_histogram(QUERY_BUCKETS))
+                _observe(histogram, QUERY_BUCKETS, queries)
+            due = time.monotonic() - self._last_flush >= _setting_int("METRICS_FLUSH_SECONDS", 10)
+        if due:
+            self.flush()
+
+    def snapshot(self) -> dict:
+        from core.downloads import download_counter
+
+        with self._lock:
+            counters = json.loads(json.dumps(self._counters))
+        counters.update(
+            {
+                "cache": cache_stats.snapshot(),
+                "pid": os.getpid(),
+                "written_at": time.time(),
+                "memory_bytes": process_memory_bytes(),
+                "download_counter_pending": download_counter.pending(),
+            }
+        )
+        return counters
+
+    def flush(self) -> None:
+        with self._lock:
+            self._last_flush = time.monotonic()
+        try:
+            _write_json(metrics_dir() / f"{os.getpid()}.json", self.snapshot())
+        except OSError:
+            logger.exception("Failed to write metrics snapshot")
+
+    def has_data(self) -> bool:
+        with self._lock:
+            return bool(self._counters["requests"])
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = _empty_counters()
+            self._last_flush = time.monotonic()
+
+
+metrics_store = MetricsStore()
+
+
+def _acquire_archive_lock(directory: Path) -> Path | None:
+    lock = directory / LOCK_NAME
+    try:
+        if time.time() - lock.stat().st_mtime > LOCK_STALE_SECONDS:
+            lock.unlink(missing_ok=True)
+    except FileNotFoundError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return None
+    return lock
+
+
+def _archive_dead(directory: Path, dead: list[tuple[Path, dict]]) -> None:
+    """Fold snapshots of exited processes into archive.json (skipped if another scrape holds the lock)."""
+    lock = _acquire_archive_lock(directory)
+    if lock is None:
+        return
+    try:
+        archive = _empty_counters()
+        _merge_counters(archive, _read_json(directory / ARCHIVE_NAME) or {})
+        for _, snapshot in dead:
+            _merge_counters(archive, snapshot)
+        _write_json(directory / ARCHIVE_NAME, archive)
+        for path, _ in dead:
+            path.unlink(missing_ok=True)
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def collect() -> dict:
+    """Sum the counters of every process (live, exited and archived) and the gauges of live ones."""
+    directory = metrics_dir()
+    totals = _empty_counters()
+    processes: list[dict] = []
+
+    own = metrics_store.snapshot()
+    _merge_counters(totals, own)
+    processes.append(own)
+
+    dead: list[tuple[Path, dict]] = []
+    if directory.is_dir():
+        archive = _read_json(directory / ARCHIVE_NAME)
+        if archive:
+            _merge_counters(totals, archive)
+        for path in sorted(directory.glob("*.json")):
+            if not path.stem.isdigit() or int(path.stem) == own["pid"]:
+                continue
+            snapshot = _read_json(path)
+            if snapshot is None:
+                continue
+            _merge_counters(totals, snapshot)
+            if _pid_alive(int(path.stem)):
+                processes.append(snapshot)
+            else:
+                dead.append((path, snapshot))
+    if dead:
+        try:
+            _archive_dead(directory, dead)
+        except OSError:
+            logger.exception("Failed to archive metrics of exited processes")
+
+    totals["processes"] = processes
+    return totals
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_bound(bound) -> str:
+    return repr(float(bound)) if isinstance(bound, float) else str(bound)
+
+
+def _histogram_lines(name: str, histograms: dict, buckets) -> list[str]:
+    lines = []
+    for view in sorted(histograms):
+        histogram = histograms[view]
+        cumulative = 0
+        for bound, count in zip(buckets, histogram["buckets"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(view=view, le=_format_bound(bound))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(view=view, le='+Inf')} {histogram['count']}")
+        lines.append(f"{name}_sum{_labels(view=view)} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels(view=view)} {histogram['count']}")
+    return lines
+
+
+def render_prometheus(totals: dict, notification_counts: dict[str, int]) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        f"# HELP {PREFIX}_http_requests_total Requests by URL name and status code.",
+        f"# TYPE {PREFIX}_http_requests_total counter",
+    ]
+    for view in sorted(totals["requests"]):
+        for status, count in sorted(totals["requests"][view].items()):
+            lines.append(f"{PREFIX}_http_requests_total{_labels(view=view, status=status)} {count}")
+
+    lines += [
+        f"# HELP {PREFIX}_http_request_duration_seconds Time spent in the view and inner middleware.",
+        f"# TYPE {PREFIX}_http_request_duration_seconds histogram",
+    ]
+    lines += _histogram_lines(f"{PREFIX}_http_request_duration_seconds", totals["latency"], LATENCY_BUCKETS)
+
+    lines += [
+        f"# HELP {PREFIX}_http_request_db_queries SQL queries per request (sampled requests only).",
+        f"# TYPE {PREFIX}_http_request_db_queries histogram",
+    ]
+    lines += _histogram_lines(f"{PREFIX}_http_request_db_queries", totals["queries"], QUERY_BUCKETS)
+
+    lines += [
+        f"# HELP {PREFIX}_process_resident_memory_bytes Resident memory of each live worker.",
+        f"# TYPE {PREFIX}_process_resident_memory_bytes gauge",
+    ]
+    for process in totals["processes"]:
+        if process.get("memory_bytes") is not None:
+            lines.append(f"{PREFIX}_process_resident_memory_bytes{_labels(pid=process['pid'])} {process['memory_bytes']}")
+
+    pending_downloads = sum(process.get("download_counter_pending", 0) for process in totals["processes"])
+    lines += [
+        f"# HELP {PREFIX}_download_counts_pending Download hits buffered in memory and not yet written.",
+        f"# TYPE {PREFIX}_download_counts_pending gauge",
+        f"{PREFIX}_download_counts_pending {pending_downloads}",
+        f"# HELP {PREFIX}_contact_notifications Contact notification emails by queue status.",
+        f"# TYPE {PREFIX}_contact_notifications gauge",
+    ]
+    for status, count in sorted(notification_counts.items()):
+        lines.append(f"{PREFIX}_contact_notifications{_labels(status=status)} {count}")
+
+    cache = totals.get("cache", {})
+    lines += [
+        f"# HELP {PREFIX}_cache_events_total Cache lookups by key namespace and outcome "
+        "(l1_hit, l2_hit, miss, compute, early_refresh, stale, lock_wait).",
+        f"# TYPE {PREFIX}_cache_events_total counter",
+    ]
+    for namespace in sorted(cache):
+        for event in EVENTS:
+            count = cache[namespace].get(event, 0)
+            lines.append(f"{PREFIX}_cache_events_total{_labels(namespace=namespace, event=event)} {count}")
+    lines += [
+        f"# HELP {PREFIX}_cache_seconds_total Time spent in cache lookups and in recomputing values.",
+        f"# TYPE {PREFIX}_cache_seconds_total counter",
+    ]
+    for namespace in sorted(cache):
+        for operation in ("get", "compute"):
+            seconds = cache[namespace].get(f"{operation}_seconds", 0.0)
+            lines.append(f"{PREFIX}_cache_seconds_total{_labels(namespace=namespace, op=operation)} {seconds}")
+    return "\n".join(lines) + "\n"
+
+
+def _flush_at_exit() -> None:
+    try:
+        if metrics_store.has_data():
+            metrics_store.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
@@ -1,12 +1,26 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from django.conf import settings
 from django.db.models import F
+from django.http import HttpResponse, JsonResponse
+from django.middleware.gzip import GZipMiddleware as DjangoGZipMiddleware
 from django.utils import timezone, translation
 
+from core.bots import request_is_bot
+from core.dbguard import database_breaker
+from core.edgecache import restrict_to_visitor
+from core.instrumentation import instrumentation_enabled, measure_request, should_sample, view_stats
+from core.metrics import metrics_enabled, metrics_store
 from core.models import DailyVisitStat, SiteVisit
+from core.profiling import profile_request, store, token_is_valid
+from core.querycheck import detection_mode, record_queries, report_repeated
+from core.visit_analytics import MODE_SKETCH, record_hit, unique_mode
+from core.visitors import identify as identify_visitor
+from core.visitors import set_cookie as set_visitor_cookie
+from core.templating import collect_template_timings, install_render_hook
 
 logger = logging.getLogger(__name__)
 error_logger = logging.getLogger("core.errors")
@@ -30,7 +44,14 @@ class AdminEnglishMiddleware:
 
 
 class SiteVisitMiddleware:
-    """Track unique site visits per session per day for analytics."""
+    """Track unique site visits per visitor per day for analytics.
+
+    Visitors are identified by a signed cookie (or an IP+UA hash for clients
+    without cookies), never by the session, so anonymous and crawler hits do
+    not create `django_session` rows. Crawlers and scripts only bump the
+    day's `bot_hits` counter. With VISIT_UNIQUE_MODE=sketch no SiteVisit rows
+    are written; the day's HyperLogLog sketch counts unique visitors.
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -39,7 +60,8 @@ class SiteVisitMiddleware:
         response = self.get_response(request)
 
         try:
-            if request.method not in ("GET", "HEAD"):
+            if request.method not in ("GET", "HEAD") or database_breaker.is_open():
+                # Visits are not worth adding load to a database that is already failing.
                 return response
 
             path = request.path or "/"
@@ -51,42 +73,79 @@ class SiteVisitMiddleware:
             if path.startswith(static_url) or path.startswith(media_url):
                 return response
 
-            session = request.session
-            if not session.session_key:
-                session.save()
-            session_key = session.session_key
-            if not session_key:
+            visited_on = timezone.localdate()
+            if request_is_bot(request):
+                self._count_bot_hit(visited_on)
                 return response
 
-            visited_on = timezone.localdate()
-            defaults = {"first_path": path}
-            if request.user.is_authenticated:
-                defaults["user"] = request.user
+            visitor_id, needs_cookie = identify_visitor(request)
+            if needs_cookie:
+                set_visitor_cookie(response, visitor_id)
+
+            if unique_mode() == MODE_SKETCH:
+                record_hit(visited_on, visitor_id, new_visitor=None)
+                return response
+
+            user = getattr(request, "user", None)
+            authenticated = bool(user and user.is_authenticated)
+            defaults = {"first_path": path[:200]}
+            if authenticated:
+                defaults["user"] = user
 
             visit, created = SiteVisit.objects.get_or_create(
-                session_key=session_key,
+                session_key=visitor_id,
                 visited_on=visited_on,
                 defaults=defaults,
             )
 
-            if request.user.is_authenticated:
-                SiteVisit.objects.filter(
-                    session_key=session_key,
-                    visited_on=visited_on,
-                    user__isnull=True,
-                ).update(user=request.user)
-
-            stat, _created = DailyVisitStat.objects.get_or_create(date=visited_on)
-            DailyVisitStat.objects.filter(pk=stat.pk).update(total_hits=F("total_hits") + 1)
-            if created:
-                DailyVisitStat.objects.filter(pk=stat.pk).update(
-                    unique_sessions=F("unique_sessions") + 1
-                )
+            if authenticated and not created and visit.user_id is None:
+                SiteVisit.objects.filter(pk=visit.pk, user__isnull=True).update(user=user)
+
+            record_hit(visited_on, visitor_id, new_visitor=created)
         except Exception:
             logger.exception("Failed to record site visit")
 
         return response
 
+    @staticmethod
+    def _count_bot_hit(visited_on) -> None:
+        # One UPDATE per bot hit; the row is created only on the day's first hit.
+        if DailyVisitStat.objects.filter(date=visited_on).update(bot_hits=F("bot_hits") + 1):
+            return
+        DailyVisitStat.objects.get_or_create(date=visited_on)
+        DailyVisitStat.objects.filter(date=visited_on).update(bot_hits=F("bot_hits") + 1)
+
+
+class SharedCacheMiddleware:
+    """Check `public` responses once the inner middleware has set its cookies.
+
+    `edge_cached` decides inside the view, before SiteVisitMiddleware adds the
+    visitor cookie or SessionMiddleware saves a session; this sits outside both
+    (see core.edgecache.restrict_to_visitor).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        restrict_to_visitor(response)
+        return response
+
+
+class GZipMiddleware(DjangoGZipMiddleware):
+    """GZip, except for responses that advertise byte ranges (core.downloads).
+
+    Compressing those would make Content-Range and Content-Length describe bytes
+    the client never receives, weaken the ETag that If-Range compares against,
+    and stop FileResponse from reaching wsgi.file_wrapper/sendfile.
+    """
+
+    def process_response(self, request, response):
+        if response.get("Accept-Ranges") == "bytes":
+            return response
+        return super().process_response(request, response)
+
 
 class SecurityHeadersMiddleware:
     """Add strict security headers (CSP, clickjacking, XSS)."""
@@ -130,3 +189,158 @@ class ExceptionLoggingMiddleware:
                 },
             )
             raise
+
+
+class TemplateProfileMiddleware:
+    """Staff-only template timing report: add `?_template_profile=1` to any page.
+
+    Instead of the page, a JSON report lists each template/include with render
+    counts plus inclusive and self time, slowest first.
+    """
+
+    PARAM = "_template_profile"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_render_hook()
+
+    def __call__(self, request):
+        if self.PARAM not in request.GET:
+            return self.get_response(request)
+        user = getattr(request, "user", None)
+        if not (user and user.is_authenticated and user.is_staff):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect_template_timings() as timings:
+            response = self.get_response(request)
+            if hasattr(response, "render") and callable(response.render) and not response.is_rendered:
+                response.render()
+        elapsed = time.perf_counter() - started
+
+        return JsonResponse(
+            {
+                "path": request.path,
+                "status": response.status_code,
+                "total_ms": round(elapsed * 1000, 3),
+                "template_ms": round(timings.total_seconds * 1000, 3),
+                "templates": timings.report(),
+            },
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+
+class ServerTimingMiddleware:
+    """Per-request performance counters: total, SQL, template and cache time.
+
+    A share of requests (INSTRUMENTATION_SAMPLE_RATE) is measured and aggregated
+    per view; staff requests are always measured and get a `Server-Timing`
+    header. Staff can add `?_perf_stats=1` to read the aggregates as JSON.
+    With METRICS_ENABLED every request also feeds the /metrics counters.
+    """
+
+    STATS_PARAM = "_perf_stats"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        instrument = instrumentation_enabled()
+        record = metrics_enabled()
+        if not (instrument or record):
+            return self.get_response(request)
+
+        user = getattr(request, "user", None)
+        is_staff = bool(user and user.is_authenticated and user.is_staff)
+        if instrument and is_staff and self.STATS_PARAM in request.GET:
+            return JsonResponse({"views": view_stats.report()}, json_dumps_params={"ensure_ascii": False})
+
+        sampled = instrument and should_sample()
+        metrics = None
+        started = time.perf_counter()
+        if sampled or (instrument and is_staff):
+            with measure_request() as metrics:
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view_name = (match.view_name if match else "") or "<unresolved>"
+        if sampled:
+            view_stats.record(view_name, response.status_code, metrics)
+        if record:
+            queries = metrics.sql_count if metrics is not None else None
+            metrics_store.observe_request(view_name, response.status_code, elapsed, queries)
+        if metrics is not None and is_staff:
+            response["Server-Timing"] = metrics.server_timing()
+        return response
+
+
+class NPlusOneMiddleware:
+    """Flag requests that run the same SQL statement many times (NPLUSONE_MODE=log|raise).
+
+    Statements are compared with literals collapsed; each report names the app
+    code that issued them. Off by default outside DEBUG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = detection_mode()
+        if not mode:
+            return self.get_response(request)
+        with record_queries() as log:
+            response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        report_repeated(f"{request.method} {request.path} ({match.view_name if match else '-'})", log, mode)
+        return response
+
+
+class RequestProfilerMiddleware:
+    """On-demand profiling of a single request.
+
+    Triggered by `?_profile=1` for staff or by an `X-Profile-Token` header from
+    `manage.py profile_token`. The request runs under cProfile, a stack sampler
+    and SQL timing; the .prof/.collapsed/.json files go to PROFILER_DIR and the
+    response carries `X-Profile-Id`. `?_profile=report` returns a text report
+    instead of the page. Requests without the trigger only pay two lookups.
+    """
+
+    PARAM = "_profile"
+    HEADER = "HTTP_X_PROFILE_TOKEN"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.PARAM not in request.GET and self.HEADER not in request.META:
+            return self.get_response(request)
+        if not self._allowed(request):
+            return self.get_response(request)
+
+        label = f"{request.method} {request.path}"
+        with profile_request(label) as result:
+            response = self.get_response(request)
+            if result is not None and hasattr(response, "render") and callable(response.render):
+                if not response.is_rendered:
+                    response.render()
+        if result is None:
+            response["X-Profile-Id"] = "busy"
+            return response
+
+        if request.GET.get(self.PARAM) == "report":
+            return HttpResponse(result.text_report(), content_type="text/plain; charset=utf-8")
+        try:
+            response["X-Profile-Id"] = store(result)
+        except OSError:
+            logger.exception("Failed to store profile for %s", label)
+        return response
+
+    def _allowed(self, request) -> bool:
+        token = request.META.get(self.HEADER)
+        if token:
+            return token_is_valid(token)
+        user = getattr(request, "user", None)
+        return bool(user and user.is_authenticated and user.is_staff)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_alter_contactmessage_service_package'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'در صف'), ('processing', 'در حال ارسال'), ('sent', 'ارسال شده'), ('failed', 'ناموفق')], db_index=True, default='pending', max_length=20, verbose_name='وضعیت')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخرین خطا')),
+                ('available_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='زمان تلاش بعدی')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان شروع ارسال')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان ارسال')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='core.contactmessage', verbose_name='پیام تماس')),
+            ],
+            options={
+                'verbose_name': 'اعلان پیام تماس',
+                'verbose_name_plural': 'صف اعلان\u200cهای پیام تماس',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:55
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    Download = apps.get_model("core", "Download")
+    Download.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_news_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='download',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی'),
+        ),
+        migrations.RunPython(backfill_updated_at, reverse_code=migrations.RunPython.noop),
+    ]
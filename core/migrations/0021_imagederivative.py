@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_download_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_name', models.CharField(max_length=255, verbose_name='فایل اصلی')),
+                ('width', models.PositiveIntegerField(verbose_name='عرض')),
+                ('height', models.PositiveIntegerField(verbose_name='ارتفاع')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10, verbose_name='فرمت')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='فایل')),
+                ('bytes', models.PositiveIntegerField(verbose_name='حجم (بایت)')),
+                ('source_bytes', models.PositiveIntegerField(verbose_name='حجم فایل اصلی (بایت)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+            ],
+            options={
+                'verbose_name': 'نسخه تصویر',
+                'verbose_name_plural': 'نسخه\u200cهای تصاویر',
+                'ordering': ['source_name', 'format', 'width'],
+                'constraints': [models.UniqueConstraint(fields=('source_name', 'format', 'width'), name='core_imagederivative_unique_variant')],
+            },
+        ),
+    ]
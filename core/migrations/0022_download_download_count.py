@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_imagederivative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='download',
+            name='download_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد دانلود'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_download_download_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyvisitstat',
+            name='bot_hits',
+            field=models.PositiveIntegerField(default=0, verbose_name='بازدید ربات\u200cها'),
+        ),
+    ]
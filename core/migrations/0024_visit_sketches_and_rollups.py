@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_dailyvisitstat_bot_hits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyvisitstat',
+            name='visitor_sketch',
+            field=models.BinaryField(blank=True, default=b'', verbose_name='طرح بازدیدکنندگان'),
+        ),
+        migrations.CreateModel(
+            name='VisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'هفتگی'), ('month', 'ماهانه')], max_length=8, verbose_name='دوره')),
+                ('start', models.DateField(verbose_name='شروع دوره')),
+                ('days', models.PositiveSmallIntegerField(default=0, verbose_name='روزهای دارای آمار')),
+                ('total_hits', models.PositiveIntegerField(default=0, verbose_name='کل بازدیدها')),
+                ('bot_hits', models.PositiveIntegerField(default=0, verbose_name='بازدید ربات\u200cها')),
+                ('unique_visitors', models.PositiveIntegerField(default=0, verbose_name='بازدیدکنندگان یکتا (تخمینی)')),
+                ('visitor_sketch', models.BinaryField(blank=True, default=b'', verbose_name='طرح بازدیدکنندگان')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'خلاصه بازدید',
+                'verbose_name_plural': 'خلاصه\u200cهای بازدید',
+                'ordering': ['period', '-start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'start'), name='uniq_visit_rollup_period_start')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_visit_sketches_and_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=32, unique=True, verbose_name='فضای نام')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='نسخه')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='آخرین تغییر')),
+            ],
+            options={
+                'verbose_name': 'نسخه کش',
+                'verbose_name_plural': 'نسخه\u200cهای کش',
+            },
+        ),
+    ]
@@ -1,7 +1,8 @@
 ﻿from django.conf import settings
 from django.db import models
 from django.utils import timezone
-from django.utils.text import slugify
+
+from core.utils.slugs import save_with_unique_slug
 
 
 class News(models.Model):
@@ -11,6 +12,7 @@ class News(models.Model):
     text = models.TextField("متن")
     cover_image = models.FileField("تصویر شاخص", upload_to="projects/", blank=True)
     created_at = models.DateTimeField("تاریخ ایجاد", auto_now_add=True)
+    updated_at = models.DateTimeField("آخرین بروزرسانی", auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -21,15 +23,8 @@ class News(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.title, allow_unicode=True) or "project"
-            candidate = base
-            suffix = 1
-            while News.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{suffix}"
-                suffix += 1
-            self.slug = candidate
-        super().save(*args, **kwargs)
+        save = super().save
+        save_with_unique_slug(self, lambda: save(*args, **kwargs), source=self.title, fallback="project")
 
 
 class Download(models.Model):
@@ -38,7 +33,9 @@ class Download(models.Model):
     category = models.CharField("دسته‌بندی", max_length=120, blank=True)
     description = models.TextField("توضیحات", blank=True)
     file = models.FileField("فایل", upload_to="downloads/")
+    download_count = models.PositiveIntegerField("تعداد دانلود", default=0)
     created_at = models.DateTimeField("تاریخ ایجاد", auto_now_add=True)
+    updated_at = models.DateTimeField("آخرین بروزرسانی", auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -49,15 +46,8 @@ class Download(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.title, allow_unicode=True) or "download"
-            candidate = base
-            suffix = 1
-            while Download.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{suffix}"
-                suffix += 1
-            self.slug = candidate
-        super().save(*args, **kwargs)
+        save = super().save
+        save_with_unique_slug(self, lambda: save(*args, **kwargs), source=self.title, fallback="download")
 
 
 class ContactMessage(models.Model):
@@ -142,6 +132,9 @@ class DailyVisitStat(models.Model):
     date = models.DateField("تاریخ", unique=True, db_index=True)
     total_hits = models.PositiveIntegerField("کل بازدیدها", default=0)
     unique_sessions = models.PositiveIntegerField("نشست‌های یکتا", default=0)
+    bot_hits = models.PositiveIntegerField("بازدید ربات‌ها", default=0)
+    # HyperLogLog of the day's visitor ids (core.hll); survives pruning of SiteVisit rows.
+    visitor_sketch = models.BinaryField("طرح بازدیدکنندگان", default=b"", blank=True, editable=False)
 
     class Meta:
         verbose_name = "آمار روزانه"
@@ -151,6 +144,35 @@ class DailyVisitStat(models.Model):
         return f"{self.date} - {self.total_hits}"
 
 
+class VisitRollup(models.Model):
+    PERIOD_WEEK = "week"
+    PERIOD_MONTH = "month"
+    PERIOD_CHOICES = [
+        (PERIOD_WEEK, "هفتگی"),
+        (PERIOD_MONTH, "ماهانه"),
+    ]
+
+    period = models.CharField("دوره", max_length=8, choices=PERIOD_CHOICES)
+    start = models.DateField("شروع دوره")
+    days = models.PositiveSmallIntegerField("روزهای دارای آمار", default=0)
+    total_hits = models.PositiveIntegerField("کل بازدیدها", default=0)
+    bot_hits = models.PositiveIntegerField("بازدید ربات‌ها", default=0)
+    unique_visitors = models.PositiveIntegerField("بازدیدکنندگان یکتا (تخمینی)", default=0)
+    visitor_sketch = models.BinaryField("طرح بازدیدکنندگان", default=b"", blank=True, editable=False)
+    updated_at = models.DateTimeField("آخرین بروزرسانی", auto_now=True)
+
+    class Meta:
+        ordering = ["period", "-start"]
+        verbose_name = "خلاصه بازدید"
+        verbose_name_plural = "خلاصه‌های بازدید"
+        constraints = [
+            models.UniqueConstraint(fields=["period", "start"], name="uniq_visit_rollup_period_start")
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.start} - {self.unique_visitors}"
+
+
 class PaymentSettings(models.Model):
     telegram_username = models.CharField("شناسه تلگرام", max_length=64, blank=True)
     whatsapp_number = models.CharField("شماره واتساپ", max_length=20, blank=True)
@@ -169,5 +191,99 @@ class PaymentSettings(models.Model):
 
     @classmethod
     def get_solo(cls) -> "PaymentSettings":
-        obj, _ = cls.objects.get_or_create(pk=1)
+        obj = cls.objects.filter(pk=1).first()
+        if obj is None:
+            # A blank row shows the same as no row, so it is created without post_save
+            # (no cache generation bump or prerender run on a visitor's request).
+            cls.objects.bulk_create([cls(pk=1)], ignore_conflicts=True)
+            obj = cls.objects.get(pk=1)
         return obj
+
+
+class CacheGeneration(models.Model):
+    """Change counter per cache namespace; see core.generations."""
+
+    namespace = models.CharField("فضای نام", max_length=32, unique=True)
+    value = models.PositiveBigIntegerField("نسخه", default=0)
+    updated_at = models.DateTimeField("آخرین تغییر", default=timezone.now)
+
+    class Meta:
+        verbose_name = "نسخه کش"
+        verbose_name_plural = "نسخه‌های کش"
+
+    def __str__(self):
+        return f"{self.namespace}: {self.value}"
+
+
+class ContactNotification(models.Model):
+    """Outbox row for a pending contact-form email; drained by a background worker."""
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "در صف"),
+        (STATUS_PROCESSING, "در حال ارسال"),
+        (STATUS_SENT, "ارسال شده"),
+        (STATUS_FAILED, "ناموفق"),
+    )
+
+    message = models.ForeignKey(
+        ContactMessage,
+        on_delete=models.CASCADE,
+        related_name="notifications",
+        verbose_name="پیام تماس",
+    )
+    status = models.CharField(
+        "وضعیت", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField("تعداد تلاش", default=0)
+    last_error = models.TextField("آخرین خطا", blank=True)
+    available_at = models.DateTimeField("زمان تلاش بعدی", default=timezone.now, db_index=True)
+    locked_at = models.DateTimeField("زمان شروع ارسال", null=True, blank=True)
+    sent_at = models.DateTimeField("زمان ارسال", null=True, blank=True)
+    created_at = models.DateTimeField("تاریخ ایجاد", auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        verbose_name = "اعلان پیام تماس"
+        verbose_name_plural = "صف اعلان‌های پیام تماس"
+
+    def __str__(self):
+        return f"{self.message_id} - {self.status}"
+
+
+class ImageDerivative(models.Model):
+    """A resized copy of an uploaded image, keyed by the original's storage name."""
+
+    FORMAT_WEBP = "webp"
+    FORMAT_JPEG = "jpeg"
+
+    FORMAT_CHOICES = (
+        (FORMAT_WEBP, "WebP"),
+        (FORMAT_JPEG, "JPEG"),
+    )
+
+    source_name = models.CharField("فایل اصلی", max_length=255)
+    width = models.PositiveIntegerField("عرض")
+    height = models.PositiveIntegerField("ارتفاع")
+    format = models.CharField("فرمت", max_length=10, choices=FORMAT_CHOICES)
+    file = models.FileField("فایل", max_length=255)
+    bytes = models.PositiveIntegerField("حجم (بایت)")
+    source_bytes = models.PositiveIntegerField("حجم فایل اصلی (بایت)")
+    created_at = models.DateTimeField("تاریخ ایجاد", auto_now_add=True)
+
+    class Meta:
+        ordering = ["source_name", "format", "width"]
+        verbose_name = "نسخه تصویر"
+        verbose_name_plural = "نسخه‌های تصاویر"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_name", "format", "width"], name="core_imagederivative_unique_variant"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source_name} ({self.format} {self.width}w)"
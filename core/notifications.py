@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Min
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.generations import ADMINS, bump, versioned_key
+from core.utils.jalali import format_jalali
+
+from .models import ContactMessage, ContactNotification
+
+logger = logging.getLogger(__name__)
+
+ADMIN_EMAILS_CACHE_KEY = "core:contact:admin_emails"
+
+MODE_THREAD = "thread"
+MODE_COMMAND = "command"
+
+
+def _setting_int(name: str, default: int) -> int:
+    raw = getattr(settings, name, default)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def notification_mode() -> str:
+    mode = (getattr(settings, "CONTACT_NOTIFICATION_MODE", MODE_THREAD) or MODE_THREAD).strip().lower()
+    return mode if mode in (MODE_THREAD, MODE_COMMAND) else MODE_THREAD
+
+
+def get_admin_emails() -> list[str]:
+    """Return active superuser emails, cached until a superuser's flags or email change."""
+    key = versioned_key(ADMIN_EMAILS_CACHE_KEY, ADMINS)
+    emails = cache.get(key)
+    if emails is not None:
+        return list(emails)
+
+    emails = list(
+        get_user_model()
+        .objects.filter(is_superuser=True, is_active=True, email__isnull=False)
+        .exclude(email="")
+        .values_list("email", flat=True)
+    )
+    cache.set(key, emails, _setting_int("CONTACT_ADMIN_EMAILS_CACHE_SECONDS", 3600))
+    return emails
+
+
+def invalidate_admin_emails() -> None:
+    """Drop the cached recipients in every process (the key is versioned by the ADMINS generation)."""
+    bump(ADMINS)
+
+
+def _support_email() -> str:
+    support_email = (getattr(settings, "COMPANY_EMAIL", "") or "").strip()
+    if not support_email:
+        support_email = (getattr(settings, "DEFAULT_FROM_EMAIL", "") or "").strip()
+    return support_email
+
+
+def build_contact_email(message: ContactMessage) -> EmailMultiAlternatives | None:
+    """Build the admin notification email for a contact message (None when no recipient)."""
+    support_email = _support_email()
+    if not support_email:
+        return None
+
+    admin_emails = get_admin_emails()
+    bcc_emails = sorted({email for email in admin_emails if email and email != support_email})
+
+    created_at = format_jalali(message.created_at, "Y/m/d - H:i")
+    base_url = (getattr(settings, "SITE_BASE_URL", "") or "").strip().rstrip("/")
+    admin_prefix = getattr(settings, "ADMIN_PATH", "admin/").strip("/")
+    admin_root = f"/{admin_prefix}/"
+    admin_url = (
+        f"{base_url}{admin_root}core/contactmessage/{message.id}/change/"
+        if base_url
+        else f"{admin_root}core/contactmessage/{message.id}/change/"
+    )
+
+    brand = getattr(settings, "SITE_NAME", "استیرا")
+    subject = f"پیام جدید فرم تماس | {message.name}"
+    text_body = (
+        "پیام جدیدی از فرم تماس دریافت شد.\n\n"
+        f"نام: {message.name}\n"
+        f"ایمیل: {message.email}\n"
+        f"شماره تماس: {message.phone or '-'}\n"
+        f"نام مجموعه: {message.company or '-'}\n"
+        f"شهر: {message.city or '-'}\n"
+        f"نوع درخواست: {message.get_inquiry_type_display()}\n"
+        f"پکیج: {message.get_service_package_display() if message.service_package else '-'}\n"
+        f"محصول موردنظر: {message.product_interest or '-'}\n"
+        f"تاریخ ثبت: {created_at}\n\n"
+        f"پیام:\n{message.message}"
+    )
+    html_body = render_to_string(
+        "emails/contact_message.html",
+        {
+            "title": "پیام جدید فرم تماس",
+            "preheader": f"پیام جدید از {message.name}",
+            "brand": brand,
+            "subtitle": "این پیام از طریق فرم تماس سایت دریافت شده است.",
+            "name": message.name,
+            "email": message.email,
+            "phone": message.phone,
+            "created_at": created_at,
+            "message_text": message.message,
+            "admin_url": admin_url,
+            "footer": "برای پاسخ‌گویی سریع‌تر، از طریق پنل مدیریت اقدام کنید.",
+        },
+    )
+
+    email_message = EmailMultiAlternatives(
+        subject=subject,
+        body=text_body,
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        to=[support_email],
+        bcc=bcc_emails,
+        reply_to=[message.email],
+    )
+    email_message.attach_alternative(html_body, "text/html")
+    return email_message
+
+
+def _send_with_debug_fallback(email_message: EmailMultiAlternatives) -> None:
+    """Send via the configured backend; in DEBUG fall back to the file backend."""
+    try:
+        email_message.send(fail_silently=False)
+        return
+    except Exception:
+        if not getattr(settings, "DEBUG", False):
+            raise
+
+    base_dir = Path(getattr(settings, "BASE_DIR", Path.cwd()))
+    file_path = base_dir / "tmp" / "emails"
+    file_path.mkdir(parents=True, exist_ok=True)
+    email_message.connection = get_connection(
+        "django.core.mail.backends.filebased.EmailBackend",
+        fail_silently=True,
+        file_path=str(file_path),
+    )
+    email_message.send(fail_silently=True)
+
+
+def enqueue_contact_notification(message: ContactMessage) -> ContactNotification:
+    """Queue the admin email for a contact message; delivery happens off the request path."""
+    notification = ContactNotification.objects.create(message=message)
+    if notification_mode() == MODE_THREAD:
+        transaction.on_commit(_worker.wake)
+    return notification
+
+
+def _claim(notification_id: int) -> bool:
+    now = timezone.now()
+    claimed = ContactNotification.objects.filter(
+        pk=notification_id,
+        status=ContactNotification.STATUS_PENDING,
+    ).update(status=ContactNotification.STATUS_PROCESSING, locked_at=now)
+    return claimed == 1
+
+
+def _requeue_stale(now) -> None:
+    stale_after = _setting_int("CONTACT_NOTIFICATION_LOCK_SECONDS", 600)
+    ContactNotification.objects.filter(
+        status=ContactNotification.STATUS_PROCESSING,
+        locked_at__lt=now - timedelta(seconds=stale_after),
+    ).update(status=ContactNotification.STATUS_PENDING, locked_at=None)
+
+
+def deliver_notification(notification: ContactNotification) -> bool:
+    """Send one claimed notification and record the outcome. Returns True when sent."""
+    max_attempts = _setting_int("CONTACT_NOTIFICATION_MAX_ATTEMPTS", 5)
+    notification.attempts += 1
+    try:
+        email_message = build_contact_email(notification.message)
+        if email_message is not None:
+            _send_with_debug_fallback(email_message)
+    except Exception as exc:
+        logger.exception("Failed to send contact email (notification %s)", notification.pk)
+        notification.last_error = str(exc)[:2000]
+        notification.locked_at = None
+        if notification.attempts >= max_attempts:
+            notification.status = ContactNotification.STATUS_FAILED
+        else:
+            notification.status = ContactNotification.STATUS_PENDING
+            backoff = min(3600, 30 * (2 ** (notification.attempts - 1)))
+            notification.available_at = timezone.now() + timedelta(seconds=backoff)
+        notification.save(update_fields=["attempts", "last_error", "locked_at", "status", "available_at"])
+        return False
+
+    notification.status = ContactNotification.STATUS_SENT
+    notification.sent_at = timezone.now()
+    notification.locked_at = None
+    notification.last_error = ""
+    notification.save(update_fields=["attempts", "status", "sent_at", "locked_at", "last_error"])
+    return True
+
+
+def process_pending_notifications(limit: int = 50) -> tuple[int, int]:
+    """Drain due notifications. Returns (sent, failed) counts for this batch."""
+    now = timezone.now()
+    _requeue_stale(now)
+
+    due_ids = list(
+        ContactNotification.objects.filter(
+            status=ContactNotification.STATUS_PENDING,
+            available_at__lte=now,
+        )
+        .order_by("created_at")
+        .values_list("pk", flat=True)[:limit]
+    )
+
+    sent = failed = 0
+    for notification_id in due_ids:
+        if not _claim(notification_id):
+            continue
+        notification = ContactNotification.objects.select_related(
+            "message", "message__product_interest"
+        ).get(pk=notification_id)
+        if deliver_notification(notification):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
+
+
+def seconds_until_due(now=None) -> float | None:
+    """Seconds until a queued retry falls due or a stale claim can be re-queued.
+
+    None when nothing is pending or processing. Capped at
+    CONTACT_NOTIFICATION_POLL_SECONDS so rows added by other processes are
+    picked up too.
+    """
+    now = now or timezone.now()
+    pending = ContactNotification.objects.filter(status=ContactNotification.STATUS_PENDING).aggregate(
+        due=Min("available_at")
+    )["due"]
+    locked = ContactNotification.objects.filter(status=ContactNotification.STATUS_PROCESSING).aggregate(
+        since=Min("locked_at")
+    )["since"]
+    candidates = []
+    if pending is not None:
+        candidates.append(pending)
+    if locked is not None:
+        candidates.append(locked + timedelta(seconds=_setting_int("CONTACT_NOTIFICATION_LOCK_SECONDS", 600) + 1))
+    if not candidates:
+        return None
+    poll = max(1, _setting_int("CONTACT_NOTIFICATION_POLL_SECONDS", 60))
+    return min(float(poll), max(0.0, (min(candidates) - now).total_seconds()))
+
+
+class _NotificationWorker:
+    """Per-process daemon thread that drains the outbox when woken or when a retry falls due."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def wake(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="contact-notification-worker",
+                    daemon=True,
+                )
+                self._thread.start()
+        self._event.set()
+
+    def _run(self) -> None:
+        timeout = None
+        while True:
+            # Without a timeout, backed-off retries and abandoned claims would wait for the next submission.
+            self._event.wait(timeout)
+            self._event.clear()
+            close_old_connections()
+            try:
+                while True:
+                    sent, failed = process_pending_notifications()
+                    if not sent and not failed:
+                        break
+                timeout = seconds_until_due()
+            except Exception:
+                logger.exception("Contact notification worker failed")
+                timeout = max(1, _setting_int("CONTACT_NOTIFICATION_POLL_SECONDS", 60))
+            finally:
+                close_old_connections()
+
+
+_worker = _NotificationWorker()
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from .caching import get_or_compute
+from .conditional import template_stamp
+from .dbguard import database_breaker, statement_timeout
+from .generations import SETTINGS, versioned_key
+from .prerender import ENCODINGS, accepted_encodings, build_request, compress_variants
+
+logger = logging.getLogger(__name__)
+
+# Headers recomputed for every response served from the cache.
+SKIPPED_HEADERS = {"content-length", "content-encoding", "vary"}
+UNCACHEABLE_DIRECTIVES = ("private", "no-store", "no-cache")
+# Pages rendered on every request (not kept fresh) refresh their last good copy at most this often.
+LAST_GOOD_REFRESH_SECONDS = 60
+# One background revalidation per page at most this often while the database is failing.
+REVALIDATE_SECONDS = 5.0
+CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _setting_number(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(getattr(settings, name, default)))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def page_cache_seconds() -> int:
+    return int(_setting_number("PAGE_CACHE_SECONDS", 0))
+
+
+@dataclass(frozen=True)
+class FreshnessPolicy:
+    """How long a view's pages are served without running it, and how they stand in for a sick DB.
+
+    Fields left as None follow the settings:
+      fresh_seconds           PAGE_CACHE_SECONDS: anonymous hits are served from the cache.
+      stale_if_error_seconds  PAGE_STALE_IF_ERROR_SECONDS: how long the last good rendering
+                              may be served when the database fails or is too slow.
+      db_timeout              PAGE_DB_TIMEOUT: longest a single query may run while a last
+                              good rendering exists to fall back on.
+    """
+
+    fresh_seconds: int | None = None
+    stale_if_error_seconds: int | None = None
+    db_timeout: float | None = None
+
+    def fresh(self) -> int:
+        return page_cache_seconds() if self.fresh_seconds is None else self.fresh_seconds
+
+    def stale_if_error(self) -> int:
+        if self.stale_if_error_seconds is None:
+            return int(_setting_number("PAGE_STALE_IF_ERROR_SECONDS", 0))
+        return self.stale_if_error_seconds
+
+    def timeout(self) -> float:
+        return _setting_number("PAGE_DB_TIMEOUT", 2.0) if self.db_timeout is None else self.db_timeout
+
+
+DEFAULT_POLICY = FreshnessPolicy()
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    headers: tuple[tuple[str, str], ...]
+    content: bytes
+    variants: dict[str, bytes]
+    stored_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_response(cls, response, blank_csrf: bool = False) -> "CachedPage":
+        content = response.content
+        if blank_csrf:
+            # A token is tied to the visitor it was issued to; the copy must not hand it out.
+            content = CSRF_INPUT_RE.sub(rb"\1\2", content)
+        return cls(
+            headers=tuple((name, value) for name, value in response.items() if name.lower() not in SKIPPED_HEADERS),
+            content=content,
+            variants=compress_variants(content, gzip_level=6, brotli_quality=5),
+        )
+
+    def respond(self, request, stale: bool = False) -> HttpResponse:
+        """The stored page in the best encoding the client accepts, or a 304 for a matching validator."""
+        accepted = accepted_encodings(request)
+        for token, content_encoding, suffix in ENCODINGS:
+            if token in accepted and suffix in self.variants:
+                response = HttpResponse(self.variants[suffix])
+                break
+        else:
+            content_encoding = None
+            response = HttpResponse(self.content)
+        for name, value in self.headers:
+            response[name] = value
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+            etag = response.get("ETag")
+            if etag and not etag.startswith("W/"):
+                # Same rule as GZipMiddleware: the compressed body is not byte-identical.
+                response["ETag"] = f"W/{etag}"
+        # Cookie: requests with a session or messages cookie never get the cached copy.
+        patch_vary_headers(response, ("Accept-Encoding", "Cookie"))
+        if stale:
+            response["Age"] = str(max(0, int(time.time() - self.stored_at)))
+            response["Warning"] = '110 - "Response is Stale"'
+            response["X-Page-Cache"] = "stale"
+        else:
+            response["X-Page-Cache"] = "hit"
+        return get_conditional_response(
+            request,
+            etag=response.get("ETag"),
+            last_modified=parse_http_date_safe(response.get("Last-Modified") or ""),
+            response=response,
+        )
+
+
+class _NotStored(Exception):
+    """Raised inside the cache's compute so a response that must stay private is not stored."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class _ServeStale(Exception):
+    """The database failed or timed out and `page` (the last good rendering) answers instead."""
+
+    def __init__(self, page: CachedPage):
+        super().__init__()
+        self.page = page
+
+
+def _storable(response) -> bool:
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if response.has_header("Content-Encoding"):
+        return False
+    cache_control = (response.get("Cache-Control") or "").lower()
+    return not any(directive in cache_control for directive in UNCACHEABLE_DIRECTIVES)
+
+
+def _csrf_used(request) -> bool:
+    # get_token() was called: the page carries a CSRF token tied to this visitor's cookie.
+    return bool(request.META.get("CSRF_COOKIE_NEEDS_UPDATE"))
+
+
+def _bypass(request, skip_params) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return True
+    # A session (logged-in staff, pending form state) or flash messages make the page personal.
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+        return True
+    return any(request.GET.get(name) for name in skip_params)
+
+
+def page_key(request, namespaces) -> str:
+    source = f"{request.get_full_path()}|{template_stamp().isoformat()}"
+    digest = hashlib.md5(source.encode("utf-8"), usedforsecurity=False).hexdigest()
+    return versioned_key(f"page:{digest}", *namespaces)
+
+
+def last_good_key(request) -> str:
+    """Not versioned: during an outage the generations cannot be read, and any copy beats an error."""
+    digest = hashlib.md5(request.get_full_path().encode("utf-8"), usedforsecurity=False).hexdigest()
+    return f"page:{digest}:last-good"
+
+
+def _run_view(view, request, args, kwargs, timeout: float | None):
+    with statement_timeout(timeout):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            response.render()
+    return response
+
+
+_revalidation_lock = threading.Lock()
+_revalidated_at: dict[str, float] = {}
+
+
+def _revalidate(view, request, args, kwargs, policy: FreshnessPolicy, key: str) -> None:
+    try:
+        response = _run_view(view, request, args, kwargs, policy.timeout())
+        if _storable(response):
+            cache.set(key, CachedPage.from_response(response, _csrf_used(request)), policy.stale_if_error())
+        database_breaker.reset()
+    except DatabaseError:
+        database_breaker.trip()
+        logger.warning("Background revalidation of %s failed", request.path, exc_info=True)
+    except Exception:
+        logger.exception("Background revalidation of %s failed", request.path)
+    finally:
+        connections.close_all()
+
+
+def _revalidate_in_background(view, request, args, kwargs, policy: FreshnessPolicy, key: str) -> None:
+    now = time.monotonic()
+    with _revalidation_lock:
+        if now - _revalidated_at.get(key, -REVALIDATE_SECONDS) < REVALIDATE_SECONDS:
+            return
+        if len(_revalidated_at) > 1000:
+            _revalidated_at.clear()
+        _revalidated_at[key] = now
+    background_request = build_request(request.path, request.META.get("QUERY_STRING", ""))
+    threading.Thread(
+        target=_revalidate,
+        args=(view, background_request, args, kwargs, policy, key),
+        name="page-revalidate",
+        daemon=True,
+    ).start()
+
+
+def _render(view, request, args, kwargs, policy: FreshnessPolicy, keep_page: bool):
+    """Run the view, falling back to the last good rendering when the database fails.
+
+    Returns (response, page): `page` is the storable CachedPage when `keep_page`
+    is set and the response may be shared, else None. Raises _ServeStale.
+    """
+
+    stale_seconds = policy.stale_if_error()
+    key = last_good_key(request)
+    last_good = cache.get(key) if stale_seconds else None
+    if last_good is not None and database_breaker.is_open():
+        _revalidate_in_background(view, request, args, kwargs, policy, key)
+        raise _ServeStale(last_good)
+
+    try:
+        response = _run_view(view, request, args, kwargs, policy.timeout() if last_good is not None else None)
+    except DatabaseError:
+        database_breaker.trip()
+        if last_good is None:
+            raise
+        logger.warning("Serving the last good copy of %s", request.path, exc_info=True)
+        raise _ServeStale(last_good)
+    database_breaker.reset()
+
+    if not _storable(response):
+        return response, None
+    csrf_used = _csrf_used(request)
+    refresh = stale_seconds and (
+        keep_page or last_good is None or time.time() - last_good.stored_at >= LAST_GOOD_REFRESH_SECONDS
+    )
+    page = None
+    if (keep_page and not csrf_used) or refresh:
+        page = CachedPage.from_response(response, blank_csrf=csrf_used)
+        if refresh:
+            cache.set(key, page, stale_seconds)
+    return response, (None if csrf_used else page)
+
+
+def cache_anonymous_page(*namespaces: str, skip_params: tuple[str, ...] = (), policy: FreshnessPolicy = DEFAULT_POLICY):
+    """Serve anonymous GETs of a view from the page cache, and from its last good copy when the DB fails.
+
+    The key covers the path, the query string, the deployed templates and the
+    generations of `namespaces` (plus `settings`, shown on every page), so an
+    edit anywhere in those namespaces moves every process on to a fresh render.
+    Requests with a session or messages cookie, non-GETs and requests carrying
+    one of `skip_params` (e.g. free-text search) always run the view. Responses
+    that set cookies, used the CSRF token or are not a plain 200 are never stored
+    fresh; the last good copy of a page with a form has its token blanked.
+
+    When a query fails or exceeds the policy's timeout, the last good copy is
+    served (`Warning: 110`, `Age`) and the database breaker opens: until it
+    closes, the copy is served straight away while one background render per
+    page checks whether the database has recovered.
+
+    Apply it outside `conditional_page` so the stored copy keeps its ETag and
+    Last-Modified and hits can answer revalidations without the validator query.
+    """
+
+    namespaces = (*namespaces, SETTINGS)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            fresh = policy.fresh()
+            if _bypass(request, skip_params) or not (fresh or policy.stale_if_error()):
+                return view(request, *args, **kwargs)
+
+            try:
+                if not fresh:
+                    response, _page = _render(view, request, args, kwargs, policy, keep_page=False)
+                    return response
+
+                rendered = []
+
+                def compute() -> CachedPage:
+                    response, page = _render(view, request, args, kwargs, policy, keep_page=True)
+                    rendered.append(response)
+                    if page is None:
+                        raise _NotStored(response)
+                    return page
+
+                try:
+                    page = get_or_compute(page_key(request, namespaces), compute, fresh)
+                except _NotStored as exc:
+                    return exc.response
+            except _ServeStale as exc:
+                return exc.page.respond(request, stale=True)
+
+            if rendered:
+                # This request rendered the page itself; its response already has everything.
+                return rendered[0]
+            return page.respond(request)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, HttpRequest, HttpResponseNotModified, QueryDict
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+ENCODINGS = (
+    # (Accept-Encoding token, Content-Encoding header, file suffix)
+    ("br", "br", ".br"),
+    ("gzip", "gzip", ".gz"),
+)
+
+
+@dataclass(frozen=True)
+class PrerenderedPage:
+    name: str
+    url_name: str
+    view: Callable
+    variants: Callable[[], Iterable[dict]]
+
+
+_registry: dict[str, PrerenderedPage] = {}
+_manifest_lock = threading.Lock()
+_manifest_cache: dict = {"mtime": None, "entries": {}}
+
+
+def prerender_enabled() -> bool:
+    return bool(getattr(settings, "PRERENDER_ENABLED", False))
+
+
+def prerender_root() -> Path:
+    return Path(getattr(settings, "PRERENDER_ROOT", Path(settings.BASE_DIR) / "tmp" / "prerendered"))
+
+
+def page_key(name: str, kwargs: dict) -> str:
+    parts = [name] + [f"{value}" for _key, value in sorted(kwargs.items())]
+    return "-".join(parts)
+
+
+def prerendered(url_name: str, variants: Callable[[], Iterable[dict]] | None = None):
+    """Serve a view from the prerendered HTML cache when a rendering exists.
+
+    The wrapped view must only depend on the URL kwargs, templates and site_info
+    (PaymentSettings); anything per-user or per-request cannot be prerendered.
+    """
+
+    def decorator(view):
+        page = PrerenderedPage(
+            name=view.__name__,
+            url_name=url_name,
+            view=view,
+            variants=variants or (lambda: [{}]),
+        )
+        _registry[page.name] = page
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in ("GET", "HEAD") and not args and prerender_enabled():
+                response = serve_prerendered(request, page_key(page.name, kwargs))
+                if response is not None:
+                    return response
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _load_manifest() -> dict:
+    path = prerender_root() / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return {}
+    if _manifest_cache["mtime"] == mtime:
+        return _manifest_cache["entries"]
+    with _manifest_lock:
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        _manifest_cache["mtime"] = mtime
+        _manifest_cache["entries"] = entries
+    return entries
+
+
+def accepted_encodings(request) -> set[str]:
+    accepted: set[str] = set()
+    for item in (request.META.get("HTTP_ACCEPT_ENCODING") or "").split(","):
+        token, _sep, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = params.strip().lower()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(token)
+    return accepted
+
+
+def serve_prerendered(request, key: str):
+    """Return a streaming response for a prerendered page, or None when unavailable."""
+    entry = _load_manifest().get(key)
+    if not entry:
+        return None
+
+    root = prerender_root()
+    accepted = accepted_encodings(request)
+    chosen = ("", None, "")
+    for token, content_encoding, suffix in ENCODINGS:
+        if token in accepted and suffix in entry.get("variants", []):
+            chosen = (token, content_encoding, suffix)
+            break
+    _token, content_encoding, suffix = chosen
+    etag = f'"{entry["etag"]}{suffix.replace(".", "-")}"'
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH") or ""
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    try:
+        handle = open(root / f"{key}.html{suffix}", "rb")
+    except OSError:
+        return None
+
+    response = FileResponse(handle, content_type="text/html; charset=utf-8")
+    response["ETag"] = etag
+    if content_encoding:
+        response["Content-Encoding"] = content_encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def build_request(path: str, query_string: str = "") -> HttpRequest:
+    """A bare anonymous GET for rendering a view outside the request cycle."""
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.GET = QueryDict(query_string)
+    host = (getattr(settings, "ALLOWED_HOSTS", None) or ["localhost"])[0].lstrip(".")
+    if host == "*":
+        host = "localhost"
+    request.META = {
+        "SERVER_NAME": host,
+        "SERVER_PORT": "443",
+        "HTTP_HOST": host,
+        "REMOTE_ADDR": "127.0.0.1",
+        "PATH_INFO": path,
+        "QUERY_STRING": query_string,
+        "REQUEST_METHOD": "GET",
+    }
+    request.user = AnonymousUser()
+    return request
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def compress_variants(data: bytes, gzip_level: int = 9, brotli_quality: int = 11) -> dict[str, bytes]:
+    """`{suffix: compressed bytes}` for each entry in ENCODINGS that is available."""
+    variants = {".gz": gzip.compress(data, compresslevel=gzip_level, mtime=0)}
+    try:
+        import brotli
+    except ImportError:  # pragma: no cover - brotli is in requirements.txt
+        return variants
+    variants[".br"] = brotli.compress(data, quality=brotli_quality)
+    return variants
+
+
+def prerender_all() -> dict[str, dict]:
+    """Render every registered page to disk with gzip/brotli variants and refresh the manifest."""
+    from core import views  # noqa: F401  (registers the prerendered views)
+
+    root = prerender_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    manifest: dict[str, dict] = {}
+    for page in _registry.values():
+        for kwargs in page.variants():
+            key = page_key(page.name, kwargs)
+            path = reverse(page.url_name, kwargs=kwargs or None)
+            try:
+                response = page.view(build_request(path), **kwargs)
+                if hasattr(response, "render") and callable(response.render):
+                    response.render()
+            except Exception:
+                logger.exception("Failed to prerender %s", path)
+                continue
+            if response.status_code != 200:
+                logger.warning("Skipping prerender of %s (status %s)", path, response.status_code)
+                continue
+
+            content = response.content
+            _atomic_write(root / f"{key}.html", content)
+            variants = compress_variants(content)
+            for suffix, data in variants.items():
+                _atomic_write(root / f"{key}.html{suffix}", data)
+            manifest[key] = {
+                "path": path,
+                "etag": hashlib.sha256(content).hexdigest()[:32],
+                "bytes": len(content),
+                "variants": sorted(variants),
+            }
+
+    _atomic_write(
+        root / MANIFEST_NAME,
+        json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8"),
+    )
+    return manifest
+
+
+def clear_prerendered() -> None:
+    """Drop the manifest so every page falls back to live rendering."""
+    try:
+        (prerender_root() / MANIFEST_NAME).unlink()
+    except FileNotFoundError:
+        pass
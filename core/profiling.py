@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+from core.querycheck import fingerprint
+
+TOKEN_SALT = "core.profiling"
+TOKEN_VALUE = "profile"
+
+_busy = threading.Lock()
+
+
+def _setting_int(name: str, default: int) -> int:
+    raw = getattr(settings, name, default)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def profile_dir() -> Path:
+    return Path(getattr(settings, "PROFILER_DIR", Path(settings.BASE_DIR) / "tmp" / "profiles"))
+
+
+def make_token() -> str:
+    """Signed token for the X-Profile-Token header; valid for PROFILER_TOKEN_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def token_is_valid(token: str) -> bool:
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=_setting_int("PROFILER_TOKEN_MAX_AGE", 900)
+        )
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+class StackSampler:
+    """Sample one thread's Python stack on a timer and count collapsed stacks.
+
+    The output (`frame;frame;frame count` per line) is what flamegraph.pl and
+    speedscope read.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _short_path(filename: str) -> str:
+    marker = "site-packages/"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    base = str(settings.BASE_DIR)
+    return filename[len(base) + 1 :] if filename.startswith(base) else filename
+
+
+class SqlTimings:
+    def __init__(self):
+        self.total: Counter = Counter()
+        self.count: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            key = fingerprint(sql)
+            self.count[key] += 1
+            self.total[key] += time.perf_counter() - started
+
+    def report(self, limit: int = 20) -> list[dict]:
+        return [
+            {"sql": key[:500], "count": self.count[key], "total_ms": round(seconds * 1000, 3)}
+            for key, seconds in self.total.most_common(limit)
+        ]
+
+
+class ProfileResult:
+    def __init__(self, label: str):
+        self.label = label
+        self.profiler = cProfile.Profile()
+        self.sql = SqlTimings()
+        self.sampler: StackSampler | None = None
+        self.seconds = 0.0
+
+    def stats_text(self, limit: int = 40) -> str:
+        buffer = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=buffer)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+        return buffer.getvalue()
+
+    def summary(self) -> dict:
+        return {
+            "label": self.label,
+            "total_ms": round(self.seconds * 1000, 3),
+            "sql_queries": sum(self.sql.count.values()),
+            "sql_ms": round(sum(self.sql.total.values()) * 1000, 3),
+            "sql": self.sql.report(),
+        }
+
+    def text_report(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{summary['label']}: {summary['total_ms']} ms, {summary['sql_queries']} queries ({summary['sql_ms']} ms SQL)",
+            "",
+            "Slowest SQL (by total time):",
+        ]
+        lines += [f"  {row['total_ms']:>9.3f} ms  {row['count']:>4}x  {row['sql'][:160]}" for row in summary["sql"]]
+        lines += ["", self.stats_text()]
+        return "\n".join(lines)
+
+
+def _slug(label: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", label).strip("-")[:60] or "request"
+
+
+def store(result: ProfileResult) -> str:
+    """Write `<id>.prof`, `<id>.collapsed` and `<id>.json`, keeping the newest PROFILER_MAX_PROFILES."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{_slug(result.label)}"
+    result.profiler.dump_stats(str(directory / f"{profile_id}.prof"))
+    if result.sampler is not None:
+        (directory / f"{profile_id}.collapsed").write_text(result.sampler.collapsed(), encoding="utf-8")
+    (directory / f"{profile_id}.json").write_text(json.dumps(result.summary(), indent=2), encoding="utf-8")
+    _prune(directory, max(1, _setting_int("PROFILER_MAX_PROFILES", 50)))
+    return profile_id
+
+
+def _prune(directory: Path, keep: int) -> None:
+    summaries = sorted(directory.glob("*.json"), key=lambda path: path.name, reverse=True)
+    for stale in summaries[keep:]:
+        for suffix in (".json", ".prof", ".collapsed"):
+            stale.with_suffix(suffix).unlink(missing_ok=True)
+
+
+@contextmanager
+def profile_request(label: str):
+    """Run the block under cProfile, a stack sampler and SQL timing.
+
+    Yields None when another request in this process is already being profiled.
+    """
+
+    if not _busy.acquire(blocking=False):
+        yield None
+        return
+    result = ProfileResult(label)
+    interval = max(1, _setting_int("PROFILER_SAMPLE_INTERVAL_MS", 5)) / 1000
+    result.sampler = StackSampler(threading.get_ident(), interval)
+    try:
+        with _sql_timings(result.sql):
+            result.sampler.start()
+            started = time.perf_counter()
+            result.profiler.enable()
+            try:
+                yield result
+            finally:
+                result.profiler.disable()
+                result.seconds = time.perf_counter() - started
+                result.sampler.stop()
+    finally:
+        _busy.release()
+
+
+@contextmanager
+def _sql_timings(timings: SqlTimings):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings))
+        yield
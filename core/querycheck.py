@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+MODE_LOG = "log"
+MODE_RAISE = "raise"
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Wrappers around every query (and every middleware); the caller of interest is further out.
+_SKIP_FILES = {str(_PROJECT_ROOT / "core" / name) for name in ("querycheck.py", "instrumentation.py", "templating.py")}
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def detection_mode() -> str:
+    mode = (getattr(settings, "NPLUSONE_MODE", "") or "").strip().lower()
+    return mode if mode in (MODE_LOG, MODE_RAISE) else ""
+
+
+def detection_threshold() -> int:
+    try:
+        return max(2, int(getattr(settings, "NPLUSONE_THRESHOLD", 5)))
+    except (TypeError, ValueError):
+        return 5
+
+
+def fingerprint(sql: str) -> str:
+    """SQL with literals and parameter lists collapsed, so per-row variants compare equal."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _SAVEPOINT_RE.sub('"?"', sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _PLACEHOLDER_LIST_RE.sub("(...)", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def _is_app_code(filename: str) -> bool:
+    if filename in _SKIP_FILES or filename.endswith("middleware.py") or "site-packages" in filename:
+        return False
+    try:
+        relative = Path(filename).relative_to(_PROJECT_ROOT)
+    except ValueError:
+        return False
+    # manage.py and the WSGI/ASGI entry points are always on the stack.
+    return len(relative.parts) > 1 and relative.parts[0] != "shopproject"
+
+
+def _caller() -> str:
+    """Innermost frame in app code (not Django, site-packages, middleware or request wrappers)."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if _is_app_code(filename):
+            relative = Path(filename).relative_to(_PROJECT_ROOT).as_posix()
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<django>"
+
+
+@dataclass
+class RepeatedQuery:
+    fingerprint: str
+    count: int
+    locations: list[str]
+
+    def __str__(self) -> str:
+        return f"{self.count}x at {', '.join(self.locations)}: {self.fingerprint[:200]}"
+
+
+@dataclass
+class QueryLog:
+    counts: Counter = field(default_factory=Counter)
+    locations: dict[str, Counter] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, sql: str) -> None:
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        self.locations.setdefault(key, Counter())[_caller()] += 1
+
+    def repeated(self, threshold: int | None = None) -> list[RepeatedQuery]:
+        """Statements run at least `threshold` times, most frequent first."""
+        threshold = threshold or detection_threshold()
+        return [
+            RepeatedQuery(key, count, [location for location, _ in self.locations[key].most_common(3)])
+            for key, count in self.counts.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def record_queries():
+    """Log every statement run on any connection inside the block."""
+    log = QueryLog()
+
+    def wrapper(execute, sql, params, many, context):
+        log.record(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield log
+
+
+def report_repeated(label: str, log: QueryLog, mode: str, threshold: int | None = None) -> list[RepeatedQuery]:
+    repeated = log.repeated(threshold)
+    if not repeated:
+        return repeated
+    message = f"Possible N+1 queries in {label} ({log.total} queries):\n" + "\n".join(f"  {item}" for item in repeated)
+    if mode == MODE_RAISE:
+        raise NPlusOneError(message)
+    logger.warning(message)
+    return repeated
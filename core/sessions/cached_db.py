@@ -0,0 +1,12 @@
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from core.sessions.base import BoundedTTLCache, ChunkedClearMixin, l1_seconds
+
+
+class SessionStore(ChunkedClearMixin, CachedDBStore):
+    """Write-through sessions: the database stays authoritative, reads come from a
+    per-process cache (SESSION_CACHE_ALIAS) for at most SESSION_L1_SECONDS."""
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = BoundedTTLCache(self._cache, l1_seconds())
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+from core.sessions.base import ChunkedClearMixin
+
+
+class SessionStore(ChunkedClearMixin, DBStore):
+    """Django's database sessions with batched expired-session cleanup."""
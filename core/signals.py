@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from store.models import Category, Product, ProductImage, ProductReview
+
+from . import edgecache
+from .generations import CATALOG, DOWNLOADS, NEWS, SETTINGS, bump
+from .images import delete_derivatives, schedule_derivatives
+from .models import Download, News, PaymentSettings
+from .notifications import invalidate_admin_emails
+from .prerender import prerender_all, prerender_enabled
+
+logger = logging.getLogger(__name__)
+
+
+# User fields that decide who receives contact notifications (core.notifications.get_admin_emails).
+RECIPIENT_FIELDS = ("is_superuser", "is_active", "email")
+
+
+def _recipient_state(user) -> tuple:
+    return tuple(getattr(user, name) for name in RECIPIENT_FIELDS)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_recipient_state(sender, instance, update_fields=None, **kwargs):
+    """Note the stored recipient fields; saves that skip them (last_login on login) need no lookup."""
+
+    instance._recipient_state = None
+    if not instance.pk or (update_fields is not None and not set(update_fields) & set(RECIPIENT_FIELDS)):
+        return
+    instance._recipient_state = sender.objects.filter(pk=instance.pk).values_list(*RECIPIENT_FIELDS).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_contact_recipients(sender, instance, created, **kwargs):
+    """Drop the cached recipient list when a save changes who is on it."""
+
+    if created:
+        changed = instance.is_superuser
+    else:
+        before = getattr(instance, "_recipient_state", None)
+        changed = before is not None and before != _recipient_state(instance)
+    if changed:
+        invalidate_admin_emails()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_contact_recipients_on_delete(sender, instance, **kwargs):
+    if instance.is_superuser:
+        invalidate_admin_emails()
+
+
+def _regenerate_prerendered_pages() -> None:
+    try:
+        prerender_all()
+    except Exception:
+        logger.exception("Failed to regenerate prerendered pages")
+
+
+@receiver(post_save, sender=PaymentSettings)
+def refresh_prerendered_pages(sender, **kwargs):
+    """Contact details are baked into every prerendered page (footer, CTA blocks)."""
+
+    if prerender_enabled():
+        transaction.on_commit(_regenerate_prerendered_pages)
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_review_approval(sender, instance, **kwargs):
+    """Note whether the stored review was approved, so unapproving it also refreshes its pages."""
+
+    instance._was_approved = bool(
+        instance.pk and ProductReview.objects.filter(pk=instance.pk, is_approved=True).exists()
+    )
+
+
+def _review_is_shown(review, signal) -> bool:
+    """Only approved reviews are rendered; visitors' pending submissions change no page."""
+
+    if signal is post_delete:
+        return review.is_approved
+    return review.is_approved or getattr(review, "_was_approved", False)
+
+
+GENERATION_NAMESPACES = {
+    Product: CATALOG,
+    Category: CATALOG,
+    ProductImage: CATALOG,
+    ProductReview: CATALOG,
+    News: NEWS,
+    Download: DOWNLOADS,
+    PaymentSettings: SETTINGS,
+}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=Download)
+@receiver(post_delete, sender=Download)
+@receiver(post_save, sender=PaymentSettings)
+@receiver(post_delete, sender=PaymentSettings)
+def bump_cache_generation(sender, instance, signal, **kwargs):
+    """Move every process off cache keys versioned by this model's namespace (sitemap, home, page cache)."""
+
+    if sender is ProductReview and not _review_is_shown(instance, signal):
+        return
+    bump(GENERATION_NAMESPACES[sender])
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    """Note the category a product is saved from, so a move purges the list it left too."""
+
+    instance._edge_old_category_id = None
+    if instance.pk and edgecache.purge_enabled():
+        instance._edge_old_category_id = (
+            Product.objects.filter(pk=instance.pk).values_list("category_id", flat=True).first()
+        )
+
+
+def _edge_keys(sender, instance, created: bool) -> set[str]:
+    """Edge cache keys whose pages show `instance`; list keys only when list membership changed."""
+
+    if sender is Product:
+        # Also purge the category's list: a product may just have moved into it.
+        keys = {edgecache.product_key(instance.pk), edgecache.category_products_key(instance.category_id)}
+        old_category_id = getattr(instance, "_edge_old_category_id", None)
+        if old_category_id is not None and old_category_id != instance.category_id:
+            keys.add(edgecache.category_products_key(old_category_id))
+        return keys | ({edgecache.PRODUCT_LIST} if created else set())
+    if sender is Category:
+        return {edgecache.category_key(instance.pk)} | ({edgecache.CATEGORY_LIST} if created else set())
+    if sender is ProductImage:
+        return {edgecache.product_key(instance.product_id)}
+    if sender is ProductReview:
+        return {edgecache.product_key(instance.product_id), edgecache.REVIEW_LIST}
+    if sender is News:
+        return {edgecache.news_key(instance.pk)} | ({edgecache.NEWS_LIST} if created else set())
+    if sender is Download:
+        return {edgecache.DOWNLOAD_LIST}
+    return {edgecache.SETTINGS}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=Download)
+@receiver(post_delete, sender=Download)
+@receiver(post_save, sender=PaymentSettings)
+@receiver(post_delete, sender=PaymentSettings)
+def purge_edge_cache(sender, instance, signal, created=False, **kwargs):
+    """Purge exactly the CDN copies that show this object (batched, after commit)."""
+
+    if sender is ProductReview and not _review_is_shown(instance, signal):
+        return
+    edgecache.purge(*_edge_keys(sender, instance, created))
+
+
+@receiver(post_save, sender=News)
+def generate_cover_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance.cover_image.name, touch=News.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=News)
+def delete_cover_derivatives(sender, instance, **kwargs):
+    if instance.cover_image.name:
+        delete_derivatives([instance.cover_image.name])
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from store.models import Category, Product
+
+from .caching import get_or_compute
+from .generations import CATALOG, NEWS, token
+from .models import News
+
+CACHE_TIMEOUT = None  # keys carry the catalog/news generations, so a change moves on to new keys
+ITERATOR_CHUNK_SIZE = 2000
+
+STATIC_PATHS = (
+    "/",
+    "/about/",
+    "/services/",
+    "/services/kitchen-setup/",
+    "/services/kitchen-setup/basic/",
+    "/services/kitchen-setup/vip/",
+    "/services/kitchen-setup/cip/",
+    "/projects/",
+    "/catalog/",
+    "/downloads/",
+    "/contact/",
+    "/faq/",
+    "/privacy/",
+    "/terms/",
+)
+
+URLSET_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = "</urlset>\n"
+INDEX_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_CLOSE = "</sitemapindex>\n"
+
+
+@dataclass(frozen=True)
+class ShardInfo:
+    number: int
+    url_count: int
+    lastmod: datetime | None
+
+
+def shard_size() -> int:
+    try:
+        size = int(getattr(settings, "SITEMAP_SHARD_SIZE", 50000))
+    except (TypeError, ValueError):
+        size = 50000
+    # The sitemap protocol caps a single file at 50,000 URLs.
+    return max(1, min(size, 50000))
+
+
+def _base_url() -> str:
+    return (getattr(settings, "SITE_BASE_URL", "") or "").strip().rstrip("/")
+
+
+def _version() -> str:
+    return token(CATALOG, NEWS)
+
+
+def iter_sitemap_entries() -> Iterator[tuple[str, datetime | None]]:
+    """Yield (path, lastmod) for every public URL using one streamed query per model."""
+    for path in STATIC_PATHS:
+        yield path, None
+
+    news_rows = News.objects.order_by("-created_at").values_list("slug", "updated_at")
+    for slug, updated_at in news_rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield f"/projects/{slug}/", updated_at
+
+    category_rows = (
+        Category.objects.annotate(lastmod=Max("products__updated_at"))
+        .order_by("pk")
+        .values_list("slug", "lastmod")
+    )
+    for slug, lastmod in category_rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield f"/catalog/{slug}/", lastmod
+
+    product_rows = Product.objects.order_by("pk").values_list("slug", "category__slug", "updated_at")
+    for slug, category_slug, updated_at in product_rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        if not slug or not category_slug:
+            continue
+        yield f"/catalog/{category_slug}/{slug}/", updated_at
+
+
+def _url_element(loc: str, lastmod: datetime | None) -> str:
+    if lastmod is None:
+        return f"  <url><loc>{escape(loc)}</loc></url>\n"
+    return f"  <url><loc>{escape(loc)}</loc><lastmod>{lastmod.date().isoformat()}</lastmod></url>\n"
+
+
+def _shard_key(version: str, number: int) -> str:
+    return f"sitemap:{version}:shard:{number}"
+
+
+def _index_key(version: str) -> str:
+    return f"sitemap:{version}:index"
+
+
+def build_sitemap() -> list[ShardInfo]:
+    """Stream all URLs once, cache each shard as it fills, and return the shard list.
+
+    Only one shard's XML is held in memory at a time.
+    """
+
+    version = _version()
+    base_url = _base_url()
+    size = shard_size()
+
+    shards: list[ShardInfo] = []
+    parts: list[str] = []
+    count = 0
+    lastmod: datetime | None = None
+
+    def flush():
+        number = len(shards) + 1
+        cache.set(_shard_key(version, number), URLSET_OPEN + "".join(parts) + URLSET_CLOSE, CACHE_TIMEOUT)
+        shards.append(ShardInfo(number=number, url_count=count, lastmod=lastmod))
+
+    for path, entry_lastmod in iter_sitemap_entries():
+        parts.append(_url_element(f"{base_url}{path}", entry_lastmod))
+        count += 1
+        if entry_lastmod is not None and (lastmod is None or entry_lastmod > lastmod):
+            lastmod = entry_lastmod
+        if count >= size:
+            flush()
+            parts, count, lastmod = [], 0, None
+    if count or not shards:
+        flush()
+
+    return shards
+
+
+def get_shards() -> list[ShardInfo]:
+    # Single flight: after an invalidation only one worker rebuilds while crawlers wait for it.
+    return get_or_compute(_index_key(_version()), build_sitemap, CACHE_TIMEOUT)
+
+
+def render_index() -> str:
+    base_url = _base_url()
+    lines = [INDEX_OPEN]
+    for shard in get_shards():
+        loc = escape(f"{base_url}/sitemap-{shard.number}.xml")
+        if shard.lastmod is None:
+            lines.append(f"  <sitemap><loc>{loc}</loc></sitemap>\n")
+        else:
+            lines.append(
+                f"  <sitemap><loc>{loc}</loc><lastmod>{shard.lastmod.date().isoformat()}</lastmod></sitemap>\n"
+            )
+    lines.append(INDEX_CLOSE)
+    return "".join(lines)
+
+
+def get_shard(number: int) -> str | None:
+    """Cached XML for one shard, or None when the shard does not exist."""
+    version = _version()
+    content = cache.get(_shard_key(version, number))
+    if content is not None:
+        return content
+    shards = get_shards()
+    if number < 1 or number > len(shards):
+        return None
+    content = cache.get(_shard_key(version, number))
+    if content is None:
+        # Evicted independently of the index; rebuild everything for this version.
+        build_sitemap()
+        content = cache.get(_shard_key(version, number))
+    return content
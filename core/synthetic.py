@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import base64
+import random
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from core.models import DailyVisitStat, News, SiteVisit
+from store.models import Category, Product, ProductFeature, ProductImage, ProductReview
+
+# 1x1 PNG shared by every synthetic ProductImage.
+PLACEHOLDER_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+PRODUCT_WORDS = ["فر", "اجاق", "یخچال", "سینک", "هود", "میز کار", "ماشین ظرفشویی", "سرخ‌کن", "کباب‌پز", "دیگ"]
+BRANDS = ["Rational", "Electrolux", "Hoshizaki", "Winterhalter", "Fagor", "استیرا"]
+DOMAINS = ["رستوران", "هتل", "بیمارستان", "کافه", "صنایع غذایی"]
+FEATURE_NAMES = ["ابعاد", "وزن", "توان", "ولتاژ", "ظرفیت", "جنس بدنه", "گارانتی", "کشور سازنده"]
+
+
+@dataclass
+class DatasetSize:
+    categories: int = 10
+    products: int = 20  # per category
+    features: int = 5  # per product
+    images: int = 1  # per product
+    reviews: int = 2  # per product
+    news: int = 20
+    visits: int = 1000  # SiteVisit rows spread over the last 30 days
+
+
+def build_dataset(size: DatasetSize, *, seed: int = 0, prefix: str = "bench") -> dict[str, int]:
+    """Insert a synthetic catalog with bulk queries; the same seed gives the same rows.
+
+    Slugs are derived from `prefix`, so run this on an empty database or inside a
+    transaction that is rolled back afterwards (as the benchmark command does).
+    """
+
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    categories = Category.objects.bulk_create(
+        Category(name=f"{rng.choice(PRODUCT_WORDS)} {index}", slug=f"{prefix}-category-{index}")
+        for index in range(size.categories)
+    )
+    if any(category.pk is None for category in categories):
+        # Backends that cannot return primary keys from bulk inserts (MySQL).
+        categories = list(Category.objects.filter(slug__startswith=f"{prefix}-category-").order_by("pk"))
+
+    products = Product.objects.bulk_create(
+        Product(
+            name=f"{rng.choice(PRODUCT_WORDS)} {rng.choice(BRANDS)} مدل {category_index}-{index}",
+            slug=f"{prefix}-{category_index}-{index}",
+            summary="محصول آزمایشی برای سنجش کارایی",
+            description="توضیحات " * rng.randint(20, 80),
+            price=rng.randint(10, 5000) * 100_000,
+            domain=rng.choice(DOMAINS),
+            category=category,
+            brand=rng.choice(BRANDS),
+            sku=f"{prefix.upper()}-{category_index:03d}-{index:04d}",
+            tags=" ".join(rng.sample(PRODUCT_WORDS, 3)),
+        )
+        for category_index, category in enumerate(categories)
+        for index in range(size.products)
+    )
+    if any(product.pk is None for product in products):
+        products = list(Product.objects.filter(slug__startswith=f"{prefix}-").order_by("pk"))
+
+    ProductFeature.objects.bulk_create(
+        ProductFeature(product=product, name=FEATURE_NAMES[index % len(FEATURE_NAMES)], value=str(rng.randint(1, 999)))
+        for product in products
+        for index in range(size.features)
+    )
+
+    if size.images:
+        image_name = default_storage.save(f"products/{prefix}/placeholder.png", ContentFile(PLACEHOLDER_PNG))
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=image_name, is_primary=index == 0, sort_order=index)
+            for product in products
+            for index in range(size.images)
+        )
+
+    ProductReview.objects.bulk_create(
+        ProductReview(
+            product=product,
+            name=f"مشتری {index}",
+            rating=rng.randint(3, 5),
+            comment="کیفیت خوب و پشتیبانی مناسب",
+            is_approved=True,
+        )
+        for product in products
+        for index in range(size.reviews)
+    )
+
+    News.objects.bulk_create(
+        News(title=f"پروژه {index}", slug=f"{prefix}-news-{index}", summary="پروژه آزمایشی", text="متن " * 200)
+        for index in range(size.news)
+    )
+
+    today = timezone.localdate(now)
+    visits = [
+        SiteVisit(
+            session_key=f"{prefix}{index:032d}"[-40:],
+            visited_on=today - timedelta(days=rng.randrange(30)),
+            first_path="/",
+        )
+        for index in range(size.visits)
+    ]
+    SiteVisit.objects.bulk_create(visits, batch_size=1000)
+    per_day: dict = {}
+    for visit in visits:
+        per_day[visit.visited_on] = per_day.get(visit.visited_on, 0) + 1
+    DailyVisitStat.objects.bulk_create(
+        [DailyVisitStat(date=day, total_hits=count * 3, unique_sessions=count) for day, count in per_day.items()],
+        ignore_conflicts=True,
+    )
+
+    return {**asdict(size), "total_products": len(products)}
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_img(src, image=None, alt="", sizes="100vw", img_id=""):
+    """Render an <img> for `src`, wrapped in <picture> with srcsets when derivatives exist.
+
+    `image` is a core.images.ResponsiveImage (or None for originals without derivatives).
+    """
+
+    if not src:
+        return ""
+    id_attr = format_html(' id="{}"', img_id) if img_id else ""
+    if not image:
+        return format_html('<img{} src="{}" alt="{}" loading="lazy" decoding="async">', id_attr, src, alt)
+
+    source = format_html('<source type="image/webp" srcset="{}" sizes="{}">', image.webp, sizes) if image.webp else ""
+    srcset = format_html(' srcset="{}" sizes="{}"', image.jpeg, sizes) if image.jpeg else ""
+    return format_html(
+        '<picture>{}<img{} src="{}"{} alt="{}" loading="lazy" decoding="async"></picture>',
+        source,
+        id_attr,
+        src,
+        srcset,
+        alt,
+    )
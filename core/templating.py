@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.template import Context, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import Template
+from django.template.loader_tags import ExtendsNode
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = {".html", ".txt", ".xml"}
+
+_active_timings: contextvars.ContextVar["TemplateTimings | None"] = contextvars.ContextVar(
+    "template_timings", default=None
+)
+_original_render = None
+
+
+@dataclass
+class _TemplateStat:
+    renders: int = 0
+    total: float = 0.0
+    own: float = 0.0
+
+
+@dataclass
+class TemplateTimings:
+    """Per-request render timings, keyed by template name (includes and parents too)."""
+
+    stats: dict[str, _TemplateStat] = field(default_factory=dict)
+    _stack: list[float] = field(default_factory=list)
+
+    def measure(self, template: Template, context, render):
+        name = template.origin.template_name if template.origin else None
+        name = name or template.name or "<string>"
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            stat = self.stats.setdefault(str(name), _TemplateStat())
+            stat.renders += 1
+            stat.own += elapsed - children
+            stat.total += elapsed
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(stat.own for stat in self.stats.values())
+
+    def report(self) -> list[dict]:
+        rows = [
+            {
+                "template": name,
+                "renders": stat.renders,
+                "total_ms": round(stat.total * 1000, 3),
+                "self_ms": round(stat.own * 1000, 3),
+            }
+            for name, stat in self.stats.items()
+        ]
+        rows.sort(key=lambda row: row["self_ms"], reverse=True)
+        return rows
+
+
+def _timed_render(self, context):
+    timings = _active_timings.get()
+    if timings is None:
+        return _original_render(self, context)
+    return timings.measure(self, context, _original_render)
+
+
+def install_render_hook() -> None:
+    """Wrap Template._render once so timings can be collected per request.
+
+    When no collector is active the wrapper costs one context-variable lookup.
+    """
+
+    global _original_render
+    if Template._render is _timed_render:
+        return
+    _original_render = Template._render
+    Template._render = _timed_render
+
+
+@contextmanager
+def collect_template_timings():
+    install_render_hook()
+    timings = TemplateTimings()
+    token = _active_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _active_timings.reset(token)
+
+
+def _loader_dirs(loaders) -> list[Path]:
+    dirs: list[Path] = []
+    for loader in loaders:
+        nested = getattr(loader, "loaders", None)
+        if nested:
+            dirs.extend(_loader_dirs(nested))
+            continue
+        get_dirs = getattr(loader, "get_dirs", None)
+        if get_dirs is None:
+            continue
+        dirs.extend(Path(d) for d in get_dirs())
+    return dirs
+
+
+def iter_template_names(engine) -> list[str]:
+    """Every template name reachable through the engine's loaders, first match wins."""
+    seen: set[str] = set()
+    names: list[str] = []
+    for base_dir in _loader_dirs(engine.template_loaders):
+        if not base_dir.is_dir():
+            continue
+        for path in sorted(base_dir.rglob("*")):
+            if not path.is_file() or path.suffix.lower() not in TEMPLATE_SUFFIXES:
+                continue
+            name = path.relative_to(base_dir).as_posix()
+            if name in seen:
+                continue
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+@dataclass
+class WarmupResult:
+    compiled: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def warm_templates() -> WarmupResult:
+    """Compile every template (and its constant `extends` parents) into the cached loader.
+
+    Run at process start so the first request does not pay template parsing.
+    """
+
+    result = WarmupResult()
+    started = time.perf_counter()
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        for name in iter_template_names(engine):
+            try:
+                template = engine.get_template(name)
+                context = Context()
+                with context.render_context.push_state(template), context.bind_template(template):
+                    for node in template.nodelist.get_nodes_by_type(ExtendsNode):
+                        if node.parent_name.var is not None and not hasattr(node.parent_name.var, "resolve"):
+                            node.get_parent(context)
+            except Exception as exc:
+                message = (str(exc).splitlines() or [""])[0]
+                result.failed[name] = f"{type(exc).__name__}: {message}"
+                continue
+            result.compiled += 1
+    result.seconds = time.perf_counter() - started
+    if result.failed:
+        # Third-party apps ship templates for optional integrations; those are expected here.
+        logger.info("Template warm-up skipped %d template(s)", len(result.failed))
+    return result
@@ -0,0 +1,76 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import SiteVisit
+from store.models import Product
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def _run(self, *args) -> str:
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "--categories", "2", "--products", "3", "--visits", "20", "--iterations", "2", "--warmup", "0",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_reports_views_and_rolls_back_the_dataset(self):
+        report_path = self.tmp / "run.json"
+
+        output = self._run("--only", "catalog,catalog_product,catalog_suggest", "--json", str(report_path))
+
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+        rows = {row["name"]: row for row in report["results"]}
+        self.assertEqual(set(rows), {"catalog", "catalog_product", "catalog_suggest"})
+        self.assertEqual({row["status"] for row in rows.values()}, {200})
+        self.assertGreater(rows["catalog_product"]["queries"], 0)
+        self.assertEqual(report["meta"]["dataset"]["total_products"], 6)
+        self.assertIn("p95 ms", output)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(SiteVisit.objects.exists())
+
+    def test_compare_with_an_earlier_run(self):
+        baseline = self.tmp / "baseline.json"
+        self._run("--only", "catalog", "--json", str(baseline))
+
+        output = self._run("--only", "catalog", "--compare", str(baseline))
+
+        self.assertIn("Δp50", output)
+
+    def test_crawler_load_creates_no_sessions(self):
+        report_path = self.tmp / "crawler.json"
+
+        self._run("--only", "catalog", "--crawler-hits", "5", "--json", str(report_path))
+
+        crawler = json.loads(report_path.read_text(encoding="utf-8"))["crawler"]
+        self.assertEqual(crawler["hits"], 5)
+        self.assertEqual(crawler["sessions_created"], 0)
+        self.assertEqual(crawler["visits_created"], 0)
+        self.assertEqual(crawler["bot_hits"], 5)
+
+    def test_classifier_cost(self):
+        report_path = self.tmp / "classifier.json"
+
+        output = self._run("--only", "catalog", "--classifier-calls", "200", "--json", str(report_path))
+
+        classifier = json.loads(report_path.read_text(encoding="utf-8"))["classifier"]
+        self.assertEqual(classifier["calls"], 200)
+        self.assertGreater(classifier["uncached_us"], 0)
+        self.assertIn("UA classifier", output)
+
+    def test_unknown_scenario(self):
+        with self.assertRaises(CommandError):
+            self._run("--only", "nope")
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.caching import CachedValue, TieredCache, cache_stats, get_or_compute
+from core.metrics import _empty_counters, render_prometheus
+
+
+def tiered(location, **options) -> TieredCache:
+    l2 = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}
+    return TieredCache(None, {"TIMEOUT": 300, "OPTIONS": {"L2": l2, **options}})
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        cache_stats.reset()
+
+    def test_reads_fall_through_l1_to_l2(self):
+        cache = tiered(self.location)
+        cache.set("catalog:a", {"x": 1})
+
+        self.assertEqual(cache.get("catalog:a"), {"x": 1})
+        cache.clear_local()
+        self.assertEqual(cache.get("catalog:a"), {"x": 1})
+        self.assertIsNone(cache.get("catalog:absent"))
+
+        counters = cache_stats.snapshot()["catalog"]
+        self.assertEqual((counters["l1_hit"], counters["l2_hit"], counters["miss"]), (1, 1, 1))
+
+    def test_l1_is_a_bounded_lru_with_copies(self):
+        cache = tiered(self.location, L1_MAX_ENTRIES=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, [key])
+        self.assertEqual(list(cache._l1), [cache.make_key("b"), cache.make_key("c")])
+
+        cache.get("c")[0] = "mutated"
+        self.assertEqual(cache.get("c"), ["c"])
+
+    def test_other_workers_see_changes_after_l1_seconds(self):
+        worker_a, worker_b = tiered(self.location, L1_SECONDS=0.1), tiered(self.location, L1_SECONDS=0.1)
+        worker_a.set("settings:phone", "1")
+        self.assertEqual(worker_b.get("settings:phone"), "1")
+
+        worker_a.set("settings:phone", "2")
+        self.assertEqual(worker_b.get("settings:phone"), "1")
+        time.sleep(0.15)
+        self.assertEqual(worker_b.get("settings:phone"), "2")
+
+    def test_only_one_worker_computes_a_missing_value(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "page"
+
+        workers = [tiered(self.location) for _ in range(2)]
+        results = []
+        threads = [
+            threading.Thread(target=lambda cache=cache: results.append(cache.get_or_compute("home:x", compute, 60)))
+            for cache in workers * 4
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["page"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertGreaterEqual(cache_stats.snapshot()["home"]["lock_wait"], 1)
+
+    def test_expired_value_is_served_while_another_worker_refreshes(self):
+        cache = tiered(self.location)
+        cache.set("home:x", CachedValue("old", 0.01, time.time() - 1), 60)
+        lock = cache._acquire("home:x", None)
+        self.addCleanup(cache._release, lock, None)
+
+        self.assertEqual(cache.get_or_compute("home:x", lambda: "new", 60), "old")
+        self.assertEqual(cache_stats.snapshot()["home"]["stale"], 1)
+
+    def test_early_refresh_before_expiry(self):
+        cache = tiered(self.location)
+        cache.set("home:x", CachedValue("old", 1.0, time.time() + 1), 60)
+
+        self.assertEqual(cache.get_or_compute("home:x", lambda: "kept", 60, beta=0.0), "old")
+        # A recompute cost far above the remaining lifetime makes a refresh (practically) certain.
+        cache.set("home:x", CachedValue("old", 1e9, time.time() + 1), 60)
+        self.assertEqual(cache.get_or_compute("home:x", lambda: "new", 60), "new")
+        self.assertEqual(cache_stats.snapshot()["home"]["early_refresh"], 1)
+
+    def test_plain_backends_fall_back_to_get_and_set(self):
+        self.addCleanup(caches["sessions"].delete, "fallback:x")
+        self.assertEqual(get_or_compute("fallback:x", lambda: 42, 60, alias="sessions"), 42)
+        self.assertEqual(get_or_compute("fallback:x", lambda: 0, 60, alias="sessions"), 42)
+
+    def test_counters_are_exported(self):
+        cache = tiered(self.location)
+        cache.get_or_compute("sitemap:index", lambda: [], 60)
+        totals = _empty_counters()
+        totals.update(processes=[], cache=cache_stats.snapshot())
+
+        output = render_prometheus(totals, {})
+
+        self.assertIn('styra_cache_events_total{namespace="sitemap",event="compute"} 1', output)
+        self.assertIn('styra_cache_seconds_total{namespace="sitemap",op="compute"}', output)
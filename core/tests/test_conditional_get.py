@@ -0,0 +1,42 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import Download, News, PaymentSettings
+
+from .utils import client_without_visit_tracking
+
+
+class ProjectsConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = client_without_visit_tracking()
+        PaymentSettings.get_solo()
+        self.project = News.objects.create(title="Kitchen A", text="-")
+
+    def test_projects_list_and_detail_304_cost_one_query(self):
+        for url in (reverse("projects_list"), reverse("project_detail", args=[self.project.slug]), reverse("downloads")):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            with self.assertNumQueries(1):
+                second = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(second.status_code, 304)
+
+    def test_new_project_changes_list_etag(self):
+        etag = self.client.get(reverse("projects_list"))["ETag"]
+        News.objects.create(title="Kitchen B", text="-")
+
+        response = self.client.get(reverse("projects_list"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_download_edit_changes_etag(self):
+        download = Download.objects.create(title="Catalog", file="downloads/catalog.pdf")
+        etag = self.client.get(reverse("downloads"))["ETag"]
+        download.title = "Catalog 2026"
+        download.save()
+
+        response = self.client.get(reverse("downloads"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_project_404s(self):
+        self.assertEqual(self.client.get(reverse("project_detail", args=["missing"])).status_code, 404)
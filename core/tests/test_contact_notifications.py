@@ -0,0 +1,134 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.generations import ADMINS
+from core.models import CacheGeneration, ContactMessage, ContactNotification
+from core.notifications import get_admin_emails, process_pending_notifications, seconds_until_due
+
+SMTP_DELAY_SECONDS = 0.4
+
+
+class SlowEmailBackend(EmailBackend):
+    """Locmem backend that simulates a slow SMTP server."""
+
+    def send_messages(self, messages):
+        time.sleep(SMTP_DELAY_SECONDS)
+        return super().send_messages(messages)
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise OSError("smtp unavailable")
+
+
+CONTACT_POST = {
+    "name": "Ali",
+    "email": "ali@example.com",
+    "phone": "09120000000",
+    "inquiry_type": "consultation",
+    "message": "Need a quote",
+}
+
+
+@override_settings(
+    CONTACT_NOTIFICATION_MODE="command",
+    EMAIL_BACKEND="core.tests.test_contact_notifications.SlowEmailBackend",
+    COMPANY_EMAIL="support@example.com",
+    DEBUG=False,
+    SECURE_SSL_REDIRECT=False,
+)
+class ContactNotificationQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_superuser("admin", "boss@example.com", "pass")
+
+    def test_post_returns_before_slow_smtp_and_worker_sends_later(self):
+        started = time.perf_counter()
+        response = self.client.post(reverse("contact"), CONTACT_POST)
+        post_elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        notification = ContactNotification.objects.get()
+        self.assertEqual(notification.status, ContactNotification.STATUS_PENDING)
+
+        started = time.perf_counter()
+        sent, failed = process_pending_notifications()
+        send_elapsed = time.perf_counter() - started
+
+        self.assertEqual((sent, failed), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["support@example.com"])
+        self.assertEqual(mail.outbox[0].bcc, ["boss@example.com"])
+        # The request no longer pays the SMTP latency; the worker does.
+        self.assertGreaterEqual(send_elapsed, SMTP_DELAY_SECONDS)
+        self.assertLess(post_elapsed, SMTP_DELAY_SECONDS)
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, ContactNotification.STATUS_SENT)
+        self.assertIsNotNone(notification.sent_at)
+
+    @override_settings(EMAIL_BACKEND="core.tests.test_contact_notifications.FailingEmailBackend")
+    def test_failed_send_is_rescheduled(self):
+        self.client.post(reverse("contact"), CONTACT_POST)
+
+        with self.assertLogs("core.notifications", "ERROR"):
+            sent, failed = process_pending_notifications()
+
+        self.assertEqual((sent, failed), (0, 1))
+        notification = ContactNotification.objects.get()
+        self.assertEqual(notification.status, ContactNotification.STATUS_PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertIn("smtp unavailable", notification.last_error)
+        # Backoff keeps it out of the next immediate pass.
+        self.assertEqual(process_pending_notifications(), (0, 0))
+
+    @override_settings(CONTACT_NOTIFICATION_POLL_SECONDS=60, CONTACT_NOTIFICATION_LOCK_SECONDS=600)
+    def test_worker_sleeps_until_the_next_retry_or_stale_claim(self):
+        self.assertIsNone(seconds_until_due())
+
+        self.client.post(reverse("contact"), CONTACT_POST)
+        notification = ContactNotification.objects.get()
+        now = timezone.now()
+        self.assertEqual(seconds_until_due(now), 0)
+
+        ContactNotification.objects.update(available_at=now + timedelta(seconds=20))
+        self.assertAlmostEqual(seconds_until_due(now), 20, places=3)
+        ContactNotification.objects.update(available_at=now + timedelta(hours=1))
+        self.assertEqual(seconds_until_due(now), 60)
+
+        # A claim from a worker that died is re-queued once the lock goes stale.
+        ContactNotification.objects.filter(pk=notification.pk).update(
+            status=ContactNotification.STATUS_PROCESSING, locked_at=now - timedelta(seconds=590)
+        )
+        self.assertAlmostEqual(seconds_until_due(now), 11, places=3)
+
+    def test_admin_recipients_are_cached_and_invalidated_on_user_change(self):
+        self.assertEqual(get_admin_emails(), ["boss@example.com"])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_admin_emails(), ["boss@example.com"])
+
+        get_user_model().objects.create_superuser("admin2", "second@example.com", "pass")
+
+        self.assertEqual(sorted(get_admin_emails()), ["boss@example.com", "second@example.com"])
+
+        admin = get_user_model().objects.get(username="admin")
+        before = CacheGeneration.objects.get(namespace=ADMINS).value
+        self.client.force_login(admin)
+        admin.first_name = "Boss"
+        admin.save()
+        get_user_model().objects.create_user("staff", "staff@example.com", "pass")
+        self.assertEqual(CacheGeneration.objects.get(namespace=ADMINS).value, before)
+
+        admin.is_active = False
+        admin.save()
+        self.assertEqual(get_admin_emails(), ["second@example.com"])
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.downloads import download_counter
+from core.models import Download
+from core.tests.utils import client_without_visit_tracking
+from store.models import Category, Product
+
+PAYLOAD = bytes(range(256)) * 8  # 2048 bytes
+
+
+class DownloadServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media_root, DOWNLOAD_COUNT_FLUSH_HITS=1000)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        download_counter.flush()
+        self.addCleanup(download_counter.flush)
+
+        self.client = client_without_visit_tracking()
+        self.item = Download(title="Catalog")
+        self.item.file.save("catalog.pdf", ContentFile(PAYLOAD), save=False)
+        self.item.save()
+        self.url = reverse("download_file", kwargs={"slug": self.item.slug})
+
+    def _body(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_full_download_streams_the_file(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(self._body(response), PAYLOAD)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(len(PAYLOAD)))
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(PAYLOAD)}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(self._body(response), PAYLOAD[100:200])
+
+        suffix = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(self._body(suffix), PAYLOAD[-10:])
+
+        open_ended = self.client.get(self.url, HTTP_RANGE="bytes=2000-")
+        self.assertEqual(self._body(open_ended), PAYLOAD[2000:])
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(PAYLOAD)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(PAYLOAD)}")
+
+        self.assertIn("no-store", response["Cache-Control"])
+        self.assertNotIn("public", response["Cache-Control"])
+
+        multi = self.client.get(self.url, HTTP_RANGE="bytes=0-1,5-6")
+        self.assertEqual(multi.status_code, 200)
+
+    def test_downloads_are_not_gzipped(self):
+        full = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(full.has_header("Content-Encoding"))
+        self.assertEqual(full["Content-Length"], str(len(PAYLOAD)))
+        self.assertEqual(self._body(full), PAYLOAD)
+
+        partial = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_RANGE="bytes=100-199")
+        self.assertEqual(partial.status_code, 206)
+        self.assertFalse(partial.has_header("Content-Encoding"))
+        self.assertEqual(partial["Content-Length"], "100")
+        self.assertEqual(self._body(partial), PAYLOAD[100:200])
+
+    def test_if_range_rejects_a_weak_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=f"W/{etag}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), PAYLOAD)
+
+    def test_if_range_falls_back_to_full_file_when_stale(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        current = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag)
+        stale = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(current.status_code, 206)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self._body(stale), PAYLOAD)
+
+    def test_revalidation_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_counts_are_buffered_and_resumes_are_not_counted(self):
+        self.client.get(self.url)
+        self.client.get(self.url, HTTP_RANGE="bytes=0-99")
+        self.client.get(self.url, HTTP_RANGE="bytes=100-")
+        self.client.head(self.url)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.download_count, 0)
+        self.assertEqual(download_counter.pending(), 2)
+
+        download_counter.flush()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.download_count, 2)
+
+    def test_flushes_once_the_hit_threshold_is_reached(self):
+        with self.settings(DOWNLOAD_COUNT_FLUSH_HITS=2):
+            self.client.get(self.url)
+            self.client.get(self.url)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.download_count, 2)
+
+    @override_settings(DOWNLOAD_SENDFILE_BACKEND="nginx", DOWNLOAD_ACCEL_PREFIX="/protected-media/")
+    def test_nginx_offload(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.item.file.name}")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+    @override_settings(DOWNLOAD_SENDFILE_BACKEND="apache")
+    def test_apache_offload(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["X-Sendfile"], self.item.file.path)
+
+    def test_product_datasheet(self):
+        category = Category.objects.create(name="Ovens")
+        product = Product(name="Oven", description="-", domain="-", category=category)
+        product.datasheet.save("oven.pdf", ContentFile(b"%PDF-1.4 datasheet"), save=False)
+        product.save()
+
+        response = self.client.get(
+            reverse(
+                "catalog_product_datasheet",
+                kwargs={"category_slug": category.slug, "product_slug": product.slug},
+            )
+        )
+        download_counter.flush()
+
+        self.assertEqual(self._body(response), b"%PDF-1.4 datasheet")
+        product.refresh_from_db()
+        self.assertEqual(product.datasheet_download_count, 1)
+
+    def test_missing_file_is_404(self):
+        self.item.file.storage.delete(self.item.file.name)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
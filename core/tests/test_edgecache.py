@@ -0,0 +1,216 @@
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.visitors import cookie_name as visitor_cookie_name
+from store.models import Category, Product, ProductReview
+
+from .utils import client_without_visit_tracking
+
+
+class PurgeStub(BaseHTTPRequestHandler):
+    """Stands in for the CDN purge API: records every request body and answers 200."""
+
+    received: "queue.Queue[tuple[dict, dict]]"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.received.put((dict(self.headers), body))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"success": true}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(EDGE_CACHE_SECONDS=600)
+class SurrogateKeyHeaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = client_without_visit_tracking()
+        self.category = Category.objects.create(name="Ovens")
+        self.product = Product.objects.create(name="Combi oven", description="-", domain="-", category=self.category)
+
+    def test_product_page_is_public_and_tagged(self):
+        url = reverse("catalog_product", args=[self.category.slug, self.product.slug])
+        self.client.get(url)  # creates the contact settings row, which is part of the ETag
+
+        response = self.client.get(url)
+
+        self.assertEqual(response["Cache-Control"], "public, max-age=0, s-maxage=600")
+        self.assertEqual(
+            response["Surrogate-Key"].split(),
+            [f"category-{self.category.pk}", f"product-{self.product.pk}", "settings"],
+        )
+        self.assertEqual(response["Cache-Tag"], response["Surrogate-Key"].replace(" ", ","))
+
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn("s-maxage=600", revalidated["Cache-Control"])
+        self.assertNotIn("Surrogate-Key", revalidated)
+
+    def test_listing_pages_carry_the_keys_of_what_they_show(self):
+        category_url = reverse("catalog_category", args=[self.category.slug])
+
+        keys = self.client.get(category_url)["Surrogate-Key"].split()
+        self.assertIn(f"product-{self.product.pk}", keys)
+        self.assertIn(f"category-{self.category.pk}-products", keys)
+        self.assertIn("products", self.client.get(reverse("catalog"))["Surrogate-Key"].split())
+
+        search = self.client.get(category_url, {"q": "oven"})
+        self.assertIn("private", search["Cache-Control"])
+
+    def test_home_page_lists_categories_and_reviewed_products(self):
+        other = Category.objects.create(name="Fridges")
+        reviewed = Product.objects.create(name="Chiller", description="-", domain="-", category=other)
+        ProductReview.objects.create(product=reviewed, name="Chef", comment="Cold", is_approved=True)
+
+        keys = self.client.get(reverse("home"))["Surrogate-Key"].split()
+
+        for key in ("categories", "reviews", f"category-{self.category.pk}", f"category-{other.pk}"):
+            self.assertIn(key, keys)
+        self.assertIn(f"product-{reviewed.pk}", keys)
+
+    def test_personal_responses_stay_private(self):
+        self.client.force_login(get_user_model().objects.create_superuser("staff", "staff@example.com", "pass"))
+
+        response = self.client.get(reverse("catalog"))
+
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotIn("public", response["Cache-Control"])
+
+    def test_response_setting_the_visitor_cookie_is_not_shared(self):
+        # Full middleware stack: SiteVisitMiddleware hands out its cookie after the view ran.
+        client = Client(HTTP_USER_AGENT="Mozilla/5.0")
+        url = reverse("catalog_product", args=[self.category.slug, self.product.slug])
+
+        first = client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertIn(visitor_cookie_name(), first.cookies)
+        self.assertIn("private", first["Cache-Control"])
+        self.assertNotIn("public", first["Cache-Control"])
+        self.assertNotIn("s-maxage", first["Cache-Control"])
+
+        returning = client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(returning.cookies)
+        self.assertEqual(returning["Cache-Control"], "public, max-age=0, s-maxage=600")
+        self.assertEqual(returning["Vary"], "Accept-Encoding")
+        self.assertIn("Surrogate-Key", returning)
+
+    def test_csrf_endpoint_is_never_cached(self):
+        response = self.client.get(reverse("csrf_token"))
+
+        self.assertTrue(response.json()["token"])
+        self.assertIn("no-store", response["Cache-Control"])
+
+
+class PurgeDispatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.received = queue.Queue()
+        handler = type("Handler", (PurgeStub,), {"received": cls.received})
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.purge_url = f"http://127.0.0.1:{cls.server.server_port}/purge"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Ovens")
+        self.product = Product.objects.create(name="Combi oven", description="-", domain="-", category=self.category)
+        overrides = override_settings(CDN_PURGE_URL=self.purge_url, CDN_PURGE_TOKEN="secret", CDN_PURGE_DELAY=0.05)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def purged(self, requests: int) -> list[tuple[dict, dict]]:
+        return [self.received.get(timeout=5) for _ in range(requests)]
+
+    def test_product_edit_purges_only_its_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 1200
+            self.product.save()
+
+        [(headers, body)] = self.purged(1)
+
+        self.assertEqual(headers["Authorization"], "Bearer secret")
+        self.assertEqual(body, {"tags": [f"category-{self.category.pk}-products", f"product-{self.product.pk}"]})
+        self.assertTrue(self.received.empty())
+
+    def test_moving_a_product_purges_both_category_lists(self):
+        other = Category.objects.create(name="Fridges")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.category = other
+            self.product.save()
+
+        [(_headers, body)] = self.purged(1)
+
+        self.assertEqual(
+            sorted(body["tags"]),
+            sorted(
+                [
+                    f"category-{self.category.pk}-products",
+                    f"category-{other.pk}-products",
+                    f"product-{self.product.pk}",
+                ]
+            ),
+        )
+
+    def test_only_reviews_shown_on_the_site_are_purged(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            review = ProductReview.objects.create(product=self.product, name="Visitor", comment="Great")
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.is_approved = True
+            review.save()
+
+        [(_headers, body)] = self.purged(1)
+        self.assertEqual(body, {"tags": [f"product-{self.product.pk}", "reviews"]})
+
+    @override_settings(CDN_PURGE_BATCH_SIZE=3)
+    def test_changes_in_one_transaction_are_batched(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Category.objects.create(name="Fridges")
+            for name in ("Chiller", "Freezer", "Display fridge"):
+                Product.objects.create(name=name, description="-", domain="-", category=other)
+
+        requests = self.purged(3)
+
+        keys = [key for _headers, body in requests for key in body["tags"]]
+        self.assertTrue(all(len(body["tags"]) <= 3 for _headers, body in requests))
+        self.assertEqual(len(keys), 7)
+        self.assertIn(f"category-{other.pk}-products", keys)
+        self.assertIn("products", keys)
+        self.assertIn("categories", keys)
+
+    @override_settings(CDN_PURGE_FORMAT="fastly")
+    def test_fastly_format(self):
+        pk = self.product.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+
+        [(headers, body)] = self.purged(1)
+
+        self.assertEqual(headers["Fastly-Key"], "secret")
+        self.assertIn(f"product-{pk}", body["surrogate_keys"])
+
+    def test_nothing_is_sent_before_commit_or_without_an_endpoint(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.product.save()
+        self.assertEqual(len(callbacks), 1)
+
+        with override_settings(CDN_PURGE_URL=""), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.product.save()
+        self.assertEqual(callbacks, [])
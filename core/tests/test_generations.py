@@ -0,0 +1,150 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.generations import CATALOG, NEWS, generations, versioned_key
+from core.models import CacheGeneration
+from store.models import Category, Product, ProductReview
+
+POLL_SECONDS = 0.3
+
+SETUP_SCRIPT = """
+import django
+django.setup()
+from django.db import connection
+from core.models import CacheGeneration
+with connection.schema_editor() as editor:
+    editor.create_model(CacheGeneration)
+"""
+
+READER_SCRIPT = """
+import time
+import django
+django.setup()
+from core.generations import versioned_key
+key = versioned_key("home:sections", "catalog")
+print(key, flush=True)
+deadline = time.monotonic() + 10
+while time.monotonic() < deadline:
+    current = versioned_key("home:sections", "catalog")
+    if current != key:
+        print(current, time.time(), flush=True)
+        break
+    time.sleep(0.01)
+"""
+
+WRITER_SCRIPT = """
+import time
+import django
+django.setup()
+from core.generations import bump
+bump("catalog")
+print(time.time(), flush=True)
+"""
+
+
+class GenerationTests(TestCase):
+    def setUp(self):
+        generations.reset()
+        self.addCleanup(generations.reset)
+
+    def test_model_changes_bump_their_namespace(self):
+        before = versioned_key("home:sections", CATALOG, NEWS)
+        Product.objects.create(name="Oven", description="-", domain="-", category=Category.objects.create(name="Ovens"))
+
+        self.assertEqual(CacheGeneration.objects.get(namespace=CATALOG).value, 2)
+        self.assertFalse(CacheGeneration.objects.filter(namespace=NEWS).exists())
+        self.assertNotEqual(versioned_key("home:sections", CATALOG, NEWS), before)
+
+    def test_only_reviews_shown_on_the_site_bump_the_catalog(self):
+        product = Product.objects.create(
+            name="Oven", description="-", domain="-", category=Category.objects.create(name="Ovens")
+        )
+        catalog = CacheGeneration.objects.get(namespace=CATALOG).value
+
+        review = ProductReview.objects.create(product=product, name="Visitor", comment="Great")
+        self.assertEqual(CacheGeneration.objects.get(namespace=CATALOG).value, catalog)
+
+        review.is_approved = True
+        review.save()
+        self.assertEqual(CacheGeneration.objects.get(namespace=CATALOG).value, catalog + 1)
+
+        review.is_approved = False
+        review.save()
+        self.assertEqual(CacheGeneration.objects.get(namespace=CATALOG).value, catalog + 2)
+
+        review.delete()
+        self.assertEqual(CacheGeneration.objects.get(namespace=CATALOG).value, catalog + 2)
+
+    @override_settings(CACHE_GENERATION_POLL_SECONDS=0.05)
+    def test_polling_picks_up_other_processes_and_drops_l1(self):
+        self.assertEqual(generations.get(CATALOG), 0)
+        CacheGeneration.objects.create(namespace=NEWS, value=1)
+        cache.set("home:probe", 1)
+        # Another process bumps the table directly.
+        CacheGeneration.objects.create(namespace=CATALOG, value=7)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(generations.get(CATALOG), 0)
+        time.sleep(0.06)
+        with self.assertNumQueries(1):
+            self.assertEqual(generations.get(CATALOG), 7)
+            self.assertEqual(generations.get(NEWS), 1)
+        self.assertEqual(len(cache._l1), 0)
+
+
+class CrossProcessInvalidationTests(SimpleTestCase):
+    """Separate interpreters sharing one SQLite file stand in for gunicorn workers."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "shopproject.settings",
+            "DEBUG": "true",
+            "DB_ENGINE": "django.db.backends.sqlite3",
+            "DB_NAME": os.path.join(directory, "shared.sqlite3"),
+            "CACHE_GENERATION_POLL_SECONDS": str(POLL_SECONDS),
+        }
+        self._run(SETUP_SCRIPT)
+
+    def _run(self, script: str) -> str:
+        result = subprocess.run(
+            [sys.executable, "-c", textwrap.dedent(script)],
+            cwd=settings.BASE_DIR,
+            env=self.env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            check=True,
+        )
+        return result.stdout
+
+    def test_bump_reaches_another_process_within_the_poll_interval(self):
+        reader = subprocess.Popen(
+            [sys.executable, "-c", READER_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.addCleanup(reader.kill)
+        self.addCleanup(reader.stdout.close)
+        self.assertEqual(reader.stdout.readline().strip(), "home:sections:g0")
+
+        bumped_at = float(self._run(WRITER_SCRIPT))
+        key, seen_at = reader.stdout.readline().split()
+        reader.wait(timeout=10)
+
+        self.assertEqual(key, "home:sections:g1")
+        # Poll interval plus scheduling slack.
+        self.assertLess(float(seen_at) - bumped_at, POLL_SECONDS + 0.5)
@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import ImageDerivative, News
+from core.tests.utils import client_without_visit_tracking
+from core.utils.images import render_variants
+from store.models import Category, Product, ProductImage
+
+
+def _png(width: int, height: int, mode: str = "RGB") -> bytes:
+    buffer = BytesIO()
+    color = (200, 40, 40, 128) if mode == "RGBA" else (200, 40, 40)
+    Image.new(mode, (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class RenderVariantsTests(TestCase):
+    def test_only_widths_below_the_original_are_rendered(self):
+        variants = render_variants(_png(300, 150), [100, 200, 400])
+
+        self.assertEqual(sorted({(v.width, v.height) for v in variants}), [(100, 50), (200, 100)])
+        self.assertEqual({v.format for v in variants}, {"webp", "jpeg"})
+
+    def test_transparent_images_are_flattened_for_jpeg(self):
+        variants = render_variants(_png(300, 300, "RGBA"), [100])
+        jpeg = next(v for v in variants if v.format == "jpeg")
+
+        with Image.open(BytesIO(jpeg.data)) as image:
+            self.assertEqual(image.mode, "RGB")
+
+
+class ImageDerivativePipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WIDTHS="100,200")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = client_without_visit_tracking()
+        self.category = Category.objects.create(name="Ovens")
+        self.product = Product.objects.create(name="Oven", description="-", domain="-", category=self.category)
+
+    def _upload(self, width: int = 400, height: int = 300) -> ProductImage:
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(
+                product=self.product,
+                image=SimpleUploadedFile("oven.png", _png(width, height), content_type="image/png"),
+                is_primary=True,
+            )
+
+    def test_upload_generates_derivatives(self):
+        image = self._upload()
+
+        derivatives = ImageDerivative.objects.filter(source_name=image.image.name)
+        self.assertEqual(
+            sorted(derivatives.values_list("format", "width")),
+            [("jpeg", 100), ("jpeg", 200), ("webp", 100), ("webp", 200)],
+        )
+        for derivative in derivatives:
+            self.assertTrue(default_storage.exists(derivative.file.name))
+            self.assertLess(derivative.bytes, derivative.source_bytes)
+
+    def test_category_page_renders_srcset(self):
+        self._upload()
+
+        response = self.client.get(reverse("catalog_category", kwargs={"category_slug": self.category.slug}))
+
+        self.assertContains(response, '<source type="image/webp" srcset="')
+        self.assertContains(response, "-200w.webp 200w")
+        self.assertContains(response, "-100w.jpg 100w")
+
+    def test_small_originals_keep_a_plain_img(self):
+        image = self._upload(width=80, height=60)
+
+        response = self.client.get(reverse("catalog_category", kwargs={"category_slug": self.category.slug}))
+
+        self.assertFalse(ImageDerivative.objects.exists())
+        self.assertContains(response, f'<img src="{image.image.url}"')
+        self.assertNotContains(response, "<picture><source type=\"image/webp\"")
+
+    def test_deleting_the_image_removes_derivatives(self):
+        image = self._upload()
+        files = list(ImageDerivative.objects.values_list("file", flat=True))
+
+        image.delete()
+
+        self.assertFalse(ImageDerivative.objects.exists())
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_backfill_command_reports_savings(self):
+        with self.settings(IMAGE_DERIVATIVES_ON_UPLOAD=False):
+            self._upload()
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(
+                    title="Cover",
+                    text="-",
+                    cover_image=SimpleUploadedFile("cover.png", _png(500, 250), content_type="image/png"),
+                )
+        self.assertFalse(ImageDerivative.objects.exists())
+
+        out = StringIO()
+        call_command("generate_image_derivatives", "--workers", "1", stdout=out)
+
+        self.assertEqual(ImageDerivative.objects.order_by().values("source_name").distinct().count(), 2)
+        self.assertIn("Generated derivatives for 2 image(s)", out.getvalue())
+        self.assertIn("saved", out.getvalue())
+
+        out = StringIO()
+        call_command("generate_image_derivatives", "--workers", "1", stdout=out)
+        self.assertIn("Generated derivatives for 0 image(s)", out.getvalue())
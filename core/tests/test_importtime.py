@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from core.importtime import BootReport, measure_boot, parse_importtime
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |       bidi.mirror
+import time:       300 |        420 |     bidi
+import time:      9000 |       9420 |   store.invoice
+import time:       500 |       9920 | store.views
+import time:        80 |         80 | json
+"""
+
+
+class ImportTimeParsingTests(SimpleTestCase):
+    def test_parse_and_trace_importers(self):
+        timings = parse_importtime("noise\n" + SAMPLE)
+        report = BootReport(imports=timings, seconds=0.01, max_rss_kb=1024)
+
+        self.assertEqual([t.depth for t in timings], [3, 2, 1, 0, 0])
+        self.assertEqual(timings[2].cumulative_us, 9420)
+        self.assertAlmostEqual(report.import_ms, 10.0)
+        self.assertEqual(report.by_package()[0], ("store", 9.5))
+        self.assertTrue(report.loaded("bidi"))
+        self.assertFalse(report.loaded("reportlab"))
+        self.assertEqual(report.importers("bidi"), ["bidi", "store.invoice", "store.views"])
+
+
+class WorkerBootTests(SimpleTestCase):
+    """Boots the WSGI app in a fresh interpreter, as a gunicorn worker would."""
+
+    def test_heavy_dependencies_load_on_first_use(self):
+        report = measure_boot()
+
+        self.assertTrue(report.loaded("store.views"))
+        for module in settings.LAZY_IMPORT_MODULES:
+            self.assertFalse(report.loaded(module), f"{module} is imported at boot: {report.importers(module)}")
+
+    def test_command_enforces_the_budget(self):
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "1 import check(s) failed"):
+            call_command("import_report", "--budget-ms", "1", "--top", "3", stdout=out)
+
+        self.assertIn("budget is 1 ms", out.getvalue())
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.instrumentation import measure_request, view_stats
+from core.tests.utils import client_without_visit_tracking
+from store.models import Category
+
+
+class MeasureRequestTests(TestCase):
+    def test_counts_queries_and_cache_lookups(self):
+        cache.set("instrumented", "value")
+
+        with measure_request() as metrics:
+            list(Category.objects.all())
+            cache.get("instrumented")
+            cache.get("absent")
+            cache.get("absent", "fallback")
+            cache.get_many(["instrumented", "absent"])
+
+        self.assertEqual(metrics.sql_count, 1)
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 3))
+        self.assertGreater(metrics.total_seconds, 0)
+
+    def test_cache_defaults_still_returned(self):
+        with measure_request():
+            self.assertEqual(cache.get("absent", "fallback"), "fallback")
+            self.assertIsNone(cache.get("absent"))
+
+    def test_nothing_recorded_outside_the_block(self):
+        with measure_request() as metrics:
+            pass
+        list(Category.objects.all())
+        cache.get("absent")
+
+        self.assertEqual((metrics.sql_count, metrics.cache_misses), (0, 0))
+
+
+class ServerTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        view_stats.reset()
+        self.addCleanup(view_stats.reset)
+        self.client = client_without_visit_tracking()
+        self.staff = get_user_model().objects.create_user("staff", password="pass", is_staff=True)
+        Category.objects.create(name="Ovens")
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_staff_get_server_timing_header(self):
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("catalog"))
+
+        header = response["Server-Timing"]
+        self.assertRegex(header, r"total;dur=[\d.]+")
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(header, r"tpl;dur=[\d.]+")
+        self.assertIn("cache;desc=", header)
+        # Staff requests outside the sample are not aggregated.
+        self.assertEqual(view_stats.report(), [])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_sampled_requests_are_aggregated_per_view(self):
+        self.client.get(reverse("catalog"))
+        response = self.client.get(reverse("catalog"))
+
+        self.assertFalse(response.has_header("Server-Timing"))
+        rows = {row["view"]: row for row in view_stats.report()}
+        self.assertEqual(rows["catalog"]["requests"], 2)
+        self.assertGreater(rows["catalog"]["avg_queries"], 0)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_anonymous_requests_are_not_measured(self):
+        response = self.client.get(reverse("catalog"))
+
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertEqual(view_stats.report(), [])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_stats_report_is_staff_only(self):
+        self.client.get(reverse("catalog"))
+
+        anonymous = self.client.get(reverse("about"), {"_perf_stats": "1"})
+        self.assertTrue(anonymous["Content-Type"].startswith("text/html"))
+
+        self.client.force_login(self.staff)
+        payload = self.client.get(reverse("about"), {"_perf_stats": "1"}).json()
+        self.assertIn("catalog", [row["view"] for row in payload["views"]])
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        self.client.force_login(self.staff)
+
+        self.assertFalse(self.client.get(reverse("catalog")).has_header("Server-Timing"))
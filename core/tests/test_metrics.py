@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import metrics_store
+from core.models import ContactMessage, ContactNotification
+from core.tests.utils import client_without_visit_tracking
+
+DEAD_PID = 4194305  # above Linux's pid_max, so never a live process
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        self.metrics_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.metrics_dir, ignore_errors=True)
+        overrides = override_settings(
+            METRICS_ENABLED=True,
+            METRICS_DIR=self.metrics_dir,
+            METRICS_FLUSH_SECONDS=3600,
+            METRICS_TOKEN="scrape-token",
+            INSTRUMENTATION_SAMPLE_RATE=1,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        metrics_store.reset()
+        self.addCleanup(metrics_store.reset)
+        self.client = client_without_visit_tracking()
+
+    def _scrape(self) -> str:
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_requires_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+        )
+
+        staff = get_user_model().objects.create_user("staff", password="pass", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    def test_request_counts_and_histograms(self):
+        self.client.get(reverse("catalog"))
+        self.client.get(reverse("catalog"))
+        self.client.get(reverse("catalog_category", kwargs={"category_slug": "missing"}))
+
+        body = self._scrape()
+
+        self.assertIn('styra_http_requests_total{view="catalog",status="200"} 2', body)
+        self.assertIn('styra_http_requests_total{view="catalog_category",status="404"} 1', body)
+        self.assertIn('styra_http_request_duration_seconds_bucket{view="catalog",le="+Inf"} 2', body)
+        self.assertIn('styra_http_request_duration_seconds_count{view="catalog"} 2', body)
+        self.assertIn('styra_http_request_db_queries_count{view="catalog"} 2', body)
+        self.assertIn(f'styra_process_resident_memory_bytes{{pid="{os.getpid()}"}}', body)
+
+    def test_queue_depths(self):
+        message = ContactMessage.objects.create(name="A", phone="0912", message="hi")
+        ContactNotification.objects.filter(message=message).delete()
+        ContactNotification.objects.create(message=message)
+
+        body = self._scrape()
+
+        self.assertIn('styra_contact_notifications{status="pending"} 1', body)
+        self.assertIn("styra_download_counts_pending 0", body)
+
+    def test_other_workers_are_summed_and_exited_ones_archived(self):
+        other = {
+            "requests": {"catalog": {"200": 5}},
+            "latency": {"catalog": {"buckets": [5] + [0] * 11, "sum": 0.01, "count": 5}},
+            "queries": {},
+            "pid": os.getppid(),
+            "memory_bytes": 1024,
+            "download_counter_pending": 3,
+        }
+        (self.metrics_dir / f"{os.getppid()}.json").write_text(json.dumps(other))
+        (self.metrics_dir / f"{DEAD_PID}.json").write_text(json.dumps({**other, "pid": DEAD_PID}))
+        self.client.get(reverse("catalog"))
+
+        body = self._scrape()
+
+        self.assertIn('styra_http_requests_total{view="catalog",status="200"} 11', body)
+        self.assertIn('styra_http_request_duration_seconds_bucket{view="catalog",le="0.005"}', body)
+        self.assertIn("styra_download_counts_pending 3", body)
+        self.assertIn(f'styra_process_resident_memory_bytes{{pid="{os.getppid()}"}} 1024', body)
+        self.assertNotIn(f'pid="{DEAD_PID}"', body)
+        self.assertFalse((self.metrics_dir / f"{DEAD_PID}.json").exists())
+        self.assertTrue((self.metrics_dir / "archive.json").exists())
+
+        # The archived counts are still included on the next scrape.
+        self.assertIn('styra_http_requests_total{view="catalog",status="200"} 11', self._scrape())
+
+    def test_flush_writes_a_snapshot_for_this_process(self):
+        self.client.get(reverse("catalog"))
+
+        metrics_store.flush()
+
+        snapshot = json.loads((self.metrics_dir / f"{os.getpid()}.json").read_text())
+        self.assertEqual(snapshot["requests"]["catalog"], {"200": 1})
@@ -0,0 +1,176 @@
+import gzip
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.dbguard import database_breaker
+from core.generations import CATALOG
+from core.pagecache import cache_anonymous_page, last_good_key
+from store.models import Category, Product
+
+from .utils import client_without_visit_tracking
+
+# Counts to fifty million in SQLite: seconds of work unless the statement timeout interrupts it.
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n LIMIT 50000000) SELECT count(*) FROM n"
+
+
+@override_settings(PAGE_CACHE_SECONDS=300)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = client_without_visit_tracking()
+        self.category = Category.objects.create(name="Ovens")
+        Product.objects.create(name="Combi oven", description="-", domain="-", category=self.category)
+
+    def test_repeat_anonymous_hits_skip_the_view(self):
+        first = self.client.get(reverse("home"))
+        self.assertNotIn("X-Page-Cache", first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse("home"))
+
+        self.assertEqual(second["X-Page-Cache"], "hit")
+        self.assertEqual(second.content, first.content)
+        self.assertIn("Accept-Encoding", second["Vary"])
+        # Shared copies do not vary on Cookie (core.edgecache.restrict_to_visitor).
+        self.assertNotIn("Cookie", second["Vary"])
+
+    def test_compressed_variants(self):
+        plain = self.client.get(reverse("catalog")).content
+
+        response = self.client.get(reverse("catalog"), HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(response["ETag"].startswith("W/"))
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(
+                reverse("catalog"), HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_catalog_change_is_served_on_the_next_request(self):
+        self.client.get(reverse("home"))
+        Product.objects.create(name="Blast chiller", description="-", domain="-", category=self.category)
+
+        response = self.client.get(reverse("home"))
+
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertContains(response, "Blast chiller")
+
+    def test_personal_requests_bypass_the_cache(self):
+        url = reverse("catalog_category", args=[self.category.slug])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "hit")
+
+        self.assertNotIn("X-Page-Cache", self.client.get(url, {"q": "oven"}))
+        self.client.cookies["messages"] = "pending"
+        self.assertNotIn("X-Page-Cache", self.client.get(url))
+        del self.client.cookies["messages"]
+        self.client.force_login(get_user_model().objects.create_superuser("staff", "staff@example.com", "pass"))
+        self.assertNotIn("X-Page-Cache", self.client.get(url))
+
+    def test_pages_with_a_csrf_token_are_not_stored(self):
+        @cache_anonymous_page(CATALOG)
+        def form_page(request):
+            return HttpResponse(f'<input name="csrfmiddlewaretoken" value="{get_token(request)}">')
+
+        factory = RequestFactory()
+        for _ in range(2):
+            response = form_page(factory.get("/form/"))
+            self.assertNotIn("X-Page-Cache", response)
+
+
+@override_settings(PAGE_CACHE_SECONDS=0, PAGE_STALE_IF_ERROR_SECONDS=3600, PAGE_DB_TIMEOUT=0.05, DB_BREAKER_SECONDS=30)
+class StaleOnErrorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        database_breaker.reset()
+        self.addCleanup(database_breaker.reset)
+        self.factory = RequestFactory()
+        self.state = {"mode": "ok", "version": 1, "calls": 0}
+
+        @cache_anonymous_page(CATALOG)
+        def page(request):
+            self.state["calls"] += 1
+            if self.state["mode"] == "slow":
+                with connection.cursor() as cursor:
+                    cursor.execute(SLOW_QUERY)
+            elif self.state["mode"] == "down":
+                raise OperationalError("MySQL server has gone away")
+            return HttpResponse(f"<p>version {self.state['version']}</p>")
+
+        self.page = page
+
+    def get(self, path):
+        return self.page(self.factory.get(path))
+
+    def test_slow_database_serves_the_last_good_copy(self):
+        self.assertContains(self.get("/slow/"), "version 1")
+        self.state.update(mode="slow", version=2)
+
+        started = time.monotonic()
+        with self.assertLogs("core", "WARNING"):
+            response = self.get("/slow/")
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertContains(response, "version 1")
+        self.assertEqual(response["X-Page-Cache"], "stale")
+        self.assertEqual(response["Warning"], '110 - "Response is Stale"')
+        self.assertIn("Age", response)
+        self.assertTrue(database_breaker.is_open())
+
+    def test_breaker_serves_stale_and_revalidates_in_background(self):
+        self.get("/down/")
+        self.state["mode"] = "down"
+        with self.assertLogs("core", "WARNING"):
+            self.assertEqual(self.get("/down/")["X-Page-Cache"], "stale")
+        self.assertEqual(self.client.get(reverse("health_check")).json()["breaker"], "open")
+
+        self.state.update(mode="ok", version=2)
+        response = self.get("/down/")
+        self.assertContains(response, "version 1")
+        deadline = time.monotonic() + 5
+        while database_breaker.is_open() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertFalse(database_breaker.is_open())
+        self.assertContains(self.get("/down/"), "version 2")
+        self.assertNotIn("X-Page-Cache", self.get("/down/"))
+
+    def test_without_a_copy_the_error_propagates(self):
+        self.state["mode"] = "down"
+        with self.assertRaises(OperationalError), self.assertLogs("core.dbguard", "WARNING"):
+            self.get("/never-rendered/")
+
+    def test_copy_of_a_page_with_a_form_has_a_blank_csrf_token(self):
+        @cache_anonymous_page(CATALOG)
+        def form_page(request):
+            return HttpResponse(f'<input name="csrfmiddlewaretoken" value="{get_token(request)}">')
+
+        request = self.factory.get("/form/")
+        response = form_page(request)
+
+        self.assertNotContains(response, 'value=""')
+        copy = cache.get(last_good_key(request))
+        self.assertIn(b'name="csrfmiddlewaretoken" value=""', copy.content)
+
+    def test_product_page_is_not_tied_to_the_visitor(self):
+        category = Category.objects.create(name="Ovens")
+        product = Product.objects.create(name="Combi oven", description="-", domain="-", category=category)
+        url = reverse("catalog_product", args=[category.slug, product.slug])
+
+        response = self.client.get(url)
+
+        # The review form fetches its token from /csrf/ on submit.
+        self.assertContains(response, 'name="csrfmiddlewaretoken" value=""')
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertIsNotNone(cache.get(last_good_key(response.wsgi_request)))
@@ -0,0 +1,69 @@
+import gzip
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import PaymentSettings
+from core.prerender import prerender_all
+
+from .utils import client_without_visit_tracking
+
+
+class PrerenderedPagesTests(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        overrides = override_settings(PRERENDER_ENABLED=True, PRERENDER_ROOT=self.root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _body(self, response) -> bytes:
+        return b"".join(response.streaming_content)
+
+    def test_prerendered_page_is_served_without_orm_or_templates(self):
+        live = self.client.get(reverse("faq"))
+        manifest = prerender_all()
+
+        self.assertIn("faq", manifest)
+        self.assertIn("package_detail-vip", manifest)
+        self.assertTrue((self.root / "faq.html.br").exists())
+
+        with self.assertTemplateNotUsed("faq.html"), self.assertNumQueries(0):
+            response = client_without_visit_tracking().get(reverse("faq"), HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(self._body(response)), live.content)
+
+    def test_strong_etag_returns_not_modified(self):
+        prerender_all()
+        first = self.client.get(reverse("about"))
+        etag = first["ETag"]
+
+        second = self.client.get(reverse("about"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertFalse(etag.startswith("W/"))
+
+    def test_payment_settings_save_regenerates_pages(self):
+        prerender_all()
+        old_etag = self.client.get(reverse("terms"))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            settings_obj = PaymentSettings.get_solo()
+            settings_obj.company_phone = "02188888888"
+            settings_obj.save()
+
+        response = self.client.get(reverse("terms"))
+        self.assertNotEqual(response["ETag"], old_etag)
+        self.assertIn("02188888888".encode(), self._body(response))
+
+    def test_missing_prerender_falls_back_to_live_render(self):
+        response = self.client.get(reverse("privacy"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "privacy.html")
@@ -0,0 +1,79 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import make_token
+from core.tests.utils import client_without_visit_tracking
+from store.models import Category
+
+
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        self.profile_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        overrides = override_settings(PROFILER_DIR=self.profile_dir, PROFILER_SAMPLE_INTERVAL_MS=1)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = client_without_visit_tracking()
+        self.staff = get_user_model().objects.create_user("staff", password="pass", is_staff=True)
+        Category.objects.create(name="Ovens")
+
+    def test_staff_profile_is_stored(self):
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("catalog"), {"_profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        profile_id = response["X-Profile-Id"]
+        self.assertTrue((self.profile_dir / f"{profile_id}.prof").exists())
+        self.assertTrue((self.profile_dir / f"{profile_id}.collapsed").exists())
+        summary = json.loads((self.profile_dir / f"{profile_id}.json").read_text())
+        self.assertGreater(summary["sql_queries"], 0)
+        self.assertIn('FROM "store_category"', " ".join(row["sql"] for row in summary["sql"]))
+
+    def test_report_mode_returns_text(self):
+        self.client.force_login(self.staff)
+
+        response = self.client.get(reverse("catalog"), {"_profile": "report"})
+
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn("Slowest SQL", body)
+        self.assertIn("cumulative", body)
+
+    def test_anonymous_and_bad_tokens_are_ignored(self):
+        response = self.client.get(reverse("catalog"), {"_profile": "report"})
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+        self.assertFalse(response.has_header("X-Profile-Id"))
+
+        response = self.client.get(reverse("catalog"), HTTP_X_PROFILE_TOKEN="profile:forged:sig")
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(list(self.profile_dir.iterdir()), [])
+
+    def test_signed_token_works_without_login(self):
+        response = self.client.get(reverse("catalog"), HTTP_X_PROFILE_TOKEN=make_token())
+
+        self.assertTrue(response.has_header("X-Profile-Id"))
+
+    @override_settings(PROFILER_MAX_PROFILES=2)
+    def test_only_the_newest_profiles_are_kept(self):
+        self.client.force_login(self.staff)
+        ids = [self.client.get(reverse("about"), {"_profile": "1"})["X-Profile-Id"] for _ in range(4)]
+
+        kept = sorted(path.stem for path in self.profile_dir.glob("*.json"))
+        self.assertEqual(kept, sorted(ids[-2:]))
+        self.assertEqual(len(list(self.profile_dir.glob("*.prof"))), 2)
+
+    def test_profile_token_command(self):
+        out = StringIO()
+        call_command("profile_token", stdout=out)
+
+        self.assertIn("X-Profile-Token: ", out.getvalue())
@@ -0,0 +1,141 @@
+import json
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from core.querycheck import NPlusOneError, fingerprint, record_queries
+from core.synthetic import DatasetSize, build_dataset
+from core.tests.utils import QueryBudgetMixin, client_without_visit_tracking
+from store.models import Product
+
+
+def _category_names(request):
+    return HttpResponse(", ".join(product.category.name for product in Product.objects.all()))
+
+
+urlpatterns = [path("n-plus-one/", _category_names, name="n_plus_one")]
+
+SMALL_CATALOG = DatasetSize(categories=1, products=6, features=0, images=0, reviews=0, news=0, visits=0)
+
+# Queries per request for anonymous visitors (staff for the invoice pages), measured
+# against a catalog big enough that any per-row query would blow the budget.
+QUERY_BUDGETS = {
+    "home": ("home", {}, {}),
+    "catalog": ("catalog", {}, {}),
+    "catalog_search": ("catalog", {}, {"q": "Rational"}),
+    "catalog_category": ("catalog_category", {"category_slug": "bench-category-0"}, {}),
+    "catalog_product": ("catalog_product", {"category_slug": "bench-category-0", "product_slug": "bench-0-0"}, {}),
+    "catalog_suggest": ("catalog_suggest", {}, {"q": "Rational"}),
+    "sitemap_xml": ("sitemap_xml", {}, {}),
+    "projects_list": ("projects_list", {}, {}),
+    "project_detail": ("project_detail", {"slug": "bench-news-0"}, {}),
+    "downloads": ("downloads", {}, {}),
+}
+BUDGETS = {
+    "home": 9,
+    "catalog": 7,
+    "catalog_search": 7,
+    "catalog_category": 6,
+    "catalog_product": 12,
+    "catalog_suggest": 1,
+    "sitemap_xml": 3,
+    "projects_list": 3,
+    "project_detail": 4,
+    "downloads": 3,
+    "manual_invoice": 14,
+    "manual_invoice_pdf": 3,
+}
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_root)
+        cls._media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        build_dataset(DatasetSize(categories=6, products=25, features=6, images=2, reviews=3, news=12, visits=50))
+        cls.staff = get_user_model().objects.create_user("staff", password="pass", is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = client_without_visit_tracking()
+
+    def test_public_views_stay_within_budget(self):
+        for label, (name, kwargs, params) in QUERY_BUDGETS.items():
+            with self.subTest(label):
+                with self.assertQueryBudget(BUDGETS[label], label):
+                    response = self.client.get(reverse(name, kwargs=kwargs), params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_staff_invoice_views_stay_within_budget(self):
+        self.client.force_login(self.staff)
+
+        with self.assertQueryBudget(BUDGETS["manual_invoice"], "manual_invoice"):
+            response = self.client.get(reverse("manual_invoice"))
+        self.assertEqual(response.status_code, 200)
+
+        payload = {"items": [{"name": f"item {i}", "qty": 1, "price": 1000} for i in range(20)]}
+        with self.assertQueryBudget(BUDGETS["manual_invoice_pdf"], "manual_invoice_pdf"):
+            response = self.client.post(
+                reverse("manual_invoice_pdf"), json.dumps(payload), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class NPlusOneDetectorTests(QueryBudgetMixin, TestCase):
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 5 AND name = 'x' AND pk IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id = 17 AND name = 'y'  AND pk IN (%s)"),
+        )
+
+    def test_reports_repeated_statements_with_their_caller(self):
+        build_dataset(SMALL_CATALOG)
+
+        with record_queries() as log:
+            for product in Product.objects.all():
+                product.category.name
+
+        (repeated,) = log.repeated(threshold=5)
+        self.assertEqual(repeated.count, 6)
+        self.assertIn("core/tests/test_query_budgets.py", repeated.locations[0])
+        self.assertIn('FROM "store_category"', repeated.fingerprint)
+
+    @override_settings(NPLUSONE_MODE="raise", NPLUSONE_THRESHOLD=3)
+    def test_middleware_raise_mode(self):
+        build_dataset(SMALL_CATALOG)
+        client = client_without_visit_tracking()
+
+        # The category page is N+1 free, so it passes even in raise mode.
+        response = client.get(reverse("catalog_category", kwargs={"category_slug": "bench-category-0"}))
+        self.assertEqual(response.status_code, 200)
+
+        # assertLogs keeps the 500 that django.request logs out of logs/errors.log.
+        with (
+            self.settings(ROOT_URLCONF=__name__),
+            self.assertLogs("django.request", "ERROR"),
+            self.assertRaisesMessage(NPlusOneError, "6x at core/tests/test_query_budgets.py"),
+        ):
+            client.get(reverse("n_plus_one"))
+
+    def test_budget_assertion_fails_on_repeated_statements(self):
+        build_dataset(SMALL_CATALOG)
+
+        with self.assertRaises(NPlusOneError):
+            with self.assertQueryBudget(100, "loop"):
+                [product.category.name for product in Product.objects.all()]
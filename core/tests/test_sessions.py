@@ -0,0 +1,97 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.sessions.base import BoundedTTLCache, clear_expired_in_batches
+
+
+class _RecordingCache:
+    def __init__(self):
+        self.timeouts = []
+
+    def set(self, key, value, timeout=None, version=None):
+        self.timeouts.append(timeout)
+
+    def get(self, key, default=None, version=None):
+        return default
+
+
+class BoundedTTLCacheTests(SimpleTestCase):
+    def test_timeouts_are_capped(self):
+        inner = _RecordingCache()
+        cache = BoundedTTLCache(inner, 15)
+
+        cache.set("a", 1, 1209600)
+        cache.set("b", 1, 5)
+        cache.set("c", 1, None)
+
+        self.assertEqual(inner.timeouts, [15, 5, 15])
+        self.assertIsNone(cache.get("a"))
+
+
+class SessionEngineTests(TestCase):
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.staff = get_user_model().objects.create_superuser("staff", "staff@example.com", "pass")
+
+    def _session_queries(self, url) -> int:
+        self.client.force_login(self.staff)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum('"django_session"' in query["sql"] for query in ctx.captured_queries)
+
+    @override_settings(SESSION_ENGINE="core.sessions.cached_db")
+    def test_cached_db_serves_staff_pages_without_session_queries(self):
+        self.assertEqual(self._session_queries(reverse("admin:index")), 0)
+
+    @override_settings(SESSION_ENGINE="core.sessions.db")
+    def test_db_engine_reads_the_session_table(self):
+        self.assertEqual(self._session_queries(reverse("admin:index")), 1)
+
+    @override_settings(SESSION_ENGINE="core.sessions.cached_db")
+    def test_logout_removes_the_cached_copy(self):
+        self.client.force_login(self.staff)
+        session_key = self.client.session.session_key
+
+        self.client.post(reverse("admin:logout"))
+
+        store = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        self.assertFalse(Session.objects.filter(session_key=session_key).exists())
+        self.assertNotIn("_auth_user_id", store.load())
+
+
+class ExpiredSessionCleanupTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"expired{index:03d}", session_data="", expire_date=now - timedelta(days=1)) for index in range(25)]
+            + [Session(session_key=f"active{index:03d}", session_data="", expire_date=now + timedelta(days=1)) for index in range(5)]
+        )
+
+    def test_deletes_in_bounded_batches(self):
+        self.assertEqual(clear_expired_in_batches(Session, batch_size=10, pause=0, max_batches=1), 10)
+        self.assertEqual(clear_expired_in_batches(Session, batch_size=10, pause=0), 15)
+        self.assertEqual(Session.objects.count(), 5)
+
+    def test_commands(self):
+        out = StringIO()
+        call_command("clear_expired_sessions", "--batch-size", "7", "--pause", "0", stdout=out)
+        self.assertIn("Deleted expired sessions: 25", out.getvalue())
+
+        Session.objects.create(session_key="expired-again", session_data="", expire_date=timezone.now() - timedelta(days=1))
+        with self.settings(SESSION_CLEANUP_PAUSE=0):
+            call_command("clearsessions")
+        self.assertEqual(Session.objects.count(), 5)
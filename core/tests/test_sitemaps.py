@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import News
+from store.models import Category, Product
+
+from .utils import client_without_visit_tracking
+
+
+@override_settings(SITE_BASE_URL="https://example.com")
+class SitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = client_without_visit_tracking()
+        self.categories = [Category.objects.create(name=f"Category {i}") for i in range(3)]
+        for category in self.categories:
+            for j in range(4):
+                Product.objects.create(name=f"{category.name} item {j}", description="-", domain="-", category=category)
+        News.objects.create(title="Project one", text="-")
+
+    def test_generation_uses_constant_queries_regardless_of_category_count(self):
+        # version lookups hit the cache; news + categories + products = 3 queries
+        with self.assertNumQueries(3):
+            index = self.client.get(reverse("sitemap_xml"))
+
+        self.assertEqual(index.status_code, 200)
+        self.assertIn(b"<sitemapindex", index.content)
+        self.assertIn(b"https://example.com/sitemap-1.xml", index.content)
+
+    def test_shard_contains_products_with_lastmod_and_is_cached(self):
+        self.client.get(reverse("sitemap_xml"))
+
+        with self.assertNumQueries(0):
+            shard = self.client.get(reverse("sitemap_section", args=[1]))
+
+        product = Product.objects.select_related("category").first()
+        self.assertIn(
+            f"https://example.com/catalog/{product.category.slug}/{product.slug}/".encode(),
+            shard.content,
+        )
+        self.assertIn(f"<lastmod>{product.updated_at.date().isoformat()}</lastmod>".encode(), shard.content)
+        self.assertIn(b"https://example.com/projects/", shard.content)
+
+    @override_settings(SITEMAP_SHARD_SIZE=10)
+    def test_urls_are_split_into_shards(self):
+        index = self.client.get(reverse("sitemap_xml"))
+
+        # 14 static + 1 news + 3 categories + 12 products = 30 URLs -> 3 shards of 10
+        self.assertIn(b"sitemap-3.xml", index.content)
+        self.assertNotIn(b"sitemap-4.xml", index.content)
+        self.assertEqual(self.client.get(reverse("sitemap_section", args=[3])).content.count(b"<url>"), 10)
+        self.assertEqual(self.client.get(reverse("sitemap_section", args=[4])).status_code, 404)
+
+    def test_model_change_invalidates_cached_shards(self):
+        self.client.get(reverse("sitemap_xml"))
+        category = self.categories[0]
+        product = Product.objects.create(name="Brand new", description="-", domain="-", category=category)
+
+        shard = self.client.get(reverse("sitemap_section", args=[1]))
+
+        self.assertIn(f"/catalog/{category.slug}/{product.slug}/".encode(), shard.content)
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import News
+from core.utils import slugs
+from core.utils.slugs import allocate_slugs, slug_base
+from store.models import Category, Product
+
+
+class SlugAllocatorTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="فر پیتزا")
+
+    def _create_product(self) -> Product:
+        return Product.objects.create(name="فر پیتزا", description="-", domain="-", category=self.category)
+
+    def _queries_for_next_product(self) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            self._create_product()
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_collisions(self):
+        first = self._queries_for_next_product()
+        for _ in range(30):
+            self._create_product()
+
+        self.assertEqual(self._queries_for_next_product(), first)
+        self.assertEqual(
+            Product.objects.filter(category=self.category).values("slug").distinct().count(), 32
+        )
+        self.assertTrue(Product.objects.filter(slug="فر-پیتزا-31").exists())
+
+    def test_slugs_are_scoped_to_the_category(self):
+        other = Category.objects.create(name="دیسپلی")
+        product = self._create_product()
+        same_name = Product.objects.create(name="فر پیتزا", description="-", domain="-", category=other)
+
+        self.assertEqual(product.slug, same_name.slug)
+
+    def test_prefix_matches_do_not_count_as_collisions(self):
+        News.objects.create(title="oven-care", text="-")
+
+        self.assertEqual(News.objects.create(title="oven", text="-").slug, "oven")
+
+    def test_bulk_allocation_is_unique_within_the_batch(self):
+        self._create_product()
+
+        with self.assertNumQueries(1):
+            allocated = allocate_slugs(
+                Product.objects.filter(category=self.category),
+                ["فر پیتزا", "فر پیتزا", "", "دیسپلی"],
+                fallback="product",
+            )
+
+        self.assertEqual(allocated, ["فر-پیتزا-1", "فر-پیتزا-2", "product", "دیسپلی"])
+
+    def test_long_names_leave_room_for_a_suffix(self):
+        max_length = Product._meta.get_field("slug").max_length
+        base = slug_base("x" * 500, "product", max_length)
+
+        self.assertLessEqual(len(f"{base}-9999999"), max_length)
+
+    def test_retries_when_a_concurrent_save_takes_the_slug(self):
+        Category.objects.create(name="Ovens")
+        real_taken_slugs = slugs.taken_slugs
+        calls = []
+
+        def racing_lookup(queryset, bases):
+            calls.append(bases)
+            # The first lookup misses the committed "ovens" row, as a racing request would.
+            return set() if len(calls) == 1 else real_taken_slugs(queryset, bases)
+
+        with mock.patch.object(slugs, "taken_slugs", racing_lookup):
+            category = Category.objects.create(name="Ovens")
+
+        self.assertEqual(category.slug, "ovens-1")
+        self.assertEqual(len(calls), 2)
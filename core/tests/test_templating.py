@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.templating import warm_templates
+
+CACHED_TEMPLATES = [
+    {
+        **settings.TEMPLATES[0],
+        "OPTIONS": {
+            **settings.TEMPLATES[0]["OPTIONS"],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                )
+            ],
+        },
+    }
+]
+
+
+class TemplateWarmupTests(TestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_warmup_compiles_project_templates_into_cached_loader(self):
+        result = warm_templates()
+
+        project_dir = settings.BASE_DIR / "templates"
+        project_failures = [name for name in result.failed if (project_dir / name).is_file()]
+        self.assertEqual(project_failures, [])
+
+        cached_loader = engines["django"].engine.template_loaders[0]
+        cached_names = {template.origin.template_name for template in cached_loader.get_template_cache.values()
+                        if hasattr(template, "origin")}
+        self.assertIn("store/manual_invoice.html", cached_names)
+        self.assertIn("home.html", cached_names)
+        self.assertIn("base.html", cached_names)
+
+
+class TemplateProfileTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user("staff", password="pass", is_staff=True)
+
+    def test_staff_gets_template_timing_report(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("about"), {"_template_profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        names = [row["template"] for row in payload["templates"]]
+        self.assertIn("about.html", names)
+        self.assertIn("base.html", names)
+        self.assertGreaterEqual(payload["total_ms"], payload["template_ms"])
+
+    def test_anonymous_users_get_the_normal_page(self):
+        response = self.client.get(reverse("about"), {"_template_profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
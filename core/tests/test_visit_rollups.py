@@ -0,0 +1,135 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.hll import HyperLogLog
+from core.models import DailyVisitStat, SiteVisit, VisitRollup
+from core.visit_analytics import period_start, record_hit, unique_visitors
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_estimate_is_within_a_few_percent(self):
+        for size in (10, 1000, 50000):
+            sketch = HyperLogLog()
+            for index in range(size):
+                sketch.add(f"visitor-{index}")
+            with self.subTest(size=size):
+                self.assertLess(abs(sketch.count() - size) / size, 0.05)
+
+    def test_merge_and_serialization(self):
+        monday, tuesday = HyperLogLog(), HyperLogLog()
+        for index in range(3000):
+            monday.add(f"v{index}")
+        for index in range(2000, 6000):
+            tuesday.add(f"v{index}")
+
+        merged = HyperLogLog.from_bytes(monday.to_bytes())
+        self.assertTrue(merged.update(tuesday))
+        self.assertFalse(merged.update(tuesday))
+
+        self.assertLess(abs(merged.count() - 6000) / 6000, 0.05)
+        self.assertEqual(len(merged.to_bytes()), 4097)
+        self.assertEqual(HyperLogLog.from_bytes(b"").count(), 0)
+        self.assertFalse(merged.add("v1"))
+
+
+class VisitRollupTests(TestCase):
+    def _seed_raw_visits(self, day: date, visitors: range):
+        SiteVisit.objects.bulk_create(SiteVisit(session_key=f"v{index}", visited_on=day) for index in visitors)
+        DailyVisitStat.objects.create(date=day, total_hits=len(visitors) * 2, unique_sessions=len(visitors))
+
+    def test_period_start(self):
+        friday = date(2026, 10, 16)
+        self.assertEqual(period_start(VisitRollup.PERIOD_WEEK, friday), date(2026, 10, 10))
+        self.assertEqual(period_start(VisitRollup.PERIOD_WEEK, date(2026, 10, 17)), date(2026, 10, 17))
+        self.assertEqual(period_start(VisitRollup.PERIOD_MONTH, friday), date(2026, 10, 1))
+
+    def test_rollup_backfills_prunes_and_merges(self):
+        today = timezone.localdate()
+        old, recent = today - timedelta(days=120), today - timedelta(days=1)
+        self._seed_raw_visits(old, range(0, 400))
+        self._seed_raw_visits(recent, range(300, 700))
+
+        out = StringIO()
+        call_command("rollup_visits", "--all", "--retention-days", "90", stdout=out)
+
+        self.assertIn("pruned visits: 400", out.getvalue())
+        self.assertFalse(SiteVisit.objects.filter(visited_on=old).exists())
+        self.assertEqual(SiteVisit.objects.filter(visited_on=recent).count(), 400)
+        # Pruned days keep their unique count in the sketch.
+        self.assertAlmostEqual(unique_visitors(old, old), 400, delta=20)
+        self.assertAlmostEqual(unique_visitors(old, today), 700, delta=35)
+
+        month = VisitRollup.objects.get(period=VisitRollup.PERIOD_MONTH, start=period_start("month", old))
+        self.assertEqual(month.total_hits, 800)
+        self.assertAlmostEqual(month.unique_visitors, 400, delta=20)
+        self.assertTrue(VisitRollup.objects.filter(period=VisitRollup.PERIOD_WEEK).exists())
+
+    @override_settings(VISIT_UNIQUE_MODE="sketch")
+    def test_sketch_mode_writes_no_visit_rows(self):
+        for index in range(30):
+            client = Client(HTTP_USER_AGENT="Mozilla/5.0", REMOTE_ADDR=f"10.0.0.{index}")
+            client.get(reverse("home"))
+            client.get(reverse("faq"))
+
+        stat = DailyVisitStat.objects.get()
+        self.assertEqual(SiteVisit.objects.count(), 0)
+        self.assertEqual(stat.total_hits, 60)
+        self.assertEqual(stat.unique_sessions, 30)
+
+    def test_exact_mode_also_fills_the_sketch(self):
+        for index in range(5):
+            Client(HTTP_USER_AGENT="Mozilla/5.0", REMOTE_ADDR=f"10.0.1.{index}").get(reverse("home"))
+
+        today = timezone.localdate()
+        self.assertEqual(DailyVisitStat.objects.get().unique_sessions, 5)
+        self.assertEqual(unique_visitors(today, today), 5)
+
+    def test_returning_visitor_hit_is_one_unlocked_update(self):
+        today = timezone.localdate()
+        record_hit(today, "v1", new_visitor=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            record_hit(today, "v1", new_visitor=False)
+
+        [query] = ctx.captured_queries
+        self.assertTrue(query["sql"].startswith("UPDATE"))
+        stat = DailyVisitStat.objects.get()
+        self.assertEqual((stat.total_hits, stat.unique_sessions), (2, 1))
+
+        record_hit(today - timedelta(days=1), "v1", new_visitor=False)
+        self.assertEqual(DailyVisitStat.objects.get(date=today - timedelta(days=1)).total_hits, 1)
+
+    def test_visitor_already_in_the_sketch_takes_no_lock(self):
+        today = timezone.localdate()
+        record_hit(today, "v1", new_visitor=None)
+
+        with CaptureQueriesContext(connection) as ctx:
+            record_hit(today, "v1", new_visitor=None)
+
+        # An unlocked read of the sketch and one UPDATE: no transaction, no SELECT ... FOR UPDATE.
+        self.assertEqual([q["sql"].split()[0] for q in ctx.captured_queries], ["SELECT", "UPDATE"])
+        record_hit(today, "v2", new_visitor=None)
+        stat = DailyVisitStat.objects.get()
+        self.assertEqual((stat.total_hits, stat.unique_sessions), (3, 2))
+
+    def test_admin_chart(self):
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(admin)
+        Client(HTTP_USER_AGENT="Mozilla/5.0").get(reverse("home"))
+
+        response = self.client.get(reverse("admin:core_dailyvisitstat_chart"), {"period": "week"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["rows"][-1]["unique_visitors"], 1)
+        self.assertContains(response, "<rect")
+
+        changelist = self.client.get(reverse("admin:core_dailyvisitstat_changelist"))
+        self.assertContains(changelist, reverse("admin:core_dailyvisitstat_chart"))
@@ -1,10 +1,20 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.test import Client, TestCase
 from django.urls import reverse
 
-from core.models import DailyVisitStat
+from core.bots import is_bot
+from core.models import DailyVisitStat, SiteVisit
+from core.visitors import cookie_name
+
+# Requests without a User-Agent are counted as bots, so the visitors here announce a browser.
+BROWSER_UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/126.0 Safari/537.36"
 
 
 class VisitStatsTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_USER_AGENT=BROWSER_UA)
+
     def test_daily_hits_increase_per_request(self):
         home_url = reverse("home")
         self.client.get(home_url)
@@ -14,3 +24,85 @@ class VisitStatsTests(TestCase):
         self.assertIsNotNone(stat)
         self.assertEqual(stat.total_hits, 2)
         self.assertEqual(stat.unique_sessions, 1)
+
+
+class SessionFreeVisitTrackingTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_USER_AGENT=BROWSER_UA)
+
+    def test_anonymous_visits_do_not_create_sessions(self):
+        response = self.client.get(reverse("home"))
+
+        self.assertEqual(Session.objects.count(), 0)
+        self.assertIn(cookie_name(), response.cookies)
+        self.assertEqual(SiteVisit.objects.count(), 1)
+
+    def test_cookie_keeps_the_visitor_identity(self):
+        first = self.client.get(reverse("home"))
+        second = self.client.get(reverse("faq"), REMOTE_ADDR="10.0.0.9")
+
+        self.assertNotIn(cookie_name(), second.cookies)
+        visit = SiteVisit.objects.get()
+        self.assertEqual(visit.first_path, reverse("home"))
+        self.assertTrue(first.cookies[cookie_name()]["httponly"])
+        self.assertEqual(DailyVisitStat.objects.get().unique_sessions, 1)
+
+    def test_cookieless_clients_collapse_to_one_visitor(self):
+        for _ in range(20):
+            Client(HTTP_USER_AGENT="Mozilla/5.0").get(reverse("faq"))
+        Client(HTTP_USER_AGENT="Mozilla/5.0 (X11)").get(reverse("faq"))
+
+        stat = DailyVisitStat.objects.get()
+        self.assertEqual(stat.total_hits, 21)
+        self.assertEqual(stat.unique_sessions, 2)
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_tampered_cookie_is_replaced(self):
+        self.client.cookies[cookie_name()] = "forged:value"
+
+        response = self.client.get(reverse("home"))
+
+        self.assertIn(cookie_name(), response.cookies)
+        self.assertNotEqual(SiteVisit.objects.get().session_key, "forged")
+
+    def test_logged_in_visit_is_attributed_to_the_user(self):
+        user = get_user_model().objects.create_user("visitor", password="pass")
+        self.client.get(reverse("home"))
+        self.client.force_login(user)
+
+        self.client.get(reverse("faq"))
+
+        self.assertEqual(SiteVisit.objects.get().user, user)
+
+
+class BotTrafficTests(TestCase):
+    def test_classifier(self):
+        for agent in (
+            "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+            "Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)",
+            "facebookexternalhit/1.1",
+            "curl/8.5.0",
+            "python-requests/2.32.3",
+            "TelegramBot (like TwitterBot)",
+            "WhatsApp/2.23.20.0 A",
+            "",
+        ):
+            self.assertTrue(is_bot(agent), agent)
+        for agent in (
+            "Mozilla/5.0 (Linux; Android 14; SM-A546E) AppleWebKit/537.36 Chrome/126.0 Mobile Safari/537.36 "
+            "Telegram-Android/10.14.5 (Samsung SM-A546E; Android 14; SDK 34; AVERAGE)",
+            "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148 WhatsApp/2.24.1",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+            "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148 Safari/604.1",
+        ):
+            self.assertFalse(is_bot(agent), agent)
+
+    def test_bots_only_bump_the_bot_counter(self):
+        for _ in range(5):
+            response = Client(HTTP_USER_AGENT="Mozilla/5.0 (compatible; bingbot/2.0)").get(reverse("sitemap_xml"))
+        Client(HTTP_USER_AGENT="Mozilla/5.0").get(reverse("home"))
+
+        stat = DailyVisitStat.objects.get()
+        self.assertEqual((stat.bot_hits, stat.total_hits, stat.unique_sessions), (5, 1, 1))
+        self.assertEqual(SiteVisit.objects.count(), 1)
+        self.assertNotIn(cookie_name(), response.cookies)
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import Client, override_settings
+
+from core.querycheck import MODE_RAISE, record_queries, report_repeated
+
+
+def client_without_visit_tracking() -> Client:
+    """Test client whose requests skip SiteVisitMiddleware.
+
+    Visit tracking writes to the DB on every page view; query-count assertions
+    use this client to measure only the view's own work.
+    """
+
+    middleware = [m for m in settings.MIDDLEWARE if m != "core.middleware.SiteVisitMiddleware"]
+    client = Client()
+    with override_settings(MIDDLEWARE=middleware):
+        client.handler.load_middleware()
+    return client
+
+
+class QueryBudgetMixin:
+    """`assertQueryBudget` for TestCases: cap the query count and fail on repeated statements."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget: int, label: str = "block", threshold: int | None = None):
+        with record_queries() as log:
+            yield log
+        report_repeated(label, log, MODE_RAISE, threshold)
+        self.assertLessEqual(
+            log.total,
+            budget,
+            f"{label} ran {log.total} queries (budget {budget}):\n" + "\n".join(log.counts),
+        )
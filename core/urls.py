@@ -15,11 +15,15 @@ urlpatterns = [
     path("projects/", views.projects_list, name="projects_list"),
     path("projects/<str:slug>/", views.project_detail, name="project_detail"),
     path("downloads/", views.downloads, name="downloads"),
+    path("downloads/<str:slug>/", views.download_file, name="download_file"),
     path("contact/", views.contact, name="contact"),
     path("faq/", views.faq, name="faq"),
     path("privacy/", views.privacy, name="privacy"),
     path("terms/", views.terms, name="terms"),
     path("sitemap.xml", views.sitemap_xml, name="sitemap_xml"),
+    path("sitemap-<int:number>.xml", views.sitemap_section, name="sitemap_section"),
     path("robots.txt", views.robots_txt, name="robots_txt"),
+    path("csrf/", views.csrf_token, name="csrf_token"),
     path("health/", views.health_check, name="health_check"),
+    path("metrics", views.metrics, name="metrics"),
 ]
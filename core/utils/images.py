@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from io import BytesIO
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+FORMATS = (
+    # (format key, Pillow format, save options)
+    ("webp", "WEBP", {"method": 4}),
+    ("jpeg", "JPEG", {"optimize": True, "progressive": True}),
+)
+
+
+@dataclass(frozen=True)
+class RenderedVariant:
+    width: int
+    height: int
+    format: str
+    data: bytes
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """JPEG has no alpha channel; composite transparent images onto white."""
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_variants(data: bytes, widths: Iterable[int], quality: int = 80) -> list[RenderedVariant]:
+    """Resize an encoded image to every width smaller than the original, as WebP and JPEG.
+
+    Pure function of its arguments (no Django, no database) so it can run in a
+    process pool worker. Pillow is imported here, on the first upload, rather
+    than by every web worker at boot.
+    """
+
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    variants: list[RenderedVariant] = []
+    for width in sorted(set(int(w) for w in widths)):
+        if width <= 0 or width >= image.width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for key, pil_format, options in FORMATS:
+            target = _flatten(resized) if key == "jpeg" else resized
+            buffer = BytesIO()
+            target.save(buffer, pil_format, quality=quality, **options)
+            variants.append(RenderedVariant(width=width, height=height, format=key, data=buffer.getvalue()))
+    return variants
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import Callable, Iterable, Sequence
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Model, Q, QuerySet
+from django.utils.text import slugify
+
+# Room kept at the end of a truncated base for a "-<n>" suffix.
+SUFFIX_RESERVE = 8
+# Prefixes OR-ed together per query when allocating many slugs at once.
+PREFIX_BATCH = 50
+MAX_ATTEMPTS = 3
+
+
+def slug_base(text: str, fallback: str, max_length: int | None = None) -> str:
+    base = slugify(text or "", allow_unicode=True)
+    if max_length:
+        base = base[: max(1, max_length - SUFFIX_RESERVE)].strip("-")
+    return base or fallback
+
+
+def next_free_slug(base: str, taken: set[str]) -> str:
+    """First of base, base-1, base-2, ... not in `taken`; the result is added to `taken`."""
+    candidate = base
+    suffix = 1
+    while candidate in taken:
+        candidate = f"{base}-{suffix}"
+        suffix += 1
+    taken.add(candidate)
+    return candidate
+
+
+def taken_slugs(queryset: QuerySet, bases: Iterable[str]) -> set[str]:
+    """Slugs in `queryset` equal to a base or starting with "<base>-", one query per PREFIX_BATCH bases."""
+    unique_bases = sorted(set(bases))
+    taken: set[str] = set()
+    for start in range(0, len(unique_bases), PREFIX_BATCH):
+        condition = Q()
+        for base in unique_bases[start : start + PREFIX_BATCH]:
+            condition |= Q(slug=base) | Q(slug__startswith=f"{base}-")
+        taken.update(queryset.filter(condition).values_list("slug", flat=True))
+    return taken
+
+
+def _max_length(model: type[Model]) -> int | None:
+    return model._meta.get_field("slug").max_length
+
+
+def _scoped_queryset(instance: Model, scope: Sequence[str]) -> QuerySet:
+    model = type(instance)
+    queryset = model._default_manager.filter(**{name: getattr(instance, name) for name in scope})
+    if instance.pk is not None:
+        queryset = queryset.exclude(pk=instance.pk)
+    return queryset
+
+
+def allocate_slug(instance: Model, source: str, *, fallback: str, scope: Sequence[str] = ()) -> str:
+    """A free slug for `instance`, unique among rows sharing the `scope` fields, in one query."""
+    base = slug_base(source, fallback, _max_length(type(instance)))
+    return next_free_slug(base, taken_slugs(_scoped_queryset(instance, scope), [base]))
+
+
+def allocate_slugs(queryset: QuerySet, sources: Sequence[str], *, fallback: str) -> list[str]:
+    """Slugs for many new rows at once: unique among themselves and against `queryset`."""
+    max_length = _max_length(queryset.model)
+    bases = [slug_base(source, fallback, max_length) for source in sources]
+    taken = taken_slugs(queryset, bases)
+    return [next_free_slug(base, taken) for base in bases]
+
+
+def save_with_unique_slug(
+    instance: Model,
+    save: Callable[[], None],
+    *,
+    source: str,
+    fallback: str,
+    scope: Sequence[str] = (),
+) -> None:
+    """Run `save()`, allocating `instance.slug` first when it is blank.
+
+    Two concurrent saves can pick the same free slug; the loser hits the unique
+    constraint and allocates again instead of failing the request.
+    """
+
+    if instance.slug:
+        save()
+        return
+
+    using = router.db_for_write(type(instance), instance=instance)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        instance.slug = allocate_slug(instance, source, fallback=fallback, scope=scope)
+        try:
+            with transaction.atomic(using=using):
+                save()
+            return
+        except IntegrityError:
+            slug_conflict = _scoped_queryset(instance, scope).filter(slug=instance.slug).exists()
+            if attempt == MAX_ATTEMPTS or not slug_conflict:
+                instance.slug = ""
+                raise
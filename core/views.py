@@ -1,24 +1,48 @@
 ﻿from __future__ import annotations
 
+import hmac
 import logging
-from pathlib import Path
 
 from django.conf import settings
-from django.contrib.auth.models import User
-from django.core.mail import EmailMultiAlternatives, get_connection
-from django.db import connections
-from django.http import HttpResponse, JsonResponse
+from django.db import connections, transaction
+from django.db.models import Count, Max, Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, render
-from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.text import slugify
+from django.views.csrf import csrf_failure as django_csrf_failure
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
 
-from core.utils.jalali import format_jalali
 from store.models import Category, Product, ProductReview
-from store.utils import get_primary_image_url
-
+from store.utils import attach_card_images
+
+from . import sitemaps
+from .caching import get_or_compute
+from .conditional import conditional_page, settings_updated_at
+from .dbguard import database_breaker
+from .downloads import serve_field_file
+from .edgecache import (
+    CATEGORY_LIST,
+    DOWNLOAD_LIST,
+    NEWS_LIST,
+    PRODUCT_LIST,
+    REVIEW_LIST,
+    add_keys,
+    category_key,
+    edge_cached,
+    news_key,
+    product_key,
+)
 from .forms import ContactForm
-from .models import ContactMessage, Download, News
+from .generations import CATALOG, NEWS, versioned_key
+from .images import responsive_images
+from .metrics import collect, render_prometheus
+from .models import ContactNotification, Download, News
+from .notifications import enqueue_contact_notification
+from .pagecache import cache_anonymous_page
+from .prerender import prerendered
 
 logger = logging.getLogger(__name__)
 
@@ -111,44 +135,60 @@ PACKAGE_DATA = {
 }
 
 
+def _home_sections() -> dict:
+    products = list(Product.objects.select_related("category").prefetch_related("images").order_by("-created_at")[:6])
+    attach_card_images(products)
+    return {
+        "categories": list(Category.objects.all()),
+        "featured_products": products,
+        "projects": list(News.objects.all()[:3]),
+        # Approved reviews bump the catalog generation, so they can share its cache entry.
+        "latest_reviews": list(
+            ProductReview.objects.filter(is_approved=True).select_related("product").order_by("-created_at")[:6]
+        ),
+    }
+
+
+@cache_anonymous_page(CATALOG, NEWS)
+@edge_cached(PRODUCT_LIST, CATEGORY_LIST, NEWS_LIST, REVIEW_LIST)
 def home(request):
-    categories = Category.objects.all()
-    products = Product.objects.prefetch_related("images").order_by("-created_at")[:6]
-    projects = News.objects.all()[:3]
-    latest_reviews = (
-        ProductReview.objects.filter(is_approved=True)
-        .select_related("product")
-        .order_by("-created_at")[:6]
+    sections = get_or_compute(
+        versioned_key("home:sections", CATALOG, NEWS), _home_sections, getattr(settings, "HOME_CACHE_SECONDS", 600)
+    )
+    add_keys(
+        request,
+        *(category_key(c.pk) for c in sections["categories"]),
+        *(product_key(p.pk) for p in sections["featured_products"]),
+        *(product_key(r.product_id) for r in sections["latest_reviews"]),
+        *(news_key(n.pk) for n in sections["projects"]),
     )
-
-    for product in products:
-        product.card_image_url = get_primary_image_url(product)
 
     return render(
         request,
         "home.html",
         {
-            "categories": categories,
-            "featured_products": products,
-            "projects": projects,
+            **sections,
             "packages": PACKAGE_DATA,
-            "latest_reviews": latest_reviews,
         },
     )
 
 
+@prerendered("about")
 def about(request):
     return render(request, "about.html")
 
 
+@prerendered("services")
 def services(request):
     return render(request, "services.html", {"packages": PACKAGE_DATA})
 
 
+@prerendered("kitchen_setup")
 def kitchen_setup(request):
     return render(request, "kitchen_setup.html", {"packages": PACKAGE_DATA})
 
 
+@prerendered("package_detail", variants=lambda: [{"package_slug": key} for key in PACKAGE_DATA])
 def package_detail(request, package_slug: str):
     package_key = slugify(package_slug, allow_unicode=True)
     if package_key not in PACKAGE_DATA:
@@ -160,57 +200,65 @@ def package_detail(request, package_slug: str):
     )
 
 
+def _projects_validators(request, slug: str | None = None):
+    values = News.objects.aggregate(
+        latest=Max("updated_at"),
+        total=Count("pk"),
+        settings=settings_updated_at(),
+        **({"found": Count("pk", filter=Q(slug=slug))} if slug is not None else {}),
+    )
+    if slug is not None and not values["found"]:
+        return None
+    return values
+
+
+def _downloads_validators(request):
+    return Download.objects.aggregate(
+        latest=Max("updated_at"),
+        total=Count("pk"),
+        settings=settings_updated_at(),
+    )
+
+
+@cache_anonymous_page(NEWS)
+@edge_cached(NEWS_LIST)
+@conditional_page(_projects_validators)
 def projects_list(request):
-    projects = News.objects.all()
+    projects = list(News.objects.all())
+    add_keys(request, *(news_key(n.pk) for n in projects))
     return render(request, "projects_list.html", {"projects": projects})
 
 
+@cache_anonymous_page(NEWS)
+@edge_cached(NEWS_LIST)
+@conditional_page(_projects_validators)
 def project_detail(request, slug: str):
     project = get_object_or_404(News, slug=slug)
-    latest = News.objects.exclude(pk=project.pk)[:4]
+    latest = list(News.objects.exclude(pk=project.pk)[:4])
+    add_keys(request, news_key(project.pk), *(news_key(n.pk) for n in latest))
+    cover_name = project.cover_image.name if project.cover_image else ""
+    cover = responsive_images([cover_name]).get(cover_name)
     return render(
         request,
         "project_detail.html",
-        {"project": project, "latest": latest},
+        {"project": project, "latest": latest, "cover": cover},
     )
 
 
+@edge_cached(DOWNLOAD_LIST)
+@conditional_page(_downloads_validators)
 def downloads(request):
     items = Download.objects.all()
     return render(request, "downloads.html", {"downloads": items})
 
 
-def contact(request):
-    def _admin_emails():
-        return list(
-            User.objects.filter(is_superuser=True, email__isnull=False)
-            .exclude(email="")
-            .values_list("email", flat=True)
-        )
-
-    def _send_email_message(message: EmailMultiAlternatives) -> None:
-        try:
-            message.send(fail_silently=False)
-            return
-        except Exception:
-            if not getattr(settings, "DEBUG", False):
-                logger.exception("Failed to send contact email")
-                return
-
-        try:
-            base_dir = Path(getattr(settings, "BASE_DIR", Path.cwd()))
-            file_path = base_dir / "tmp" / "emails"
-            file_path.mkdir(parents=True, exist_ok=True)
-            connection = get_connection(
-                "django.core.mail.backends.filebased.EmailBackend",
-                fail_silently=True,
-                file_path=str(file_path),
-            )
-            message.connection = connection
-            message.send(fail_silently=True)
-        except Exception:
-            logger.exception("Failed to send contact email (filebased fallback)")
+@require_safe
+def download_file(request, slug: str):
+    item = get_object_or_404(Download.objects.only("pk", "file"), slug=slug)
+    return serve_field_file(request, item.file, counter_key=(Download, item.pk, "download_count"))
 
+
+def contact(request):
     initial = {}
     product_slug = (request.GET.get("product") or "").strip()
     if product_slug:
@@ -227,71 +275,9 @@ def contact(request):
     if request.method == "POST":
         form = ContactForm(request.POST)
         if form.is_valid():
-            message = form.save()
-
-            support_email = (getattr(settings, "COMPANY_EMAIL", "") or "").strip()
-            if not support_email:
-                support_email = (getattr(settings, "DEFAULT_FROM_EMAIL", "") or "").strip()
-
-            admin_emails = _admin_emails()
-            bcc_emails = sorted({email for email in admin_emails if email and email != support_email})
-
-            if support_email:
-                created_at = format_jalali(message.created_at, "Y/m/d - H:i")
-                base_url = (getattr(settings, "SITE_BASE_URL", "") or "").strip().rstrip("/")
-                admin_prefix = getattr(settings, "ADMIN_PATH", "admin/").strip("/")
-                admin_root = f"/{admin_prefix}/"
-                admin_url = (
-                    f"{base_url}{admin_root}core/contactmessage/{message.id}/change/"
-                    if base_url
-                    else f"{admin_root}core/contactmessage/{message.id}/change/"
-                )
-
-                brand = getattr(settings, "SITE_NAME", "استیرا")
-                subject = f"پیام جدید فرم تماس | {message.name}"
-                text_body = (
-                    "پیام جدیدی از فرم تماس دریافت شد.\n\n"
-                    f"نام: {message.name}\n"
-                    f"ایمیل: {message.email}\n"
-                    f"شماره تماس: {message.phone or '-'}\n"
-                    f"نام مجموعه: {message.company or '-'}\n"
-                    f"شهر: {message.city or '-'}\n"
-                    f"نوع درخواست: {message.get_inquiry_type_display()}\n"
-                    f"پکیج: {message.get_service_package_display() if message.service_package else '-'}\n"
-                    f"محصول موردنظر: {message.product_interest or '-'}\n"
-                    f"تاریخ ثبت: {created_at}\n\n"
-                    f"پیام:\n{message.message}"
-                )
-                html_body = render_to_string(
-                    "emails/contact_message.html",
-                    {
-                        "title": "پیام جدید فرم تماس",
-                        "preheader": f"پیام جدید از {message.name}",
-                        "brand": brand,
-                        "subtitle": "این پیام از طریق فرم تماس سایت دریافت شده است.",
-                        "name": message.name,
-                        "email": message.email,
-                        "phone": message.phone,
-                        "created_at": created_at,
-                        "message_text": message.message,
-                        "admin_url": admin_url,
-                        "footer": "برای پاسخ‌گویی سریع‌تر، از طریق پنل مدیریت اقدام کنید.",
-                    },
-                )
-
-                try:
-                    email_message = EmailMultiAlternatives(
-                        subject=subject,
-                        body=text_body,
-                        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-                        to=[support_email],
-                        bcc=bcc_emails,
-                        reply_to=[message.email],
-                    )
-                    email_message.attach_alternative(html_body, "text/html")
-                    _send_email_message(email_message)
-                except Exception:
-                    logger.exception("Failed to build/send contact email")
+            with transaction.atomic():
+                message = form.save()
+                enqueue_contact_notification(message)
 
             return render(
                 request,
@@ -307,50 +293,59 @@ def contact(request):
     return render(request, "contact.html", {"form": form})
 
 
+@prerendered("faq")
 def faq(request):
     return render(request, "faq.html")
 
 
+@prerendered("terms")
 def terms(request):
     return render(request, "terms.html")
 
 
+@prerendered("privacy")
 def privacy(request):
     return render(request, "privacy.html")
 
 
 def sitemap_xml(request):
-    base_url = (getattr(settings, "SITE_BASE_URL", "") or "").strip().rstrip("/")
-    urls = [
-        "/",
-        "/about/",
-        "/services/",
-        "/services/kitchen-setup/",
-        "/services/kitchen-setup/basic/",
-        "/services/kitchen-setup/vip/",
-        "/services/kitchen-setup/cip/",
-        "/projects/",
-        "/catalog/",
-        "/downloads/",
-        "/contact/",
-        "/faq/",
-        "/privacy/",
-        "/terms/",
-    ]
-
-    urls += [f"/projects/{item.slug}/" for item in News.objects.all()]
-    for category in Category.objects.all():
-        urls.append(f"/catalog/{category.slug}/")
-        for product in Product.objects.filter(category=category):
-            urls.append(f"/catalog/{category.slug}/{product.slug}/")
-
-    content = render_to_string(
-        "sitemap.xml",
-        {"urls": [f"{base_url}{path}" if base_url else path for path in urls]},
-    )
+    return HttpResponse(sitemaps.render_index(), content_type="application/xml")
+
+
+def sitemap_section(request, number: int):
+    content = sitemaps.get_shard(number)
+    if content is None:
+        raise Http404
     return HttpResponse(content, content_type="application/xml")
 
 
+@never_cache
+@require_safe
+def csrf_token(request):
+    """CSRF token for forms on edge-cached pages, which cannot carry one in their HTML."""
+    return JsonResponse({"token": get_token(request)})
+
+
+def csrf_failure(request, reason=""):
+    """CSRF_FAILURE_VIEW: give a rejected review its form back, anything else a readable 403."""
+    match = request.resolver_match
+    if match is not None and match.url_name == "catalog_product_review":
+        from store.forms import ProductReviewForm
+        from store.views import render_review_page
+
+        product = Product.objects.select_related("category").filter(
+            slug=match.kwargs.get("product_slug"), category__slug=match.kwargs.get("category_slug")
+        ).first()
+        if product is not None:
+            # Rendering the form issues a fresh token, so resubmitting the kept input succeeds.
+            return render_review_page(
+                request, product, ProductReviewForm(request.POST or None), status=403, csrf_retry=True
+            )
+    if settings.DEBUG:
+        return django_csrf_failure(request, reason)
+    return render(request, "403_csrf.html", status=403)
+
+
 def robots_txt(request):
     base_url = (getattr(settings, "SITE_BASE_URL", "") or "").strip().rstrip("/")
     sitemap_url = f"{base_url}/sitemap.xml" if base_url else "/sitemap.xml"
@@ -370,6 +365,33 @@ def health_check(request):
     payload = {
         "status": "ok" if db_ok else "degraded",
         "database": "ok" if db_ok else "error",
+        # Open while public pages are served from their last good copies (core.dbguard).
+        "breaker": "open" if database_breaker.is_open() else "closed",
         "time": timezone.now().isoformat(),
     }
     return JsonResponse(payload, status=200 if db_ok else 503)
+
+
+def _metrics_authorized(request) -> bool:
+    token = getattr(settings, "METRICS_TOKEN", "") or ""
+    if token:
+        auth = request.META.get("HTTP_AUTHORIZATION", "")
+        supplied = auth[7:].strip() if auth.startswith("Bearer ") else ""
+        if supplied and hmac.compare_digest(supplied.encode(), token.encode()):
+            return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+@require_safe
+def metrics(request):
+    """Prometheus scrape endpoint: `Authorization: Bearer <METRICS_TOKEN>` or a staff login."""
+    if not _metrics_authorized(request):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    notification_counts = dict(
+        ContactNotification.objects.order_by().values_list("status").annotate(total=Count("id"))
+    )
+    body = render_prometheus(collect(), notification_counts)
+    response = HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+    response["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.hll import HyperLogLog
+from core.models import DailyVisitStat, SiteVisit, VisitRollup
+
+MODE_EXACT = "exact"
+MODE_SKETCH = "sketch"
+SATURDAY = 5
+
+
+def unique_mode() -> str:
+    """`exact` keeps one SiteVisit row per visitor per day; `sketch` keeps only the day's HyperLogLog."""
+    mode = (getattr(settings, "VISIT_UNIQUE_MODE", MODE_EXACT) or "").strip().lower()
+    return MODE_SKETCH if mode == MODE_SKETCH else MODE_EXACT
+
+
+def period_start(period: str, day: date) -> date:
+    if period == VisitRollup.PERIOD_WEEK:
+        return day - timedelta(days=(day.weekday() - SATURDAY) % 7)
+    return day.replace(day=1)
+
+
+def record_hit(day: date, visitor_id: str, new_visitor: bool | None) -> None:
+    """Count one human hit on `day`.
+
+    `new_visitor` is True/False when a SiteVisit row already decided it
+    (exact mode). None means sketch mode: the sketch decides, and
+    `unique_sessions` holds its estimate.
+    """
+
+    counts = {"total_hits": F("total_hits") + 1}
+    if new_visitor:
+        counts["unique_sessions"] = F("unique_sessions") + 1
+    if new_visitor is not False:
+        # Registers only grow, so a visitor already in an unlocked (possibly older) read of
+        # the sketch is in the current one too; only a sketch that changes needs the row lock.
+        stored = DailyVisitStat.objects.filter(date=day).values_list("visitor_sketch", flat=True).first()
+        if stored is None or HyperLogLog.from_bytes(stored).add(visitor_id):
+            _record_sketch_hit(day, visitor_id, counts, estimate=new_visitor is None)
+            return
+
+    # One UPDATE, no row lock held; the row is created on the day's first hit.
+    hits = DailyVisitStat.objects.filter(date=day)
+    if not hits.update(**counts):
+        DailyVisitStat.objects.get_or_create(date=day)
+        hits.update(**counts)
+
+
+def _record_sketch_hit(day: date, visitor_id: str, counts: dict, *, estimate: bool) -> None:
+    with transaction.atomic():
+        stat, _created = DailyVisitStat.objects.select_for_update().get_or_create(date=day)
+        updates = dict(counts)
+        sketch = HyperLogLog.from_bytes(stat.visitor_sketch)
+        if sketch.add(visitor_id):
+            updates["visitor_sketch"] = sketch.to_bytes()
+            if estimate:
+                updates["unique_sessions"] = sketch.count()
+        DailyVisitStat.objects.filter(pk=stat.pk).update(**updates)
+
+
+def merge_raw_visits(day: date) -> bool:
+    """Fold the day's SiteVisit ids into its sketch (idempotent); True if the sketch changed."""
+    raw = HyperLogLog()
+    for visitor_id in SiteVisit.objects.filter(visited_on=day).values_list("session_key", flat=True).iterator(
+        chunk_size=2000
+    ):
+        raw.add(visitor_id)
+    with transaction.atomic():
+        stat, _created = DailyVisitStat.objects.select_for_update().get_or_create(date=day)
+        sketch = HyperLogLog.from_bytes(stat.visitor_sketch)
+        if not sketch.update(raw):
+            return False
+        DailyVisitStat.objects.filter(pk=stat.pk).update(visitor_sketch=sketch.to_bytes())
+    return True
+
+
+def backfill_sketches() -> int:
+    """Build sketches for days that have raw visits but no sketch yet (data from before sketches)."""
+    days = (
+        SiteVisit.objects.exclude(visited_on__in=DailyVisitStat.objects.exclude(visitor_sketch=b"").values("date"))
+        .values_list("visited_on", flat=True)
+        .distinct()
+    )
+    return sum(merge_raw_visits(day) for day in list(days))
+
+
+def prune_raw_visits(before: date) -> int:
+    """Delete SiteVisit rows older than `before`, merging each day into its sketch first."""
+    deleted = 0
+    days = SiteVisit.objects.filter(visited_on__lt=before).values_list("visited_on", flat=True).distinct()
+    for day in sorted(set(days)):
+        merge_raw_visits(day)
+        count, _ = SiteVisit.objects.filter(visited_on=day).delete()
+        deleted += count
+    return deleted
+
+
+def build_rollups(since: date | None = None) -> int:
+    """Recompute weekly and monthly rollups for every period that contains a day >= `since`."""
+    written = 0
+    for period, _label in VisitRollup.PERIOD_CHOICES:
+        stats = DailyVisitStat.objects.order_by("date")
+        if since is not None:
+            stats = stats.filter(date__gte=period_start(period, since))
+        groups: dict[date, list] = {}
+        for stat in stats.iterator(chunk_size=200):
+            groups.setdefault(period_start(period, stat.date), []).append(stat)
+        for start, days in groups.items():
+            sketch = HyperLogLog()
+            for stat in days:
+                if stat.visitor_sketch:
+                    sketch.update(HyperLogLog.from_bytes(stat.visitor_sketch))
+            VisitRollup.objects.update_or_create(
+                period=period,
+                start=start,
+                defaults={
+                    "days": len(days),
+                    "total_hits": sum(stat.total_hits for stat in days),
+                    "bot_hits": sum(stat.bot_hits for stat in days),
+                    "unique_visitors": sketch.count(),
+                    "visitor_sketch": sketch.to_bytes(),
+                },
+            )
+            written += 1
+    return written
+
+
+def unique_visitors(start: date, end: date) -> int:
+    """Estimated distinct visitors between two dates (inclusive), merged from daily sketches."""
+    sketch = HyperLogLog()
+    for data in DailyVisitStat.objects.filter(date__range=(start, end)).values_list("visitor_sketch", flat=True):
+        if data:
+            sketch.update(HyperLogLog.from_bytes(data))
+    return sketch.count()
+
+
+def chart_rows(period: str, limit: int) -> list[dict]:
+    """Newest `limit` rollups, oldest first, without loading the sketches."""
+    rollups = list(
+        VisitRollup.objects.filter(period=period)
+        .defer("visitor_sketch")
+        .order_by("-start")[:limit]
+    )
+    peak = max((rollup.unique_visitors for rollup in rollups), default=0) or 1
+    return [
+        {
+            "start": rollup.start,
+            "unique_visitors": rollup.unique_visitors,
+            "total_hits": rollup.total_hits,
+            "bot_hits": rollup.bot_hits,
+            "percent": round(rollup.unique_visitors * 100 / peak, 1),
+        }
+        for rollup in reversed(rollups)
+    ]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from auth_security.services import get_client_ip
+
+COOKIE_SALT = "core.visitors"
+
+
+def cookie_name() -> str:
+    return getattr(settings, "VISITOR_COOKIE_NAME", "styra_vid") or "styra_vid"
+
+
+def _signer() -> signing.Signer:
+    return signing.Signer(salt=COOKIE_SALT)
+
+
+def _fingerprint_id(request) -> str:
+    """Stable per-day id for clients that send no cookie (crawlers, privacy modes).
+
+    A keyed hash of IP and User-Agent, so the raw address is never stored.
+    """
+
+    material = "|".join(
+        (get_client_ip(request), request.META.get("HTTP_USER_AGENT", ""), timezone.localdate().isoformat())
+    )
+    digest = hmac.new(settings.SECRET_KEY.encode(), material.encode(), hashlib.sha256).hexdigest()
+    return f"h{digest[:31]}"
+
+
+def identify(request) -> tuple[str, bool]:
+    """Return `(visitor_id, needs_cookie)` without touching the session.
+
+    A valid signed cookie wins. Without one, the IP+UA hash is used and handed
+    out as the cookie, so a browser's first and later hits count as one visitor
+    while cookieless crawlers collapse to one visitor per day.
+    """
+
+    raw = request.COOKIES.get(cookie_name())
+    if raw:
+        try:
+            return _signer().unsign(raw), False
+        except signing.BadSignature:
+            pass
+    return _fingerprint_id(request), True
+
+
+def set_cookie(response, visitor_id: str) -> None:
+    response.set_cookie(
+        cookie_name(),
+        _signer().sign(visitor_id),
+        max_age=int(getattr(settings, "VISITOR_COOKIE_AGE", 365 * 24 * 3600)),
+        secure=bool(getattr(settings, "SESSION_COOKIE_SECURE", False)),
+        httponly=True,
+        samesite="Lax",
+    )
@@ -6,3 +6,15 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shopproject.settings")
 
 application = get_asgi_application()
 
+
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "TEMPLATE_WARMUP", False):
+    from core.templating import warm_templates
+
+    warm_templates()
+
+if getattr(settings, "PRELOAD_MODULES", None):
+    from core.importtime import preload
+
+    preload(settings.PRELOAD_MODULES)
@@ -83,19 +83,47 @@ MIDDLEWARE=[
     'core.middleware.SecurityHeadersMiddleware',
     'core.middleware.ExceptionLoggingMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.middleware.gzip.GZipMiddleware',
+    'core.middleware.GZipMiddleware',
+    'core.middleware.SharedCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'core.middleware.SiteVisitMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'auth_security.middleware.LoginProtectionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestProfilerMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.TemplateProfileMiddleware',
     'core.middleware.AdminEnglishMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 ROOT_URLCONF='shopproject.urls'
-TEMPLATES=[{'BACKEND':'django.template.backends.django.DjangoTemplates','DIRS':[BASE_DIR/'templates'],'APP_DIRS':True,'OPTIONS':{'context_processors':['django.template.context_processors.debug','django.template.context_processors.request','django.contrib.auth.context_processors.auth','django.contrib.messages.context_processors.messages','core.context_processors.site_info']}}]
+# Templates: compiled templates are cached per process unless TEMPLATE_CACHE is off
+# (on in DEBUG too: runserver's autoreloader clears the cache when a template changes).
+TEMPLATE_CACHE = _env_bool("TEMPLATE_CACHE", True)
+# Compile every template when the WSGI app boots so the first request matches steady state.
+TEMPLATE_WARMUP = _env_bool("TEMPLATE_WARMUP", not DEBUG)
+# Modules the WSGI/ASGI entry point imports at boot. Leave empty to keep workers lean; under
+# gunicorn --preload, listing e.g. store.invoice loads ReportLab once in the master and every
+# forked worker shares it instead of importing it on its first PDF.
+PRELOAD_MODULES = [m.strip() for m in os.getenv("PRELOAD_MODULES", "").split(",") if m.strip()]
+# Checked by `python manage.py import_report` (core.importtime): milliseconds a worker may spend
+# importing modules at boot (0 = no limit), and heavy modules that must only load on first use.
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+LAZY_IMPORT_MODULES = [
+    m.strip()
+    for m in os.getenv("LAZY_IMPORT_MODULES", "reportlab,arabic_reshaper,bidi,openpyxl,PIL").split(",")
+    if m.strip()
+]
+_template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    _template_loaders = [('django.template.loaders.cached.Loader', _template_loaders)]
+TEMPLATES=[{'BACKEND':'django.template.backends.django.DjangoTemplates','DIRS':[BASE_DIR/'templates'],'APP_DIRS':False,'OPTIONS':{'loaders':_template_loaders,'context_processors':['django.template.context_processors.debug','django.template.context_processors.request','django.contrib.auth.context_processors.auth','django.contrib.messages.context_processors.messages','core.context_processors.site_info']}}]
 
 # تنظیم ASGI
 ASGI_APPLICATION = 'shopproject.asgi.application'
@@ -161,6 +189,80 @@ SECURE_REFERRER_POLICY = os.getenv("SECURE_REFERRER_POLICY", "same-origin")
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = os.getenv("SESSION_COOKIE_SAMESITE", "Lax")
 CSRF_COOKIE_SAMESITE = os.getenv("CSRF_COOKIE_SAMESITE", "Lax")
+# Rejected review posts (edge-cached product pages fetch their token with JS) get their form back.
+CSRF_FAILURE_VIEW = "core.views.csrf_failure"
+
+# Sessions: "cached_db" (default) writes through to the database and serves reads from a
+# per-process cache for at most SESSION_L1_SECONDS (how long a logout in one worker can lag
+# in the others); "db" reads django_session on every request.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cached_db").strip().lower()
+SESSION_ENGINE = "core.sessions.db" if SESSION_BACKEND == "db" else "core.sessions.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_L1_SECONDS = int(os.getenv("SESSION_L1_SECONDS", "15"))
+# `clearsessions` / `clear_expired_sessions` delete expired rows in batches with a pause between them.
+SESSION_CLEANUP_BATCH_SIZE = int(os.getenv("SESSION_CLEANUP_BATCH_SIZE", "1000"))
+SESSION_CLEANUP_PAUSE = float(os.getenv("SESSION_CLEANUP_PAUSE", "0.1"))
+
+# Default cache: a per-process LRU (L1) in front of a shared L2. Set CACHE_L2_DIR to share L2
+# between workers through files; when empty, L2 is a per-process in-memory stand-in.
+CACHE_L2_DIR = os.getenv("CACHE_L2_DIR", "").strip()
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000"))
+CACHE_L1_SECONDS = float(os.getenv("CACHE_L1_SECONDS", "5"))
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "60"))
+CACHES = {
+    "default": {
+        "BACKEND": "core.caching.TieredCache",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "L2": (
+                {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": CACHE_L2_DIR,
+                    "OPTIONS": {"MAX_ENTRIES": 10000},
+                }
+                if CACHE_L2_DIR
+                else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default-l2"}
+            ),
+            "L1_MAX_ENTRIES": CACHE_L1_MAX_ENTRIES,
+            "L1_SECONDS": CACHE_L1_SECONDS,
+            "STALE_SECONDS": CACHE_STALE_SECONDS,
+        },
+    },
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sessions",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+# Each process re-reads the cache generation table (core.generations) at most this often, so an
+# admin edit made through another worker or node invalidates this process's cached catalog/news
+# data within this many seconds. 0 turns polling off (one process, e.g. runserver).
+CACHE_GENERATION_POLL_SECONDS = float(os.getenv("CACHE_GENERATION_POLL_SECONDS", "0" if DEBUG else "2"))
+# Home page sections (latest products and projects); their key follows the catalog/news
+# generations, so this only bounds how long an unchanged copy is kept.
+HOME_CACHE_SECONDS = int(os.getenv("HOME_CACHE_SECONDS", "600"))
+# Anonymous page cache (core.pagecache) for the home and catalog pages; keys follow the
+# catalog/news/settings generations. 0 turns it off (the default in DEBUG, so template edits show).
+PAGE_CACHE_SECONDS = int(os.getenv("PAGE_CACHE_SECONDS", "0" if DEBUG else "600"))
+# Last good rendering of each cached page (and of product pages) is kept this long and served,
+# with a Warning header, when a query fails or runs longer than PAGE_DB_TIMEOUT seconds.
+# 0 turns it off (the default in DEBUG, so database errors are not hidden during development).
+PAGE_STALE_IF_ERROR_SECONDS = int(os.getenv("PAGE_STALE_IF_ERROR_SECONDS", "0" if DEBUG else "86400"))
+PAGE_DB_TIMEOUT = float(os.getenv("PAGE_DB_TIMEOUT", "2"))
+# After a database failure, pages with a last good copy skip the database for this long
+# while one background render per page checks for recovery (core.dbguard).
+DB_BREAKER_SECONDS = float(os.getenv("DB_BREAKER_SECONDS", "30"))
+# CDN in front of the catalog/news pages (core.edgecache): anonymous responses carry
+# s-maxage=EDGE_CACHE_SECONDS plus Surrogate-Key/Cache-Tag headers, and model changes send
+# batched purges for exactly those keys to CDN_PURGE_URL (empty: no purges).
+# CDN_PURGE_FORMAT is "cloudflare" ({"tags": [...]}, Bearer token) or "fastly"
+# ({"surrogate_keys": [...]}, Fastly-Key header).
+EDGE_CACHE_SECONDS = int(os.getenv("EDGE_CACHE_SECONDS", "0" if DEBUG else "3600"))
+CDN_PURGE_URL = os.getenv("CDN_PURGE_URL", "")
+CDN_PURGE_TOKEN = os.getenv("CDN_PURGE_TOKEN", "")
+CDN_PURGE_FORMAT = os.getenv("CDN_PURGE_FORMAT", "cloudflare")
+CDN_PURGE_BATCH_SIZE = int(os.getenv("CDN_PURGE_BATCH_SIZE", "30"))
+CDN_PURGE_DELAY = float(os.getenv("CDN_PURGE_DELAY", "0.5"))
 
 if not DEBUG:
     SECURE_SSL_REDIRECT = _env_bool("SECURE_SSL_REDIRECT", True)
@@ -194,6 +296,68 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '1').strip().lower() in ('1', 'true', 'yes', 'on')
 
+# Contact-form notifications are queued and sent off the request path.
+# thread: an in-process background worker drains the queue after each submission.
+# command: only `manage.py process_contact_notifications` (cron/supervisor) sends them.
+CONTACT_NOTIFICATION_MODE = os.getenv("CONTACT_NOTIFICATION_MODE", "thread")
+CONTACT_NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("CONTACT_NOTIFICATION_MAX_ATTEMPTS", "5"))
+# Longest the thread worker sleeps while retries or claims are outstanding (seconds).
+CONTACT_NOTIFICATION_POLL_SECONDS = int(os.getenv("CONTACT_NOTIFICATION_POLL_SECONDS", "60"))
+CONTACT_ADMIN_EMAILS_CACHE_SECONDS = int(os.getenv("CONTACT_ADMIN_EMAILS_CACHE_SECONDS", "3600"))
+
+# Static marketing pages (about, services, packages, faq, terms, privacy) are served from
+# HTML prerendered by `manage.py prerender_pages` (re-run on deploy; refreshed on PaymentSettings save).
+PRERENDER_ENABLED = _env_bool("PRERENDER_ENABLED", not DEBUG)
+PRERENDER_ROOT = Path(os.getenv("PRERENDER_ROOT", str(BASE_DIR / "tmp" / "prerendered")))
+
+# Resized WebP/JPEG copies of product images and project covers, exposed to templates as srcset.
+# Generated after each upload; `manage.py generate_image_derivatives` backfills existing media.
+IMAGE_DERIVATIVE_WIDTHS = os.getenv("IMAGE_DERIVATIVE_WIDTHS", "480,960,1600")
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
+IMAGE_DERIVATIVES_ON_UPLOAD = _env_bool("IMAGE_DERIVATIVES_ON_UPLOAD", True)
+
+# Downloads and datasheets are served by /downloads/<slug>/ and .../datasheet/ (Range-aware streaming).
+# Set DOWNLOAD_SENDFILE_BACKEND=nginx (X-Accel-Redirect to DOWNLOAD_ACCEL_PREFIX) or apache (X-Sendfile)
+# to let the front server send the bytes instead of a Django worker.
+DOWNLOAD_SENDFILE_BACKEND = os.getenv("DOWNLOAD_SENDFILE_BACKEND", "")
+DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/protected-media/")
+DOWNLOAD_CACHE_SECONDS = int(os.getenv("DOWNLOAD_CACHE_SECONDS", "3600"))
+DOWNLOAD_COUNT_FLUSH_SECONDS = int(os.getenv("DOWNLOAD_COUNT_FLUSH_SECONDS", "60"))
+DOWNLOAD_COUNT_FLUSH_HITS = int(os.getenv("DOWNLOAD_COUNT_FLUSH_HITS", "50"))
+
+# Request instrumentation: SQL/template/cache timings aggregated per view for a sample of requests.
+# Staff always get a Server-Timing header; `?_perf_stats=1` returns the per-view aggregates.
+INSTRUMENTATION_ENABLED = _env_bool("INSTRUMENTATION_ENABLED", True)
+INSTRUMENTATION_SAMPLE_RATE = float(os.getenv("INSTRUMENTATION_SAMPLE_RATE", "1.0" if DEBUG else "0.05"))
+
+# Prometheus endpoint (/metrics): per-view request counts, latency histograms, queue depths, memory.
+# Workers share counters through files in METRICS_DIR; scrape with `Authorization: Bearer <METRICS_TOKEN>`.
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", not DEBUG)
+METRICS_DIR = Path(os.getenv("METRICS_DIR", str(BASE_DIR / "tmp" / "metrics")))
+METRICS_FLUSH_SECONDS = int(os.getenv("METRICS_FLUSH_SECONDS", "10"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# N+1 detection: report requests that repeat one SQL statement NPLUSONE_THRESHOLD+ times.
+# "log" writes a warning naming the calling code, "raise" fails the request; empty disables it.
+NPLUSONE_MODE = os.getenv("NPLUSONE_MODE", "log" if DEBUG else "")
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "5"))
+
+# On-demand profiler: staff add ?_profile=1 (or send X-Profile-Token from `manage.py profile_token`).
+# Profiles (.prof for pstats/snakeviz, .collapsed for flamegraphs, .json SQL summary) go to PROFILER_DIR.
+PROFILER_DIR = Path(os.getenv("PROFILER_DIR", str(BASE_DIR / "tmp" / "profiles")))
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", "50"))
+PROFILER_SAMPLE_INTERVAL_MS = int(os.getenv("PROFILER_SAMPLE_INTERVAL_MS", "5"))
+PROFILER_TOKEN_MAX_AGE = int(os.getenv("PROFILER_TOKEN_MAX_AGE", "900"))
+
+# Visit analytics identify visitors by a signed cookie (IP+UA hash for cookieless clients),
+# so anonymous page views never create a database session.
+VISITOR_COOKIE_NAME = os.getenv("VISITOR_COOKIE_NAME", "styra_vid")
+VISITOR_COOKIE_AGE = int(os.getenv("VISITOR_COOKIE_AGE", str(365 * 24 * 3600)))
+# Unique visitors: "exact" keeps a SiteVisit row per visitor per day, "sketch" keeps only a
+# HyperLogLog per day. `rollup_visits` deletes SiteVisit rows older than the retention (0 = keep).
+VISIT_UNIQUE_MODE = os.getenv("VISIT_UNIQUE_MODE", "exact")
+VISIT_RAW_RETENTION_DAYS = int(os.getenv("VISIT_RAW_RETENTION_DAYS", "90"))
+
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
@@ -2,3 +2,15 @@ import os
 from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE','shopproject.settings')
 application=get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "TEMPLATE_WARMUP", False):
+    from core.templating import warm_templates
+
+    warm_templates()
+
+if getattr(settings, "PRELOAD_MODULES", None):
+    from core.importtime import preload
+
+    preload(settings.PRELOAD_MODULES)
@@ -1,4 +1,9 @@
 from django.apps import AppConfig
+
+
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self) -> None:  # pragma: no cover
+        from . import signals  # noqa: F401
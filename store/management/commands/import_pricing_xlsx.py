@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
 
-import openpyxl
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
 
+from core.edgecache import PRODUCT_LIST, category_products_key, product_key, purge
+from core.generations import CATALOG, bump
 from core.utils.jalali import PERSIAN_DIGITS_TRANS
+from core.utils.slugs import allocate_slugs
 from store.models import Category, Product, ProductFeature
 
 
@@ -18,6 +25,9 @@ DIGITS_TO_ASCII = str.maketrans(
 )
 
 
+ARABIC_TO_PERSIAN = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه"})
+
+
 def _to_ascii_digits(text: str) -> str:
     return (text or "").translate(DIGITS_TO_ASCII)
 
@@ -150,6 +160,290 @@ def _parse_price_toman(value) -> int:
     return max(0, rial // 10)
 
 
+class PriceRow(NamedTuple):
+    name: str
+    price: int
+    sku: str = ""
+
+
+def _normalize_name(name: str) -> str:
+    """Matching key for rows without a SKU: digits, Arabic letters, ZWNJ and spacing are unified."""
+    text = _to_ascii_digits(name or "").translate(ARABIC_TO_PERSIAN)
+    text = text.replace("\u200c", " ")
+    return " ".join(text.split()).casefold()
+
+
+def _iter_price_rows(ws, limit: int = 0) -> Iterator[PriceRow]:
+    """Yield price rows after the header row, without buffering the sheet.
+
+    An optional fourth column holds the product SKU, used as the sync key when present.
+    """
+    started = False
+    yielded = 0
+    for row in ws.iter_rows(values_only=True):
+        if not row:
+            continue
+        c1 = (str(row[0]).strip() if len(row) > 0 and row[0] is not None else "")
+        c2 = (str(row[1]).strip() if len(row) > 1 and row[1] is not None else "")
+        c3 = row[2] if len(row) > 2 else None
+        c4 = (str(row[3]).strip() if len(row) > 3 and row[3] is not None else "")
+
+        if not started:
+            if c1 == "ردیف" and "لیست" in c2 and "قیمت" in (str(c3) if c3 is not None else ""):
+                started = True
+            continue
+
+        try:
+            int(c1)
+        except Exception:
+            continue
+        if not c2:
+            continue
+
+        yield PriceRow(c2, _parse_price_toman(c3), _to_ascii_digits(c4)[:50])
+        yielded += 1
+        if limit and yielded >= limit:
+            return
+
+
+def _chunks(rows: Iterable[PriceRow], size: int) -> Iterator[list[PriceRow]]:
+    chunk: list[PriceRow] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _BulkImporter:
+    """Insert products and features chunk by chunk with a fixed number of queries per chunk."""
+
+    def __init__(self):
+        self.categories_by_name: dict[str, Category] = {c.name: c for c in Category.objects.all()}
+        self.can_return_pks = connection.features.can_return_rows_from_bulk_insert
+        self.products_created = 0
+        self.features_created = 0
+        self.category_ids: set[int] = set()
+
+    def _category(self, name: str) -> Category:
+        category = self.categories_by_name.get(name)
+        if not category:
+            category = Category.objects.create(name=name)
+            self.categories_by_name[name] = category
+        return category
+
+    def import_chunk(self, rows: list[PriceRow]) -> None:
+        products: list[Product] = []
+        features_by_index: list[list[tuple[str, str]]] = []
+        for name, price, sku in rows:
+            category_name = _infer_category_name(name)
+            category = self._category(category_name)
+            self.category_ids.add(category.pk)
+            products.append(
+                Product(
+                    name=name,
+                    description=_build_description(name=name, category_name=category_name),
+                    price=int(price),
+                    domain=category_name,
+                    category=category,
+                    brand="",
+                    sku=sku,
+                    tags="",
+                )
+            )
+            features_by_index.append(_extract_features(name, category_name))
+
+        self._assign_slugs(products)
+        Product.objects.bulk_create(products)
+        if not self.can_return_pks:
+            self._load_pks(products)
+
+        features = [
+            ProductFeature(product_id=product.pk, name=k, value=v)
+            for product, pairs in zip(products, features_by_index)
+            for (k, v) in pairs
+        ]
+        ProductFeature.objects.bulk_create(features)
+
+        self.products_created += len(products)
+        self.features_created += len(features)
+
+    def _assign_slugs(self, products: list[Product]) -> None:
+        """Product slugs are unique per category: one prefix query per category in the chunk."""
+        by_category: dict[int, list[Product]] = defaultdict(list)
+        for product in products:
+            by_category[product.category_id].append(product)
+        for category_id, group in by_category.items():
+            slugs = allocate_slugs(
+                Product.objects.filter(category_id=category_id),
+                [product.name for product in group],
+                fallback="product",
+            )
+            for product, slug in zip(group, slugs):
+                product.slug = slug
+
+    def _load_pks(self, products: list[Product]) -> None:
+        """Backends without INSERT ... RETURNING (MySQL): read PKs back by (category, slug)."""
+        category_ids = {p.category_id for p in products}
+        slugs = {p.slug for p in products}
+        pk_by_key = {
+            (category_id, slug): pk
+            for pk, category_id, slug in Product.objects.filter(
+                category_id__in=category_ids, slug__in=slugs
+            ).values_list("pk", "category_id", "slug")
+        }
+        for product in products:
+            product.pk = pk_by_key[(product.category_id, product.slug)]
+
+
+@dataclass
+class SyncSummary:
+    created: int = 0
+    price_changed: int = 0
+    renamed: int = 0
+    features_changed: int = 0
+    marked_unavailable: int = 0
+    reactivated: int = 0
+    unchanged: int = 0
+    details: list[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(
+            self.created
+            or self.price_changed
+            or self.renamed
+            or self.features_changed
+            or self.marked_unavailable
+            or self.reactivated
+        )
+
+
+class _CatalogSync:
+    """Diff spreadsheet rows against the catalog and apply only what changed.
+
+    Rows are matched by SKU when the sheet provides one, otherwise by normalized
+    name; a product matched by SKU takes the sheet's name. Duplicate keys are matched in PK order, so repeated names keep pairing
+    with the same products across runs. Features are only added or corrected,
+    never removed, so anything entered by hand in the admin survives a sync.
+    """
+
+    def __init__(self, *, mark_missing: bool):
+        self.mark_missing = mark_missing
+        self.summary = SyncSummary()
+        self.by_sku: dict[str, list[int]] = defaultdict(list)
+        self.by_name: dict[str, list[int]] = defaultdict(list)
+        self.current: dict[int, tuple[str, int, bool]] = {}
+        rows = Product.objects.order_by("pk").values_list("pk", "name", "sku", "price", "is_available")
+        for pk, name, sku, price, is_available in rows.iterator(chunk_size=5000):
+            self.current[pk] = (name, price, is_available)
+            if sku:
+                self.by_sku[sku].append(pk)
+            self.by_name[_normalize_name(name)].append(pk)
+
+        self.features: dict[int, dict[str, tuple[int, str]]] = defaultdict(dict)
+        feature_rows = ProductFeature.objects.order_by("pk").values_list("pk", "product_id", "name", "value")
+        for feature_pk, product_id, name, value in feature_rows.iterator(chunk_size=5000):
+            self.features[product_id].setdefault(name, (feature_pk, value))
+
+        self.matched: set[int] = set()
+        self.product_updates: dict[int, dict] = {}
+        self.feature_updates: list[ProductFeature] = []
+        self.feature_creates: list[ProductFeature] = []
+
+    def _match(self, row: PriceRow) -> tuple[int | None, bool]:
+        """(product pk or None, whether it was matched by SKU)."""
+        by_sku = self.by_sku.get(row.sku) if row.sku else None
+        for candidates in (by_sku, self.by_name.get(_normalize_name(row.name))):
+            while candidates:
+                pk = candidates.pop(0)
+                if pk not in self.matched:
+                    self.matched.add(pk)
+                    return pk, candidates is by_sku
+        return None, False
+
+    def _update(self, pk: int, **values) -> None:
+        self.product_updates.setdefault(pk, {}).update(values)
+
+    def plan_chunk(self, rows: list[PriceRow]) -> list[PriceRow]:
+        """Record updates for matched rows and return the rows that need inserting."""
+        new_rows: list[PriceRow] = []
+        for row in rows:
+            pk, matched_by_sku = self._match(row)
+            if pk is None:
+                new_rows.append(row)
+                continue
+
+            name, price, is_available = self.current[pk]
+            changed = False
+            if matched_by_sku and name != row.name:
+                self._update(pk, name=row.name)
+                self.summary.renamed += 1
+                self.summary.details.append(f"~ {name} -> {row.name}")
+                changed = True
+            if price != row.price:
+                self._update(pk, price=row.price)
+                self.summary.price_changed += 1
+                self.summary.details.append(f"~ {name}: {price} -> {row.price}")
+                changed = True
+            if self.mark_missing and not is_available:
+                self._update(pk, is_available=True)
+                self.summary.reactivated += 1
+                self.summary.details.append(f"+ {name}: موجود")
+                changed = True
+
+            existing = self.features.get(pk, {})
+            features_changed = False
+            for key, value in _extract_features(row.name, _infer_category_name(row.name)):
+                current = existing.get(key)
+                if current is None:
+                    self.feature_creates.append(ProductFeature(product_id=pk, name=key, value=value))
+                    features_changed = True
+                elif current[1] != value:
+                    self.feature_updates.append(ProductFeature(pk=current[0], value=value))
+                    features_changed = True
+            if features_changed:
+                # Feature rows are written in bulk, so bump the product for cache validators ourselves.
+                self._update(pk)
+                self.summary.features_changed += 1
+                self.summary.details.append(f"~ {name}: ویژگی‌ها")
+                changed = True
+
+            if not changed:
+                self.summary.unchanged += 1
+        return new_rows
+
+    def plan_missing(self) -> None:
+        if not self.mark_missing:
+            return
+        for pk, (name, _price, is_available) in self.current.items():
+            if pk in self.matched or not is_available:
+                continue
+            self._update(pk, is_available=False)
+            self.summary.marked_unavailable += 1
+            self.summary.details.append(f"- {name}: ناموجود")
+
+    def apply(self, batch_size: int) -> None:
+        now = timezone.now()
+        products: list[Product] = []
+        for pk, values in self.product_updates.items():
+            name, price, is_available = self.current[pk]
+            products.append(
+                Product(
+                    pk=pk,
+                    name=values.get("name", name),
+                    price=values.get("price", price),
+                    is_available=values.get("is_available", is_available),
+                    updated_at=now,
+                )
+            )
+        Product.objects.bulk_update(products, ["name", "price", "is_available", "updated_at"], batch_size=batch_size)
+        ProductFeature.objects.bulk_update(self.feature_updates, ["value"], batch_size=batch_size)
+        ProductFeature.objects.bulk_create(self.feature_creates, batch_size=batch_size)
+
+
 class Command(BaseCommand):
     help = "حذف محصولات فعلی و وارد کردن محصولات از فایل pricing.xlsx"
 
@@ -170,85 +464,137 @@ class Command(BaseCommand):
             help="فقط شمارش می‌کند و دیتابیس را تغییر نمی‌دهد.",
         )
         parser.add_argument("--limit", type=int, default=0, help="محدود کردن تعداد محصولات واردشده (۰ یعنی همه)")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="تعداد ردیف‌هایی که در هر دسته با bulk_create درج می‌شوند.",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="به‌جای افزودن، ردیف‌ها را با محصولات فعلی (SKU یا نام) تطبیق داده و فقط تغییرات را اعمال می‌کند.",
+        )
+        parser.add_argument(
+            "--mark-missing-unavailable",
+            action="store_true",
+            help="در حالت --sync محصولاتی که در فایل نیستند را ناموجود می‌کند.",
+        )
 
     def handle(self, *args, **options):
         path = Path(options["path"])
         wipe = bool(options["wipe"])
         dry_run = bool(options["dry_run"])
         limit = int(options["limit"] or 0)
-
+        chunk_size = max(1, int(options["chunk_size"] or 1000))
+        sync = bool(options["sync"])
+        mark_missing = bool(options["mark_missing_unavailable"])
+
+        if sync and wipe:
+            raise CommandError("--sync و --wipe را نمی‌توان با هم استفاده کرد.")
+        if mark_missing and not sync:
+            raise CommandError("--mark-missing-unavailable فقط همراه با --sync قابل استفاده است.")
+        if mark_missing and limit:
+            # Rows past the limit are never read, so every product on them would look missing.
+            raise CommandError("--mark-missing-unavailable را نمی‌توان با --limit استفاده کرد.")
         if not path.exists():
             raise FileNotFoundError(f"فایل یافت نشد: {path}")
 
+        import openpyxl
+
         wb = openpyxl.load_workbook(path, data_only=True, read_only=True)
         ws = wb[wb.sheetnames[0]]
+        rows = _iter_price_rows(ws, limit=limit)
 
-        started = False
-        imported_rows: list[tuple[str, int]] = []
-
-        for row in ws.iter_rows(values_only=True):
-            if not row:
-                continue
-            c1 = (str(row[0]).strip() if len(row) > 0 and row[0] is not None else "")
-            c2 = (str(row[1]).strip() if len(row) > 1 and row[1] is not None else "")
-            c3 = row[2] if len(row) > 2 else None
-
-            if not started:
-                if c1 == "ردیف" and "لیست" in c2 and "قیمت" in (str(c3) if c3 is not None else ""):
-                    started = True
-                continue
-
+        if sync:
             try:
-                int(c1)
-            except Exception:
-                continue
-            if not c2:
-                continue
-
-            price_toman = _parse_price_toman(c3)
-            imported_rows.append((c2, price_toman))
-            if limit and len(imported_rows) >= limit:
-                break
+                self._sync(
+                    rows,
+                    chunk_size=chunk_size,
+                    mark_missing=mark_missing,
+                    dry_run=dry_run,
+                    verbose=int(options.get("verbosity", 1)) >= 2,
+                )
+            finally:
+                wb.close()
+            return
 
-        _safe_write(self, self.style.SUCCESS(f"تعداد ردیف‌های قابل ایمپورت: {len(imported_rows)}"))
         if dry_run:
+            total = sum(1 for _row in rows)
+            wb.close()
+            _safe_write(self, self.style.SUCCESS(f"تعداد ردیف‌های قابل ایمپورت: {total}"))
             return
 
+        started = time.perf_counter()
         with transaction.atomic():
             if wipe:
                 ProductFeature.objects.all().delete()
                 Product.objects.all().delete()
                 Category.objects.all().delete()
 
-            categories_by_name: dict[str, Category] = {c.name: c for c in Category.objects.all()}
-            created_products: list[Product] = []
-
-            for name, price in imported_rows:
-                category_name = _infer_category_name(name)
-                category = categories_by_name.get(category_name)
-                if not category:
-                    category = Category.objects.create(name=category_name)
-                    categories_by_name[category_name] = category
+            importer = _BulkImporter()
+            for chunk in _chunks(rows, chunk_size):
+                importer.import_chunk(chunk)
+        wb.close()
+        elapsed = max(time.perf_counter() - started, 1e-9)
 
-                product = Product.objects.create(
-                    name=name,
-                    description=_build_description(name=name, category_name=category_name),
-                    price=int(price),
-                    domain=category_name,
-                    category=category,
-                    brand="",
-                    sku="",
-                    tags="",
-                )
-                created_products.append(product)
+        bump(CATALOG)
+        purge(PRODUCT_LIST, *map(category_products_key, importer.category_ids))
 
-                features = _extract_features(name, category_name)
-                ProductFeature.objects.bulk_create(
-                    [ProductFeature(product=product, name=k, value=v) for (k, v) in features],
-                    ignore_conflicts=False,
-                )
+        _safe_write(self, self.style.SUCCESS(f"ایمپورت انجام شد: {importer.products_created} محصول"))
+        _safe_write(
+            self,
+            f"{importer.features_created} ویژگی | {elapsed:.2f}s | "
+            f"{importer.products_created / elapsed:.0f} rows/sec",
+        )
 
-        _safe_write(self, self.style.SUCCESS(f"ایمپورت انجام شد: {len(imported_rows)} محصول"))
+    def _sync(
+        self,
+        rows: Iterable[PriceRow],
+        *,
+        chunk_size: int,
+        mark_missing: bool,
+        dry_run: bool,
+        verbose: bool,
+    ) -> None:
+        started = time.perf_counter()
+        processed = 0
+        with transaction.atomic():
+            syncer = _CatalogSync(mark_missing=mark_missing)
+            importer = None if dry_run else _BulkImporter()
+            for chunk in _chunks(rows, chunk_size):
+                processed += len(chunk)
+                new_rows = syncer.plan_chunk(chunk)
+                syncer.summary.created += len(new_rows)
+                for row in new_rows:
+                    syncer.summary.details.append(f"+ {row.name}: {row.price}")
+                if importer is not None and new_rows:
+                    importer.import_chunk(new_rows)
+            syncer.plan_missing()
+            if not dry_run:
+                syncer.apply(batch_size=chunk_size)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+
+        summary = syncer.summary
+        if summary.has_changes and not dry_run:
+            bump(CATALOG)
+            keys = [product_key(pk) for pk in syncer.product_updates]
+            if importer.products_created:
+                keys += [PRODUCT_LIST, *map(category_products_key, importer.category_ids)]
+            purge(*keys)
+
+        if verbose:
+            for line in summary.details:
+                _safe_write(self, line)
+        title = "پیش‌نمایش همگام‌سازی (بدون تغییر دیتابیس)" if dry_run else "همگام‌سازی انجام شد"
+        _safe_write(self, self.style.SUCCESS(title))
+        _safe_write(
+            self,
+            f"جدید: {summary.created} | تغییر قیمت: {summary.price_changed} | تغییر نام: {summary.renamed} | "
+            f"تغییر ویژگی: {summary.features_changed} | ناموجود شده: {summary.marked_unavailable} | "
+            f"موجود شده: {summary.reactivated} | بدون تغییر: {summary.unchanged}",
+        )
+        _safe_write(self, f"{processed} ردیف | {elapsed:.2f}s | {processed / elapsed:.0f} rows/sec")
 
 
 def _safe_write(command: BaseCommand, message: str) -> None:
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_populate_product_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:01
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def dedupe_product_slugs(apps, schema_editor):
+    """Concurrent saves could pick the same slug before this constraint existed; suffix the later rows."""
+    Product = apps.get_model("store", "Product")
+    seen = {}
+    for pk, category_id, slug, name in Product.objects.order_by("id").values_list("id", "category_id", "slug", "name"):
+        existing = seen.setdefault(category_id, set())
+        base = (slug or "").strip() or slugify(name, allow_unicode=True) or f"product-{pk}"
+        candidate = base
+        suffix = 1
+        while candidate in existing:
+            candidate = f"{base}-{suffix}"
+            suffix += 1
+        if candidate != slug:
+            Product.objects.filter(pk=pk).update(slug=candidate)
+        existing.add(candidate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_product_slugs, reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('category', 'slug'), name='store_product_unique_category_slug'),
+        ),
+    ]
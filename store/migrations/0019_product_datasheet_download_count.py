@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_product_unique_category_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='datasheet_download_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد دانلود دیتاشیت'),
+        ),
+    ]
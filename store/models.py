@@ -3,7 +3,8 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.urls import reverse
-from django.utils.text import slugify
+
+from core.utils.slugs import save_with_unique_slug
 
 from .validators import product_image_validators
 
@@ -24,6 +25,7 @@ def order_receipt_upload_to(instance, filename: str) -> str:
 class Category(models.Model):
     name = models.CharField("نام دسته", max_length=100)
     slug = models.SlugField("اسلاگ", max_length=120, unique=True, blank=True)
+    updated_at = models.DateTimeField("آخرین بروزرسانی", auto_now=True)
 
     class Meta:
         verbose_name = "دسته‌بندی"
@@ -33,15 +35,8 @@ class Category(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name, allow_unicode=True) or "category"
-            candidate = base
-            suffix = 1
-            while Category.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{suffix}"
-                suffix += 1
-            self.slug = candidate
-        super().save(*args, **kwargs)
+        save = super().save
+        save_with_unique_slug(self, lambda: save(*args, **kwargs), source=self.name, fallback="category")
 
 
 class Product(models.Model):
@@ -69,26 +64,23 @@ class Product(models.Model):
         help_text="برچسب‌ها را با فاصله یا ویرگول جدا کنید.",
     )
     datasheet = models.FileField("کاتالوگ/دیتاشیت", upload_to="products/datasheets/", blank=True)
+    datasheet_download_count = models.PositiveIntegerField("تعداد دانلود دیتاشیت", default=0)
     created_at = models.DateTimeField("تاریخ ایجاد", auto_now_add=True)
     updated_at = models.DateTimeField("آخرین بروزرسانی", auto_now=True)
 
     class Meta:
         verbose_name = "محصول"
         verbose_name_plural = "محصولات"
+        constraints = [
+            models.UniqueConstraint(fields=["category", "slug"], name="store_product_unique_category_slug"),
+        ]
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.name, allow_unicode=True) or "product"
-            candidate = base
-            suffix = 1
-            while Product.objects.filter(slug=candidate, category=self.category).exclude(pk=self.pk).exists():
-                candidate = f"{base}-{suffix}"
-                suffix += 1
-            self.slug = candidate
-        super().save(*args, **kwargs)
+        save = super().save
+        save_with_unique_slug(self, lambda: save(*args, **kwargs), source=self.name, fallback="product", scope=("category",))
 
     @property
     def primary_image(self):
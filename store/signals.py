@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.images import delete_derivatives, schedule_derivatives
+
+from .models import Product, ProductFeature, ProductImage, ProductReview
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductFeature)
+@receiver(post_delete, sender=ProductFeature)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def touch_product(sender, instance, **kwargs):
+    """Keep Product.updated_at in step with its images, features and reviews.
+
+    Page validators (ETag/Last-Modified) and sitemap lastmod read only the
+    product row, so child edits must move it too.
+    """
+
+    if instance.product_id:
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_product_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance.image.name, touch=Product.objects.filter(pk=instance.product_id))
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_product_image_derivatives(sender, instance, **kwargs):
+    if instance.image.name:
+        delete_derivatives([instance.image.name])
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import PaymentSettings
+from core.tests.utils import client_without_visit_tracking
+from store.models import Category, Product, ProductFeature
+
+
+class CatalogConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = client_without_visit_tracking()
+        PaymentSettings.get_solo()
+        self.category = Category.objects.create(name="Ovens")
+        self.product = Product.objects.create(
+            name="Pizza oven", description="-", domain="-", category=self.category
+        )
+        self.product_url = reverse(
+            "catalog_product",
+            kwargs={"category_slug": self.category.slug, "product_slug": self.product.slug},
+        )
+        self.category_url = reverse("catalog_category", kwargs={"category_slug": self.category.slug})
+
+    def _assert_revalidates_with_one_query(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header("ETag"))
+        self.assertTrue(first.has_header("Last-Modified"))
+
+        with self.assertNumQueries(1):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+
+        with self.assertNumQueries(1):
+            third = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(third.status_code, 304)
+        return first["ETag"]
+
+    def test_product_page_304_costs_one_query(self):
+        self._assert_revalidates_with_one_query(self.product_url)
+
+    def test_category_and_catalog_pages_304_cost_one_query(self):
+        self._assert_revalidates_with_one_query(self.category_url)
+        self._assert_revalidates_with_one_query(reverse("catalog"))
+
+    def test_search_query_is_part_of_the_validator(self):
+        etag = self.client.get(reverse("catalog"))["ETag"]
+        response = self.client.get(reverse("catalog"), {"q": "oven"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feature_change_invalidates_product_etag(self):
+        etag = self.client.get(self.product_url)["ETag"]
+        ProductFeature.objects.create(product=self.product, name="Width", value="60")
+
+        response = self.client.get(self.product_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_settings_change_invalidates_etag(self):
+        etag = self.client.get(self.category_url)["ETag"]
+        settings_obj = PaymentSettings.get_solo()
+        settings_obj.company_phone = "02100000000"
+        settings_obj.save()
+
+        response = self.client.get(self.category_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_product_still_404s(self):
+        url = reverse("catalog_product", kwargs={"category_slug": self.category.slug, "product_slug": "nope"})
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,168 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+import openpyxl
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from store.models import Category, Product, ProductFeature
+
+
+def _write_pricing_xlsx(path: Path, names: list, prices: dict | None = None) -> None:
+    """Write a sheet with the real file's header; rows are names or (name, sku) pairs."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["لیست قیمت", None, None])
+    ws.append(["ردیف", "لیست محصولات", "قیمت (تومان)"])
+    for index, item in enumerate(names, start=1):
+        name, sku = item if isinstance(item, tuple) else (item, None)
+        price = (prices or {}).get(name, index * 1000)
+        ws.append([index, name, f"{price:,}", sku])
+    wb.save(path)
+
+
+class PricingSheetMixin:
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _import(self, names: list, *args, prices: dict | None = None) -> str:
+        path = Path(self.tmpdir.name) / "pricing.xlsx"
+        _write_pricing_xlsx(path, names, prices)
+        out = StringIO()
+        call_command("import_pricing_xlsx", "--path", str(path), *args, stdout=out)
+        return out.getvalue()
+
+    def _count_queries(self, names: list[str]) -> int:
+        Product.objects.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            self._import(names, "--chunk-size", "10")
+        return len(ctx.captured_queries)
+
+
+class ImportPricingXlsxTests(PricingSheetMixin, TestCase):
+    def test_imports_products_features_and_unique_slugs(self):
+        names = ["فرپیتزا دهانه 50", "فرپیتزا دهانه 50", "دیسپلی ایستاده"]
+
+        output = self._import(names)
+
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertIn("rows/sec", output)
+        slugs = list(
+            Product.objects.filter(name="فرپیتزا دهانه 50").order_by("pk").values_list("slug", flat=True)
+        )
+        self.assertEqual(len(set(slugs)), 2)
+        self.assertEqual(slugs[1], f"{slugs[0]}-1")
+        for product in Product.objects.all():
+            self.assertTrue(ProductFeature.objects.filter(product=product, name="ساخت").exists())
+
+    def test_slugs_skip_existing_products(self):
+        category = Category.objects.create(name="دیسپلی")
+        existing = Product.objects.create(name="دیسپلی ایستاده", description="-", domain="-", category=category)
+
+        self._import(["دیسپلی ایستاده"])
+
+        imported = Product.objects.exclude(pk=existing.pk).get()
+        self.assertEqual(imported.category, category)
+        self.assertEqual(imported.slug, f"{existing.slug}-1")
+
+    def test_query_count_grows_per_chunk_not_per_row(self):
+        small = self._count_queries([f"دیسپلی مدل {i}" for i in range(10)])
+        large = self._count_queries([f"دیسپلی مدل {i}" for i in range(40)])
+
+        # Three extra chunks, each costing a slug lookup, a product insert and a feature insert.
+        self.assertLessEqual(large - small, 3 * 3)
+
+    def test_dry_run_and_limit_do_not_write(self):
+        output = self._import(["دیسپلی الف", "دیسپلی ب", "دیسپلی ج"], "--dry-run", "--limit", "2")
+
+        self.assertIn("2", output)
+        self.assertFalse(Product.objects.exists())
+
+
+class ImportPricingSyncTests(PricingSheetMixin, TestCase):
+    names = ["فرپیتزا دهانه 50", "دیسپلی ایستاده", ("سرخ کن دو لگن", "FR-2")]
+
+    def setUp(self):
+        super().setUp()
+        self._import(self.names)
+        self.products = {p.name: p for p in Product.objects.all()}
+
+    def test_unchanged_sheet_writes_nothing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            output = self._import(self.names, "--sync")
+
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        self.assertEqual(writes, [])
+        self.assertIn("بدون تغییر: 3", output)
+
+    def test_price_change_updates_only_that_row(self):
+        oven = self.products["فرپیتزا دهانه 50"]
+        display = self.products["دیسپلی ایستاده"]
+        oven_updated_at = oven.updated_at
+
+        output = self._import(self.names, "--sync", prices={"فرپیتزا دهانه 50": 99990})
+
+        oven.refresh_from_db()
+        untouched = Product.objects.get(pk=display.pk)
+        self.assertEqual(oven.price, 9999)
+        self.assertGreater(oven.updated_at, oven_updated_at)
+        self.assertEqual(untouched.updated_at, display.updated_at)
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertIn("تغییر قیمت: 1", output)
+
+    def test_matches_by_sku_and_normalized_name(self):
+        fryer = self.products["سرخ کن دو لگن"]
+        renamed = [("فرپيتزا  دهانه ۵۰"), "دیسپلی ایستاده", ("سرخ کن دولگن جدید", "FR-2")]
+
+        output = self._import(renamed, "--sync", prices={"فرپيتزا  دهانه ۵۰": 1000})
+
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertTrue(Product.objects.filter(pk=fryer.pk).exists())
+        self.assertIn("جدید: 0", output)
+        # A SKU match takes the sheet's name; a name match keeps the catalog's spelling.
+        self.assertEqual(Product.objects.get(pk=fryer.pk).name, "سرخ کن دولگن جدید")
+        self.assertTrue(Product.objects.filter(name="فرپیتزا دهانه 50").exists())
+        self.assertIn("تغییر نام: 1", output)
+
+    def test_new_rows_and_missing_rows(self):
+        display = self.products["دیسپلی ایستاده"]
+        ProductFeature.objects.create(product=display, name="رنگ", value="استیل")
+
+        output = self._import(
+            ["فرپیتزا دهانه 50", ("سرخ کن دو لگن", "FR-2"), "چرخ گوشت"],
+            "--sync",
+            "--mark-missing-unavailable",
+        )
+
+        display.refresh_from_db()
+        self.assertFalse(display.is_available)
+        self.assertTrue(display.features.filter(name="رنگ").exists())
+        self.assertTrue(Product.objects.filter(name="چرخ گوشت").exists())
+        self.assertIn("جدید: 1", output)
+        self.assertIn("ناموجود شده: 1", output)
+
+        self._import(self.names, "--sync", "--mark-missing-unavailable")
+        display.refresh_from_db()
+        self.assertTrue(display.is_available)
+
+    def test_limit_cannot_mark_missing_rows(self):
+        with self.assertRaisesMessage(CommandError, "--limit"):
+            self._import(self.names, "--sync", "--mark-missing-unavailable", "--limit", "1")
+
+        self.assertEqual(Product.objects.filter(is_available=False).count(), 0)
+
+    def test_dry_run_reports_without_writing(self):
+        output = self._import(self.names + ["چرخ گوشت"], "--sync", "--dry-run", prices={"دیسپلی ایستاده": 10})
+
+        self.assertIn("جدید: 1", output)
+        self.assertIn("تغییر قیمت: 1", output)
+        self.assertFalse(Product.objects.filter(name="چرخ گوشت").exists())
+        self.assertEqual(
+            Product.objects.get(name="دیسپلی ایستاده").price, self.products["دیسپلی ایستاده"].price
+        )
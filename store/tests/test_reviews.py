@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from store.models import Category, Product, ProductReview
+
+REVIEW = {"name": "Chef", "role": "", "rating": "5", "comment": "Keeps its temperature"}
+
+
+@override_settings(DEBUG=False)
+class ReviewFormTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(enforce_csrf_checks=True)
+        category = Category.objects.create(name="Ovens")
+        self.product = Product.objects.create(name="Combi oven", description="-", domain="-", category=category)
+        self.review_url = reverse("catalog_product_review", args=[category.slug, self.product.slug])
+        self.product_url = self.product.get_absolute_url()
+
+    def test_product_page_form_posts_to_the_uncached_review_page(self):
+        self.assertContains(self.client.get(self.product_url), f'action="{self.review_url}"')
+
+        response = self.client.get(self.review_url)
+
+        self.assertIn("no-store", response["Cache-Control"])
+        self.assertTrue(response.context["csrf_token"])
+
+    def test_product_page_validator_does_not_depend_on_the_csrf_token(self):
+        self.client.get(self.product_url)  # creates the contact settings row, which is part of the ETag
+        first = self.client.get(self.product_url)
+        self.assertContains(first, 'name="csrfmiddlewaretoken" value=""')
+
+        other_visitor = Client(enforce_csrf_checks=True)
+        other_visitor.cookies["csrftoken"] = "x" * 32
+        revalidated = other_visitor.get(self.product_url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_post_without_a_token_gets_the_form_back_to_resubmit(self):
+        rejected = self.client.post(self.review_url, REVIEW)
+
+        self.assertEqual(rejected.status_code, 403)
+        self.assertTrue(rejected.context["csrf_retry"])
+        self.assertContains(rejected, "Keeps its temperature", status_code=403)
+        self.assertFalse(ProductReview.objects.exists())
+
+        token = self.client.cookies["csrftoken"].value
+        accepted = self.client.post(self.review_url, {**REVIEW, "csrfmiddlewaretoken": token})
+
+        self.assertTrue(accepted.context["review_submitted"])
+        review = ProductReview.objects.get()
+        self.assertEqual((review.product, review.is_approved), (self.product, False))
+
+    def test_other_csrf_failures_are_readable(self):
+        response = self.client.post(reverse("contact"), {"name": "Ali"})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTemplateUsed(response, "403_csrf.html")
@@ -15,4 +15,14 @@ urlpatterns = [
         views.product_detail,
         name="catalog_product",
     ),
+    path(
+        "<str:category_slug>/<str:product_slug>/review/",
+        views.product_review,
+        name="catalog_product_review",
+    ),
+    path(
+        "<str:category_slug>/<str:product_slug>/datasheet/",
+        views.product_datasheet,
+        name="catalog_product_datasheet",
+    ),
 ]
@@ -4,6 +4,8 @@ from pathlib import Path
 
 from django.conf import settings
 
+from core.images import responsive_images
+
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
 
@@ -51,23 +53,47 @@ def list_product_media_images(product_id: int | str) -> list[str]:
     return urls
 
 
-def get_primary_image_url(product) -> str:
+def _primary_image(product):
     images = list(getattr(product, "images", []).all())
-    if images:
-        for image in images:
-            if image.is_primary:
-                return image.image.url
-        return images[0].image.url
+    if not images:
+        return None
+    for image in images:
+        if image.is_primary:
+            return image
+    return images[0]
+
+
+def get_primary_image_url(product) -> str:
+    image = _primary_image(product)
+    if image:
+        return image.image.url
 
     fallback = list_product_media_images(getattr(product, "id", ""))
     return fallback[0] if fallback else ""
 
 
-def build_gallery_images(product) -> list[dict[str, str]]:
+def attach_card_images(products) -> None:
+    """Set `card_image_url` and `card_image` (srcsets) on each product; one derivative query in total."""
+    names: list[str] = []
+    for product in products:
+        image = _primary_image(product)
+        product.card_image_url = get_primary_image_url(product)
+        names.append(image.image.name if image else "")
+    lookup = responsive_images(names)
+    for product, name in zip(products, names):
+        product.card_image = lookup.get(name)
+
+
+def build_gallery_images(product) -> list[dict]:
     images = list(getattr(product, "images", []).all())
     if images:
+        lookup = responsive_images(img.image.name for img in images)
         return [
-            {"url": img.image.url, "alt": (img.alt_text or getattr(product, "name", "") or "").strip()}
+            {
+                "url": img.image.url,
+                "alt": (img.alt_text or getattr(product, "name", "") or "").strip(),
+                "image": lookup.get(img.image.name),
+            }
             for img in images
         ]
 
@@ -76,4 +102,4 @@ def build_gallery_images(product) -> list[dict[str, str]]:
         return []
 
     alt = (getattr(product, "name", "") or "").strip()
-    return [{"url": url, "alt": alt} for url in fallback_urls]
+    return [{"url": url, "alt": alt, "image": None} for url in fallback_urls]
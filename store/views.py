@@ -6,20 +6,68 @@ from datetime import timedelta
 
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Avg, F, Q
+from django.db.models import Avg, Count, F, Max, Q, Subquery
 from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
-from django.utils.text import slugify
-from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET, require_POST, require_safe
+
+from core.conditional import conditional_page, settings_updated_at
+from core.downloads import serve_field_file
+from core.edgecache import (
+    CATEGORY_LIST,
+    PRODUCT_LIST,
+    add_keys,
+    category_key,
+    category_products_key,
+    edge_cached,
+    product_key,
+)
+from core.generations import CATALOG
+from core.pagecache import FreshnessPolicy, cache_anonymous_page
+from core.utils.slugs import save_with_unique_slug
 
 from .forms import ProductReviewForm
-from .invoice import render_manual_invoice_pdf
 from .models import Category, ManualInvoiceSequence, Product, ProductReview
-from .utils import build_gallery_images, get_primary_image_url
+from .utils import attach_card_images, build_gallery_images
 
 
+def _catalog_validators(request):
+    return Product.objects.aggregate(
+        latest=Max("updated_at"),
+        total=Count("pk"),
+        categories=Max(Subquery(Category.objects.order_by("-updated_at").values("updated_at")[:1])),
+        settings=settings_updated_at(),
+    )
+
+
+def _category_validators(request, category_slug: str):
+    values = Category.objects.filter(slug=category_slug).aggregate(
+        category=Max("updated_at"),
+        latest=Max("products__updated_at"),
+        total=Count("products"),
+        settings=settings_updated_at(),
+    )
+    return values if values["category"] is not None else None
+
+
+def _product_validators(request, category_slug: str, product_slug: str):
+    """The page carries no CSRF token (the review form fetches one, or posts to the
+    uncached review page), so one ETag serves every visitor."""
+    row = (
+        Product.objects.filter(slug=product_slug, category__slug=category_slug)
+        .values("pk", "updated_at", "category__updated_at")
+        .annotate(settings=settings_updated_at())
+        .first()
+    )
+    return row
+
+
+@cache_anonymous_page(CATALOG, skip_params=("q",))
+@edge_cached(PRODUCT_LIST, CATEGORY_LIST, skip_params=("q",))
+@conditional_page(_catalog_validators)
 def catalog_home(request):
     query = (request.GET.get("q") or "").strip()
     products = Product.objects.prefetch_related("images", "category").all()
@@ -36,9 +84,10 @@ def catalog_home(request):
             | Q(sku__icontains=query)
         )
 
+    categories = list(categories)
     featured_products = list(products.order_by("-created_at")[:9])
-    for product in featured_products:
-        product.card_image_url = get_primary_image_url(product)
+    attach_card_images(featured_products)
+    add_keys(request, *(category_key(c.pk) for c in categories), *(product_key(p.pk) for p in featured_products))
 
     return render(
         request,
@@ -51,11 +100,15 @@ def catalog_home(request):
     )
 
 
+@cache_anonymous_page(CATALOG, skip_params=("q",))
+@edge_cached(skip_params=("q",))
+@conditional_page(_category_validators)
 def category_detail(request, category_slug: str):
     category = get_object_or_404(Category, slug=category_slug)
     query = (request.GET.get("q") or "").strip()
     products = (
         Product.objects.filter(category=category)
+        .select_related("category")
         .prefetch_related("images")
         .order_by("-created_at")
     )
@@ -70,8 +123,13 @@ def category_detail(request, category_slug: str):
         )
 
     products = list(products)
-    for product in products:
-        product.card_image_url = get_primary_image_url(product)
+    attach_card_images(products)
+    add_keys(
+        request,
+        category_key(category.pk),
+        category_products_key(category.pk),
+        *(product_key(p.pk) for p in products),
+    )
 
     return render(
         request,
@@ -84,6 +142,12 @@ def category_detail(request, category_slug: str):
     )
 
 
+# Rendered on every origin request so view_count counts them; only its last good copy
+# is kept, for database outages. The review form fetches its CSRF token on submit and
+# posts to product_review.
+@cache_anonymous_page(CATALOG, policy=FreshnessPolicy(fresh_seconds=0))
+@edge_cached()
+@conditional_page(_product_validators)
 def product_detail(request, category_slug: str, product_slug: str):
     product = get_object_or_404(
         Product.objects.prefetch_related("features", "images", "reviews"),
@@ -95,20 +159,8 @@ def product_detail(request, category_slug: str, product_slug: str):
     reviews_qs = product.reviews.filter(is_approved=True)
     avg_rating = reviews_qs.aggregate(avg=Avg("rating"))["avg"] or 0
 
-    review_submitted = False
-    if request.method == "POST":
-        review_form = ProductReviewForm(request.POST)
-        if review_form.is_valid():
-            review = review_form.save(commit=False)
-            review.product = product
-            review.is_approved = False
-            review.save()
-            review_submitted = True
-            review_form = ProductReviewForm()
-    else:
-        review_form = ProductReviewForm()
-
     Product.objects.filter(pk=product.pk).update(view_count=F("view_count") + 1)
+    add_keys(request, product_key(product.pk), category_key(product.category_id))
 
     return render(
         request,
@@ -120,12 +172,43 @@ def product_detail(request, category_slug: str, product_slug: str):
             "reviews": reviews_qs,
             "avg_rating": avg_rating,
             "review_count": reviews_qs.count(),
-            "review_form": review_form,
-            "review_submitted": review_submitted,
+            "review_form": ProductReviewForm(),
         },
     )
 
 
+def render_review_page(request, product, review_form, *, status: int = 200, **context):
+    return render(
+        request,
+        "catalog/product_review.html",
+        {"product": product, "review_form": review_form, **context},
+        status=status,
+    )
+
+
+@never_cache
+def product_review(request, category_slug: str, product_slug: str):
+    """Review form with its own CSRF token; the edge-cached product page posts here.
+
+    Posts rejected by the CSRF check (no JavaScript to fetch the token, or the
+    fetch failed) come back to this page through core.views.csrf_failure.
+    """
+    product = get_object_or_404(
+        Product.objects.select_related("category"), slug=product_slug, category__slug=category_slug
+    )
+    if request.method != "POST":
+        return render_review_page(request, product, ProductReviewForm())
+
+    review_form = ProductReviewForm(request.POST)
+    if not review_form.is_valid():
+        return render_review_page(request, product, review_form)
+    review = review_form.save(commit=False)
+    review.product = product
+    review.is_approved = False
+    review.save()
+    return render_review_page(request, product, ProductReviewForm(), review_submitted=True)
+
+
 @require_GET
 def catalog_suggest(request):
     query = (request.GET.get("q") or "").strip()
@@ -144,20 +227,38 @@ def catalog_suggest(request):
     return JsonResponse({"suggestions": suggestions})
 
 
+@require_safe
+def product_datasheet(request, category_slug: str, product_slug: str):
+    product = get_object_or_404(
+        Product.objects.only("pk", "datasheet"),
+        slug=product_slug,
+        category__slug=category_slug,
+    )
+    return serve_field_file(
+        request,
+        product.datasheet,
+        counter_key=(Product, product.pk, "datasheet_download_count"),
+    )
+
+
 def legacy_product_redirect(request, pk: int):
     product = get_object_or_404(Product, pk=pk)
     if product.category and not product.category.slug:
-        product.category.slug = slugify(product.category.name, allow_unicode=True) or "category"
-        product.category.save(update_fields=["slug"])
+        category = product.category
+        save_with_unique_slug(
+            category,
+            lambda: category.save(update_fields=["slug"]),
+            source=category.name,
+            fallback="category",
+        )
     if not product.slug:
-        base = slugify(product.name, allow_unicode=True) or f"product-{product.pk}"
-        candidate = base
-        suffix = 1
-        while Product.objects.filter(slug=candidate, category=product.category).exclude(pk=product.pk).exists():
-            candidate = f"{base}-{suffix}"
-            suffix += 1
-        product.slug = candidate
-        product.save(update_fields=["slug"])
+        save_with_unique_slug(
+            product,
+            lambda: product.save(update_fields=["slug"]),
+            source=product.name,
+            fallback=f"product-{product.pk}",
+            scope=("category",),
+        )
     return redirect(
         reverse(
             "catalog_product",
@@ -302,6 +403,9 @@ def manual_invoice_pdf(request):
         max(0, items_subtotal - max(0, discount)) + max(0, shipping),
     )
 
+    # ReportLab and the RTL shaping libraries load on the first PDF, not at worker boot.
+    from .invoice import render_manual_invoice_pdf
+
     pdf_bytes = render_manual_invoice_pdf(
         invoice_number=invoice_number,
         title=title,